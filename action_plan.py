@@ -0,0 +1,449 @@
+"""
+宣言的なアクション (YAML / JSON のステップ列) を実行計画にコンパイルする
+
+アクションファイルの例 (actions/nogtips_search_plan.yaml):
+
+    steps:
+      - goto: https://nogtips.wordpress.com
+        wait_until: domcontentloaded
+      - consent: {role: button, name: 閉じて承認}
+      - click: {role: searchbox, name: "検索:"}
+      - fill: {role: searchbox, name: "検索:"}
+        value: "{query}"
+      - press: {role: searchbox, name: "検索:"}
+        key: Enter
+        navigation: domcontentloaded
+      - extract: article h2 a
+      - wait: 5000
+
+ロケータは CSS セレクタの文字列、{role|text|label|placeholder|test_id|selector: ..., name, exact, nth} の辞書、
+またはその辞書のリスト (前から順に絞り込む) で指定する。
+goto の URL と fill / select の値の "{query}" は検索クエリに置き換えられる。
+extract はセレクタに一致するリンクの順位・タイトル・URL をレコードとして yield する。
+
+コンパイル時に次の最適化を行う。
+    - 同じロケータは1回だけ作成して使い回す
+    - fill の直前の同じ要素への click を省略する (fill がフォーカスする)
+    - 操作の直前の同じ要素への wait_for (visible、timeout の指定なし) を省略する (操作が自動で待機する)
+    - 上書きされる fill を省略する
+    - 連続する wait をまとめる
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from urllib.parse import urlparse
+from action_registry import ActionInfo, PLAN_SUFFIXES
+from browser_base import accept_consent, extract_links, presentation_wait
+from timing import current_recorder, untimed
+
+# ロケータの種類と対応する Playwright のメソッド
+LOCATOR_METHODS = {
+    "role": "get_by_role",
+    "text": "get_by_text",
+    "label": "get_by_label",
+    "placeholder": "get_by_placeholder",
+    "test_id": "get_by_test_id",
+    "selector": "locator",
+}
+# ロケータのメソッドに渡すオプション
+LOCATOR_OPTIONS = ("name", "exact")
+
+# ステップの種類ごとに指定できるオプション
+STEP_OPTIONS = {
+    "goto": ("wait_until", "timeout"),
+    "click": ("navigation", "timeout"),
+    "fill": ("value", "timeout"),
+    "press": ("key", "navigation", "timeout"),
+    "check": ("timeout",),
+    "uncheck": ("timeout",),
+    "select": ("value", "timeout"),
+    "wait_for": ("state", "timeout"),
+    "consent": ("timeout",),
+    "wait": (),
+    "extract": (),
+}
+# 要素が表示されるまで自動で待機する操作
+AUTO_WAITING_STEPS = ("click", "fill", "press", "check", "uncheck", "select")
+
+class PlanError(Exception):
+    """アクション定義の誤り"""
+
+def _substitute(text, query):
+    return text.replace("{query}", query or "")
+
+def _normalize_locator(spec, number):
+    """ロケータの指定を [{"role": ..., "name": ...}, ...] の形にそろえる"""
+    if isinstance(spec, str):
+        spec = [{"selector": spec}]
+    elif isinstance(spec, dict):
+        spec = [spec]
+    if not isinstance(spec, list) or not spec:
+        raise PlanError(f"ステップ {number}: ロケータは文字列・辞書・辞書のリストで指定してください")
+
+    parts = []
+    for part in spec:
+        if isinstance(part, str):
+            part = {"selector": part}
+        kinds = [key for key in part if key in LOCATOR_METHODS]
+        if len(kinds) != 1:
+            raise PlanError(f"ステップ {number}: ロケータには {', '.join(LOCATOR_METHODS)} のいずれか1つを指定してください")
+        unknown = set(part) - set(LOCATOR_METHODS) - set(LOCATOR_OPTIONS) - {"nth"}
+        if unknown:
+            raise PlanError(f"ステップ {number}: 不明なロケータのオプションです: {', '.join(sorted(unknown))}")
+        parts.append(dict(part))
+    return parts
+
+def describe_locator(parts):
+    """get_by_role('searchbox', name='検索:') のようなロケータの説明"""
+    calls = []
+    for part in parts:
+        kind = next(key for key in part if key in LOCATOR_METHODS)
+        args = [repr(part[kind])] + [f"{key}={part[key]!r}" for key in LOCATOR_OPTIONS if key in part]
+        calls.append(f"{LOCATOR_METHODS[kind]}({', '.join(args)})")
+        if "nth" in part:
+            calls.append(f"nth({part['nth']!r})")
+    return ".".join(calls)
+
+def resolve_locator(page, parts):
+    """ロケータを作成する (ドライバとの通信は発生しない)"""
+    locator = page
+    for part in parts:
+        kind = next(key for key in part if key in LOCATOR_METHODS)
+        options = {key: part[key] for key in LOCATOR_OPTIONS if key in part}
+        locator = getattr(locator, LOCATOR_METHODS[kind])(part[kind], **options)
+        if "nth" in part:
+            locator = locator.nth(part["nth"])
+    return locator
+
+class PlanStep:
+    """実行計画の1ステップ"""
+
+    def __init__(self, kind, locator=None, options=None, sources=None):
+        """
+        Args:
+            kind: ステップの種類 (goto, click, fill, ...)
+            locator: ロケータの番号 (ActionPlan.locators の添字、goto と wait は None)
+            options: ステップのオプション (url, value, key, navigation, timeout など)
+            sources: 元の定義でのステップ番号 (1始まり、まとめた場合は複数)
+        """
+        self.kind = kind
+        self.locator = locator
+        self.options = options or {}
+        self.sources = sources or []
+
+    def label(self, plan):
+        """計測結果に出力するステップの説明"""
+        number = "+".join(str(source) for source in self.sources)
+        if self.locator is not None:
+            return f"#{number} {describe_locator(plan.locators[self.locator])}"
+        if self.kind == "goto":
+            return f"#{number} {self.options['url']}"
+        if self.kind == "extract":
+            return f"#{number} {self.options['selector']}"
+        return f"#{number} {self.options.get('milliseconds')}ms"
+
+class ActionPlan:
+    """
+    コンパイル済みのアクション
+
+    run_actions(page, query) を持つため、アクションモジュールと同じように実行できる。
+    """
+
+    def __init__(self, name, steps, locators, source_count=0, optimizations=None):
+        self.name = name
+        self.steps = steps
+        self.locators = locators
+        self.source_count = source_count
+        self.optimizations = optimizations or []
+
+    @property
+    def hosts(self):
+        """goto で最初にアクセスするホストから順に返す"""
+        hosts = []
+        for step in self.steps:
+            if step.kind == "goto" and "{query}" not in step.options["url"]:
+                host = urlparse(step.options["url"]).netloc
+                if host and host not in hosts:
+                    hosts.append(host)
+        return hosts
+
+    def info(self, path):
+        """アクション一覧やスケジューラで使う ActionInfo"""
+        return ActionInfo(self.name, Path(path), True, ["page", "query=None"], hosts=self.hosts)
+
+    async def run_actions(self, page, query=None):
+        """
+        計画を実行する
+
+        extract ステップで取得したレコードを yield する。
+        計測中 (timing.instrument() のブロック内) の場合は、ページ操作ではなく計画のステップ単位で所要時間を記録する。
+        """
+        recorder = current_recorder.get()
+
+        locators = [resolve_locator(page, parts) for parts in self.locators]
+        for step in self.steps:
+            if recorder is None:
+                records = await self._run_step(page, locators, step, query)
+            else:
+                async with recorder.step(step.kind, step.label(self)):
+                    with untimed():
+                        records = await self._run_step(page, locators, step, query)
+            for record in records or []:
+                yield record
+
+    async def _run_step(self, page, locators, step, query):
+        """ステップを実行する (extract の場合は取得したレコードを返す)"""
+        options = step.options
+        timeout = {"timeout": options["timeout"]} if "timeout" in options else {}
+        locator = locators[step.locator] if step.locator is not None else None
+
+        if step.kind == "goto":
+            navigation = {key: options[key] for key in ("wait_until", "timeout") if key in options}
+            await page.goto(_substitute(options["url"], query), **navigation)
+        elif step.kind == "wait":
+            await presentation_wait(page, options["milliseconds"])
+        elif step.kind == "extract":
+            return await extract_links(page, options["selector"])
+        elif step.kind == "consent":
+            await accept_consent(locator, timeout=options.get("timeout", 5000))
+        elif step.kind == "fill":
+            await locator.fill(_substitute(options["value"], query), **timeout)
+        elif step.kind == "select":
+            await locator.select_option(_substitute(options["value"], query), **timeout)
+        elif step.kind == "wait_for":
+            await locator.wait_for(state=options.get("state", "visible"), **timeout)
+        elif "navigation" in options:
+            async with page.expect_navigation(wait_until=options["navigation"]):
+                await self._interact(locator, step, timeout)
+        else:
+            await self._interact(locator, step, timeout)
+
+    async def _interact(self, locator, step, timeout):
+        if step.kind == "press":
+            await locator.press(step.options["key"], **timeout)
+        else:
+            await getattr(locator, step.kind)(**timeout)
+
+    def to_python(self):
+        """計画を同じ動作の run_actions を持つ Python のアクションファイルに変換する"""
+        imports = ["accept_consent", "presentation_wait"]
+        if any(step.kind == "extract" for step in self.steps):
+            imports.insert(1, "extract_links")
+        lines = [
+            f"from browser_base import {', '.join(imports)}",
+            "",
+            "async def run_actions(page, query=None):",
+            '    """',
+            f"    {self.name} (action_plan.py で宣言的なアクションから生成)",
+            "    ",
+            "    Args:",
+            "        page: Playwrightのページオブジェクト",
+            "        query: 検索クエリ (文字列)",
+            '    """',
+        ]
+        for index, parts in enumerate(self.locators, 1):
+            lines.append(f"    locator_{index} = page.{describe_locator(parts)}")
+        for step in self.steps:
+            lines += [f"    {line}" for line in self._python_step(step)]
+        return "\n".join(lines) + "\n"
+
+    def _python_step(self, step):
+        options = step.options
+        locator = f"locator_{step.locator + 1}" if step.locator is not None else None
+        timeout = f", timeout={options['timeout']!r}" if "timeout" in options else ""
+
+        if step.kind == "goto":
+            navigation = "".join(f", {key}={options[key]!r}" for key in ("wait_until", "timeout") if key in options)
+            return [f"await page.goto({_python_text(options['url'])}{navigation})"]
+        if step.kind == "wait":
+            return [f"await presentation_wait(page, {options['milliseconds']!r})"]
+        if step.kind == "extract":
+            return [f"for result in await extract_links(page, {options['selector']!r}):", "    yield result"]
+        if step.kind == "consent":
+            return [f"await accept_consent({locator}, timeout={options.get('timeout', 5000)!r})"]
+        if step.kind == "fill":
+            return [f"await {locator}.fill({_python_text(options['value'])}{timeout})"]
+        if step.kind == "select":
+            return [f"await {locator}.select_option({_python_text(options['value'])}{timeout})"]
+        if step.kind == "wait_for":
+            return [f"await {locator}.wait_for(state={options.get('state', 'visible')!r}{timeout})"]
+
+        if step.kind == "press":
+            call = f"await {locator}.press({options['key']!r}{timeout})"
+        else:
+            call = f"await {locator}.{step.kind}({timeout.lstrip(', ')})"
+        if "navigation" in options:
+            return [f"async with page.expect_navigation(wait_until={options['navigation']!r}):", f"    {call}"]
+        return [call]
+
+def _python_text(text):
+    if text == "{query}":
+        return 'query or ""'
+    if "{query}" in text:
+        return f"{text!r}.replace('{{query}}', query or '')"
+    return repr(text)
+
+def _parse_step(raw, number):
+    """定義の1ステップを (種類, ロケータ, オプション) に変換する"""
+    if not isinstance(raw, dict):
+        raise PlanError(f"ステップ {number}: ステップは辞書で指定してください")
+    kinds = [key for key in raw if key in STEP_OPTIONS]
+    if len(kinds) != 1:
+        raise PlanError(f"ステップ {number}: {', '.join(STEP_OPTIONS)} のいずれか1つを指定してください")
+    kind = kinds[0]
+    options = {key: value for key, value in raw.items() if key != kind}
+    unknown = set(options) - set(STEP_OPTIONS[kind])
+    if unknown:
+        raise PlanError(f"ステップ {number}: {kind} に指定できないオプションです: {', '.join(sorted(unknown))}")
+
+    value = raw[kind]
+    if kind == "goto":
+        if not isinstance(value, str):
+            raise PlanError(f"ステップ {number}: goto には URL を指定してください")
+        return kind, None, {"url": value, **options}
+    if kind == "wait":
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise PlanError(f"ステップ {number}: wait にはミリ秒を指定してください")
+        return kind, None, {"milliseconds": value}
+    if kind == "extract":
+        if not isinstance(value, str):
+            raise PlanError(f"ステップ {number}: extract にはリンクのセレクタを指定してください")
+        return kind, None, {"selector": value}
+    if kind in ("fill", "select") and not isinstance(options.get("value"), str):
+        raise PlanError(f"ステップ {number}: {kind} には value (文字列) が必要です")
+    if kind == "press" and not isinstance(options.get("key"), str):
+        raise PlanError(f"ステップ {number}: press には key が必要です")
+    return kind, _normalize_locator(value, number), options
+
+def _optimize(steps, optimizations):
+    """ステップ列を最適化する (変更がなくなるまで繰り返す)"""
+    changed = True
+    while changed:
+        changed = False
+        for index in range(len(steps) - 1):
+            current, following = steps[index], steps[index + 1]
+            same_target = current.locator is not None and current.locator == following.locator
+
+            if current.kind == "wait" and following.kind == "wait":
+                following.options["milliseconds"] += current.options["milliseconds"]
+                following.sources = current.sources + following.sources
+                merged = "+".join(str(source) for source in following.sources)
+                optimizations.append(f"#{merged}: 連続する wait をまとめました")
+            elif current.kind == "click" and following.kind == "fill" and same_target and not current.options:
+                optimizations.append(f"#{current.sources[0]}: fill の直前の click を省略しました")
+            elif (current.kind == "wait_for" and following.kind in AUTO_WAITING_STEPS and same_target
+                  and current.options.get("state", "visible") == "visible" and "timeout" not in current.options):
+                optimizations.append(f"#{current.sources[0]}: 操作の直前の wait_for を省略しました")
+            elif current.kind == "fill" and following.kind == "fill" and same_target:
+                optimizations.append(f"#{current.sources[0]}: 上書きされる fill を省略しました")
+            else:
+                continue
+            del steps[index]
+            changed = True
+            break
+    return steps
+
+def compile_plan(definition, name="plan"):
+    """
+    アクションの定義を実行計画にコンパイルする
+
+    Args:
+        definition: ステップのリスト、または steps を持つ辞書
+        name: アクション名
+
+    Returns:
+        ActionPlan (定義に誤りがある場合は PlanError を送出する)
+    """
+    if isinstance(definition, dict):
+        name = definition.get("name", name)
+        definition = definition.get("steps")
+    if not isinstance(definition, list) or not definition:
+        raise PlanError("steps にステップのリストを指定してください")
+
+    locators = []
+    keys = {}
+    steps = []
+    for number, raw in enumerate(definition, 1):
+        kind, parts, options = _parse_step(raw, number)
+        locator = None
+        if parts is not None:
+            # 同じロケータは1回だけ作成する
+            key = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+            if key not in keys:
+                keys[key] = len(locators)
+                locators.append(parts)
+            locator = keys[key]
+        steps.append(PlanStep(kind, locator, options, [number]))
+
+    optimizations = []
+    steps = _optimize(steps, optimizations)
+
+    # 省略したステップだけが使っていたロケータを除く
+    used = sorted({step.locator for step in steps if step.locator is not None})
+    renumber = {old: new for new, old in enumerate(used)}
+    for step in steps:
+        if step.locator is not None:
+            step.locator = renumber[step.locator]
+    return ActionPlan(name, steps, [locators[old] for old in used], len(definition), optimizations)
+
+def read_definition(path, source=None):
+    """YAML / JSON のアクションファイルを読み込む"""
+    path = Path(path)
+    if path.suffix not in PLAN_SUFFIXES:
+        raise PlanError(f"対応していない形式です: {path.suffix}")
+    try:
+        if source is None:
+            source = path.read_bytes()
+        text = source.decode("utf-8") if isinstance(source, bytes) else source
+    except (OSError, UnicodeDecodeError) as e:
+        raise PlanError(f"読み込めません: {e}")
+
+    if path.suffix == ".json":
+        try:
+            return json.loads(text)
+        except ValueError as e:
+            raise PlanError(f"JSON の構文エラー: {e}")
+    try:
+        import yaml
+    except ImportError:
+        raise PlanError("YAML のアクションには PyYAML が必要です (pip install pyyaml)")
+    try:
+        return yaml.safe_load(text)
+    except yaml.YAMLError as e:
+        raise PlanError(f"YAML の構文エラー: {e}")
+
+def load_plan(path, source=None):
+    """アクションファイルを読み込んで ActionPlan にコンパイルする"""
+    return compile_plan(read_definition(path, source), name=Path(path).stem)
+
+def print_plan(plan):
+    """コンパイル結果を表示する"""
+    print(f"{plan.name}: {plan.source_count}ステップ → {len(plan.steps)}ステップ, ロケータ {len(plan.locators)}個")
+    for step in plan.steps:
+        print(f"  {step.kind:<8} {step.label(plan)}")
+    for message in plan.optimizations:
+        print(f"  最適化 {message}")
+
+def main():
+    parser = argparse.ArgumentParser(description="宣言的なアクションのコンパイル結果の表示と Python への変換")
+    parser.add_argument("action_file", help="YAML / JSON のアクションファイル")
+    parser.add_argument("--export", help="変換した Python のアクションファイルの出力先 (- で標準出力)")
+    args = parser.parse_args()
+
+    try:
+        plan = load_plan(args.action_file)
+    except PlanError as e:
+        print(f"エラー: {args.action_file}: {e}")
+        sys.exit(1)
+
+    if args.export == "-":
+        sys.stdout.write(plan.to_python())
+    elif args.export:
+        Path(args.export).write_text(plan.to_python(), encoding="utf-8")
+        print(f"✅ Python のアクションファイルを作成しました: {args.export}")
+    else:
+        print_plan(plan)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import ast
+import hashlib
+import importlib.util
+import os
+import re
+from pathlib import Path
+from urllib.parse import urlparse
+
+ACTIONS_DIR = Path(__file__).parent / "actions"
+# 宣言的なアクション (action_plan.py でコンパイルする) の拡張子
+PLAN_SUFFIXES = (".yaml", ".yml", ".json")
+# アクション名に使える文字 (パスの区切りや .. で actions ディレクトリの外を指せないようにする)
+ACTION_NAME_PATTERN = re.compile(r"[\w-]+")
+
+def find_action_file(actions_dir, name):
+    """
+    アクション名からファイルのパスを返す
+
+    Python のアクションを優先し、なければ YAML / JSON のアクションを探す。
+    どれもない場合は .py のパスを返す (新規作成やエラー表示用)。
+    アクション名に英数字・アンダースコア・ハイフン以外が含まれる場合は ValueError を送出する。
+    """
+    if not isinstance(name, str) or not ACTION_NAME_PATTERN.fullmatch(name):
+        raise ValueError(f"不正なアクション名です: {name!r} (英数字・_・- のみ使用できます)")
+    actions_dir = Path(actions_dir)
+    for suffix in (".py",) + PLAN_SUFFIXES:
+        path = actions_dir / f"{name}{suffix}"
+        if path.exists():
+            return path
+    return actions_dir / f"{name}.py"
+
+class ActionInfo:
+    """アクションファイルを実行せずに調べた結果"""
+
+    def __init__(self, name, path, valid, params=None, error=None, hosts=None):
+        self.name = name
+        self.path = path
+        self.valid = valid
+        self.params = params or []
+        self.error = error
+        self.hosts = hosts or []
+
+    @property
+    def signature(self):
+        """run_actions(page, query=None) の引数部分"""
+        return f"({', '.join(self.params)})"
+
+    @property
+    def host(self):
+        """スケジューラで同時実行数を制限する単位 (最初にアクセスするホスト、不明な場合はアクション名)"""
+        return self.hosts[0] if self.hosts else self.name
+
+def find_hosts(tree):
+    """page.goto("https://...") のように文字列で書かれた URL のホストを出現順に返す"""
+    calls = [node for node in ast.walk(tree)
+             if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "goto"]
+    hosts = []
+    for node in sorted(calls, key=lambda node: (node.lineno, node.col_offset)):
+        if not node.args or not isinstance(node.args[0], ast.Constant) or not isinstance(node.args[0].value, str):
+            continue
+        host = urlparse(node.args[0].value).netloc
+        if host and host not in hosts:
+            hosts.append(host)
+    return hosts
+
+def inspect_plan(path, source=None):
+    """YAML / JSON のアクションをコンパイルして検証する"""
+    from action_plan import PlanError, load_plan
+    try:
+        return load_plan(path, source).info(path)
+    except PlanError as e:
+        return ActionInfo(Path(path).stem, Path(path), False, error=str(e))
+
+def inspect_action(path, source=None):
+    """
+    アクションファイルを AST で解析し、run_actions の定義を検証する
+
+    モジュールのコードは実行しないため、壊れたアクションや副作用のあるアクションも安全に調べられる。
+
+    Args:
+        path: アクションファイルのパス
+        source: ファイルの内容 (省略時は path から読み込む)
+
+    Returns:
+        ActionInfo
+    """
+    path = Path(path)
+    name = path.stem
+    try:
+        if source is None:
+            source = path.read_text(encoding="utf-8")
+        tree = ast.parse(source, filename=str(path))
+    except (OSError, UnicodeDecodeError) as e:
+        return ActionInfo(name, path, False, error=f"読み込めません: {e}")
+    except SyntaxError as e:
+        return ActionInfo(name, path, False, error=f"構文エラー ({e.lineno}行目): {e.msg}")
+
+    definition = None
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == "run_actions":
+            definition = node
+    if definition is None:
+        return ActionInfo(name, path, False, error="run_actions 関数が定義されていません")
+    if not isinstance(definition, ast.AsyncFunctionDef):
+        return ActionInfo(name, path, False, error="run_actions は async def で定義してください")
+
+    arguments = definition.args
+    positional = arguments.posonlyargs + arguments.args
+    defaults = [None] * (len(positional) - len(arguments.defaults)) + list(arguments.defaults)
+    params = []
+    required = 0
+    for arg, default in zip(positional, defaults):
+        if default is None:
+            required += 1
+            params.append(arg.arg)
+        else:
+            params.append(f"{arg.arg}={ast.unparse(default)}")
+    if arguments.vararg:
+        params.append(f"*{arguments.vararg.arg}")
+    params += [f"{arg.arg}={ast.unparse(default)}" if default is not None else arg.arg
+               for arg, default in zip(arguments.kwonlyargs, arguments.kw_defaults)]
+    if arguments.kwarg:
+        params.append(f"**{arguments.kwarg.arg}")
+
+    # ランナーは run_actions(page, query) と呼び出す
+    if not positional and not arguments.vararg:
+        return ActionInfo(name, path, False, params, error="run_actions には page 引数が必要です")
+    if len(positional) < 2 and not arguments.vararg:
+        return ActionInfo(name, path, False, params, error="run_actions には query 引数が必要です (例: query=None)")
+    if required > 2:
+        return ActionInfo(name, path, False, params, error="run_actions の必須引数は page と query までです")
+    if any(default is None for default in arguments.kw_defaults):
+        return ActionInfo(name, path, False, params, error="run_actions にキーワード専用の必須引数があります")
+    return ActionInfo(name, path, True, params, hosts=find_hosts(tree))
+
+class _LoadedAction:
+    def __init__(self, module, stat_key, digest, info):
+        self.module = module
+        self.stat_key = stat_key
+        self.digest = digest
+        self.info = info
+
+class ActionRegistry:
+    """
+    読み込んだアクションモジュールをメモリに保持するレジストリ
+
+    同じファイルは1回だけ実行し、以降は更新日時とサイズで変更を確認する。
+    更新日時が変わっていても内容のハッシュが同じなら再読み込みしない。
+    内容が変わっていれば AST で検証してから読み込み直す (ホットリロード)。
+    YAML / JSON のアクションは ActionPlan にコンパイルし、モジュールと同じように run_actions を提供する。
+    """
+
+    def __init__(self, actions_dir=ACTIONS_DIR):
+        self.actions_dir = Path(actions_dir)
+        self._loaded = {}
+
+    def path_for(self, name):
+        """アクション名からファイルのパスを返す"""
+        return find_action_file(self.actions_dir, name)
+
+    def load(self, action_file):
+        """
+        アクションモジュールを返す (必要な場合だけ読み込む)
+
+        Args:
+            action_file: アクションファイルのパス
+
+        Returns:
+            モジュール (ファイルがない・検証に失敗した場合はエラーを表示して None)
+        """
+        path = Path(action_file).resolve()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            print(f"エラー: アクションファイル '{action_file}' が見つかりません。")
+            self._loaded.pop(path, None)
+            return None
+
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        loaded = self._loaded.get(path)
+        if loaded is not None and loaded.stat_key == stat_key:
+            return loaded.module
+
+        source = path.read_bytes()
+        digest = hashlib.sha256(source).hexdigest()
+        if loaded is not None and loaded.digest == digest:
+            loaded.stat_key = stat_key
+            return loaded.module
+
+        if path.suffix in PLAN_SUFFIXES:
+            from action_plan import PlanError, load_plan
+            try:
+                module = load_plan(path, source)
+            except PlanError as e:
+                print(f"エラー: {action_file}: {e}")
+                return None
+            info = module.info(path)
+        else:
+            info = inspect_action(path, source)
+            if not info.valid:
+                print(f"エラー: {action_file}: {info.error}")
+                return None
+
+            try:
+                module = self._exec_module(path)
+            except Exception as e:
+                print(f"エラー: {action_file} の読み込みに失敗しました: {str(e)}")
+                return None
+        self._loaded[path] = _LoadedAction(module, stat_key, digest, info)
+        return module
+
+    def info(self, action_file):
+        """読み込み済みのアクションの ActionInfo (読み込めない場合は None)"""
+        if self.load(action_file) is None:
+            return None
+        return self._loaded[Path(action_file).resolve()].info
+
+    def digest(self, action_file):
+        """アクションファイルの内容のハッシュ (SHA-256)"""
+        path = Path(action_file).resolve()
+        loaded = self._loaded.get(path)
+        if loaded is not None:
+            stat = os.stat(path)
+            if loaded.stat_key == (stat.st_mtime_ns, stat.st_size):
+                return loaded.digest
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+
+    def list(self):
+        """actions ディレクトリのアクションを実行せずに調べる"""
+        if not self.actions_dir.exists():
+            return []
+        paths = [path for path in self.actions_dir.iterdir() if path.suffix in (".py",) + PLAN_SUFFIXES]
+        return [inspect_plan(path) if path.suffix in PLAN_SUFFIXES else inspect_action(path)
+                for path in sorted(paths)]
+
+    def _exec_module(self, path):
+        spec = importlib.util.spec_from_file_location(path.stem, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
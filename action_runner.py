@@ -1,12 +1,216 @@
 import asyncio
 import argparse
-import importlib.util
+import inspect
 import os
 import sys
+import time
+from contextlib import asynccontextmanager, nullcontext
 from pathlib import Path
-from browser_base import BrowserAutomationBase
+from action_registry import ActionRegistry
+from browser_base import BrowserAutomationBase, fast_mode
+from browser_pool import BrowserPool
+from network import NetworkRouter, ResponseCache
+from page_reuse import ISOLATION_LEVELS, PageReusePolicy
+from profiling import ProfilingPolicy, ScenarioProfiler, print_profile_summary
+from recording import RecordingPolicy
+from resource_monitor import ResourceMonitor, print_resource_summary
+from result_cache import ResultCache
+from result_pipeline import open_pipeline, open_sink
+from runner_client import DEFAULT_SOCKET
+from scheduler import HostScheduler, RetryPolicy, TransientHTTPError
+from session_state import SessionSnapshot, SessionTracker, current_session
+from video_finalizer import VideoFinalizer
+from timing import TimingRecorder, instrument, print_summary, timed_phase, write_report
 
-async def run_scenario(action_file, query=None, slowmo=0, headless=False, countdown=5):
+# 読み込んだアクションモジュールはプロセス内で再利用する
+registry = ActionRegistry()
+
+def load_action_module(action_file):
+    """
+    アクションファイルを読み込んでモジュールを返す
+    
+    同じファイルは1回だけ実行し、内容が変わった場合のみ読み込み直す。
+    
+    Args:
+        action_file: アクションファイルのパス
+    
+    Returns:
+        読み込んだモジュール (失敗時は None)
+    """
+    return registry.load(action_file)
+
+@asynccontextmanager
+async def open_automation(pool=None, headless=False, slowmo=0, recording=None, network=None, timings=None,
+                          session=None, video_finalizer=None):
+    """
+    シナリオ実行用の BrowserAutomationBase を用意する
+    
+    pool が指定されていればプールから準備済みのコンテキストを借り、
+    指定されていなければブラウザを起動して終了時に解放する。
+    timings を指定すると、起動・貸し出し・解放の所要時間を記録する。
+    """
+    if pool is not None:
+        release_started = None
+        try:
+            acquire_started = time.perf_counter()
+            async with pool.acquire() as automation:
+                if timings is not None:
+                    timings.add("phase", "pool_acquire", acquire_started)
+                try:
+                    yield automation
+                finally:
+                    release_started = time.perf_counter()
+        finally:
+            if timings is not None and release_started is not None:
+                timings.add("phase", "pool_release", release_started)
+        return
+    
+    automation = BrowserAutomationBase(
+        headless=headless,
+        slowmo=slowmo,
+        recording=recording,
+        network=network,
+        timings=timings,
+        session=session,
+        video_finalizer=video_finalizer
+    )
+    try:
+        await automation.setup()
+        yield automation
+    finally:
+        await automation.cleanup()
+
+def _watch_document_status(page):
+    """
+    ページの読み込みで返された 429 / 5xx を記録する
+
+    Returns:
+        (記録したレスポンスのリスト, リスナーを外す関数)
+    """
+    failures = []
+    
+    def on_response(response):
+        if response.status == 429 or response.status >= 500:
+            if response.request.resource_type == "document":
+                failures.append(response)
+    
+    page.on("response", on_response)
+    return failures, lambda: page.remove_listener("response", on_response)
+
+async def _collect_records(outcome):
+    """
+    run_actions の戻り値を実行し、yield されたレコードを集める
+    
+    run_actions が通常の async def の場合は空のリストを返す。
+    """
+    if not inspect.isasyncgen(outcome):
+        await outcome
+        return []
+    records = []
+    async for record in outcome:
+        records.append(record if isinstance(record, dict) else {"value": record})
+    return records
+
+async def _execute_scenario(action_module, action_file, query, slowmo, headless, countdown, pool, recording,
+                            network, timings, session, profiling, video_finalizer):
+    """シナリオを1回実行し、yield されたレコードを返す (失敗時は例外を送出する)"""
+    label = f"{Path(action_file).stem}_{query}" if query else Path(action_file).stem
+    # ブラウザを設定
+    async with open_automation(pool, headless=headless, slowmo=slowmo, recording=recording, network=network,
+                               timings=timings, session=session, video_finalizer=video_finalizer) as automation:
+        # コンテキストを再利用する場合、動画には最初のシナリオの名前を付ける
+        if automation.video_label is None:
+            automation.video_label = label
+        # アクション内の accept_consent() がスナップショットの適用状況を参照する
+        tracker = None
+        if automation.session is not None or automation.cookies_retained:
+            # 前のシナリオのクッキーを引き継いだ場合も同意済みとみなし、バナーの表示を待たない
+            tracker = SessionTracker(automation.session, automation.session_applied or automation.cookies_retained)
+        session_token = current_session.set(tracker)
+        # 失敗の原因がサーバーの 429 / 5xx であれば再試行の対象にする
+        status_failures, stop_watching = _watch_document_status(automation.page)
+        # 対象に選ばれたシナリオ (slow_ms 指定時は全シナリオのトレース) だけを記録する
+        profiler = ScenarioProfiler.for_scenario(profiling, automation, timings, label)
+        if profiler is not None:
+            await profiler.start()
+        try:
+            # 自動操作インジケータを表示
+            with timed_phase(timings, "automation_indicator"):
+                await automation.show_automation_indicator()
+            
+            # アクションを実行 (計測時はページ操作ごとの所要時間を記録する)
+            # slow_ms の判定にはインジケータやカウントダウンを含めず、run_actions の所要時間だけを使う
+            measured = profiler.measure() if profiler is not None else nullcontext()
+            with timed_phase(timings, "run_actions"), measured:
+                try:
+                    with instrument(timings):
+                        records = await _collect_records(action_module.run_actions(automation.page, query))
+                except Exception as e:
+                    if status_failures:
+                        response = status_failures[-1]
+                        retry_after = response.headers.get("retry-after")
+                        raise TransientHTTPError(
+                            response.status,
+                            response.url,
+                            retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+                        ) from e
+                    raise
+            
+            # 初回または同意バナーが再表示された場合はスナップショットを保存し直す
+            if tracker is not None and tracker.needs_save:
+                with timed_phase(timings, "session_save"):
+                    await tracker.snapshot.save(automation.context)
+            
+            # 終了カウントダウン
+            if countdown is not None:
+                with timed_phase(timings, "countdown"):
+                    await automation.show_countdown_overlay(seconds=countdown)
+            return records
+        except Exception:
+            await automation.capture_failure(Path(action_file).stem)
+            raise
+        finally:
+            if profiler is not None:
+                await profiler.stop()
+            stop_watching()
+            current_session.reset(session_token)
+
+async def _write_records(output, action_name, query, records):
+    """レコードに action と query を付けて書き込む (output が None の場合は何もしない)"""
+    if output is None:
+        return
+    for record in records:
+        await output.put({"action": action_name, "query": query, **record})
+
+async def serve_cached(result_cache, action_file, query, output=None, timings=None):
+    """
+    キャッシュ済みの結果があれば、ブラウザを使わずにレコードを書き込む
+    
+    Args:
+        result_cache: ResultCache
+        action_file: アクションファイルのパス
+        query: 検索クエリ文字列
+        output: レコードの書き込み先 (ResultPipeline)
+        timings: キャッシュを使った場合に result_cache_hit を記録する TimingRecorder
+    
+    Returns:
+        キャッシュを使った場合は True
+    """
+    action_name = Path(action_file).stem
+    started = time.perf_counter()
+    cached = result_cache.get(action_name, query, registry.digest(action_file))
+    if cached is None:
+        return False
+    records, age = cached
+    if timings is not None:
+        timings.add("phase", "result_cache_hit", started)
+    print(f"💾 キャッシュ済みの結果を使用します: {action_name}: {query} ({len(records)}件, {age / 60:.0f}分前)")
+    await _write_records(output, action_name, query, records)
+    return True
+
+async def run_scenario(action_file, query=None, slowmo=0, headless=False, countdown=5, pool=None,
+                       recording=None, fast=False, network=None, timings=None, session=None, scheduler=None,
+                       output=None, result_cache=None, profiling=None, video_finalizer=None, lookup_cache=True):
     """
     指定されたアクションファイルを使用してブラウザ自動化シナリオを実行
     
@@ -15,37 +219,51 @@ async def run_scenario(action_file, query=None, slowmo=0, headless=False, countd
         query: 検索クエリ文字列
         slowmo: スローモーションの時間 (ミリ秒)
         headless: ヘッドレスモードで実行するかどうか
-        countdown: カウントダウン時間 (秒)
+        countdown: カウントダウン時間 (秒)。None の場合はカウントダウンを表示しない
+        pool: ブラウザプール (指定時はプールのコンテキストを使用する)
+        recording: 録画ポリシー (off, always, on-failure, sampled:N%)
+        fast: 高速モード (インジケータ・カウントダウン・表示用の待機を省略する)
+        network: リクエストのブロック・キャッシュ・HAR 再生を行う NetworkRouter
+        timings: 各フェーズとページ操作の所要時間を記録する TimingRecorder
+        session: 同意バナーなどを省略するためのストレージ状態のスナップショット (SessionSnapshot)。
+            プール使用時はプール側の設定が使われる
+        scheduler: ホストごとの同時実行数・レート制限・再試行を行う HostScheduler
+        output: run_actions が yield したレコードの書き込み先 (ResultPipeline)。
+            レコードはシナリオが成功した場合だけ、action と query を付けて書き込まれる
+        result_cache: 成功した結果を保存・再利用する ResultCache。
+            キャッシュにあればブラウザを使わずに結果を返し、timings に result_cache_hit を記録する
+        lookup_cache: False の場合は result_cache を参照せず、結果の保存だけを行う
+            (呼び出し元で確認済みのクエリを二重に問い合わせないため)
+        profiling: トレースとステップごとの内訳を記録するシナリオを選ぶ ProfilingPolicy。
+            内訳は timings のステップの記録に追加される
+        video_finalizer: 録画したコンテキストの終了と動画の書き出しをバックグラウンドで行う VideoFinalizer。
+            プール使用時はプール側の設定が使われる
     """
     # アクションモジュールの動的読み込み
-    if not os.path.exists(action_file):
-        print(f"エラー: アクションファイル '{action_file}' が見つかりません。")
+    action_module = load_action_module(action_file)
+    if action_module is None:
         return False
     
-    module_name = Path(action_file).stem
-    spec = importlib.util.spec_from_file_location(module_name, action_file)
-    action_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(action_module)
+    action_name = Path(action_file).stem
+    if result_cache is not None and lookup_cache and await serve_cached(result_cache, action_file, query, output, timings):
+        return True
     
-    if not hasattr(action_module, "run_actions"):
-        print(f"エラー: {action_file} に run_actions 関数が定義されていません。")
-        return False
+    async def attempt():
+        return await _execute_scenario(action_module, action_file, query, slowmo, headless, countdown, pool,
+                                recording, network, timings, session, profiling, video_finalizer)
     
-    # ブラウザ自動化の準備
-    automation = BrowserAutomationBase(headless=headless, slowmo=slowmo)
+    # 高速モードはアクション内の presentation_wait() にも伝わる
+    fast_token = fast_mode.set(fast)
     try:
-        # ブラウザを設定
-        page = await automation.setup()
-        
-        # 自動操作インジケータを表示
-        await automation.show_automation_indicator()
-        
-        # アクションを実行
-        await action_module.run_actions(page, query)
-        
-        # 終了カウントダウン
-        await automation.show_countdown_overlay(seconds=countdown)
-        
+        if scheduler is not None:
+            records = await scheduler.run(registry.info(action_file).host, attempt)
+        else:
+            records = await attempt()
+        # 再試行した場合に途中までのレコードが重複しないよう、成功してから書き込む
+        await _write_records(output, action_name, query, records)
+        if result_cache is not None:
+            # アクションファイルを変更した場合は以前の結果を使わない
+            result_cache.put(action_name, query, registry.digest(action_file), records)
         return True
     except Exception as e:
         print(f"エラー: {str(e)}")
@@ -53,20 +271,273 @@ async def run_scenario(action_file, query=None, slowmo=0, headless=False, countd
         traceback.print_exc()
         return False
     finally:
-        # リソース解放
-        await automation.cleanup()
+        fast_mode.reset(fast_token)
+
+async def run_with_output(action_file, sink=None, output_batch=500, **options):
+    """
+    run_scenario() を実行し、yield されたレコードを sink に書き込む
+    
+    Args:
+        action_file: アクションファイルのパス
+        sink: レコードの出力先 (result_pipeline.open_sink() の戻り値、None の場合は出力しない)
+        output_batch: 出力先にまとめて書き込むレコード数
+        options: run_scenario() に渡す引数
+    """
+    async with open_pipeline(sink, output_batch) as output:
+        return await run_scenario(action_file, output=output, **options)
+
+def read_queries_file(queries_file):
+    """
+    クエリファイルを読み込む (1行1クエリ、空行と # で始まる行は無視)
+    
+    Args:
+        queries_file: クエリファイルのパス
+    """
+    queries = []
+    with open(queries_file, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                queries.append(line)
+    return queries
+
+async def run_batch(action_file, queries, concurrency=4, slowmo=0, headless=False, recording=None,
+                    fast=False, network=None, session=None, scheduler=None, sink=None, output_batch=500,
+                    result_cache=None, monitor=None, profiling=None, video_finalizer=None, reuse=None):
+    """
+    1つのブラウザを共有し、複数のクエリを並列に実行する
+    
+    ブラウザプールから最大 concurrency 個のコンテキストを借りてワーカーで処理する。
+    コンテキストは返却時にクッキーを消去して再利用される。
+    result_cache にあるクエリは先に結果を返し、残りがなければブラウザを起動しない。
+    バッチモードではカウントダウンは表示しない。
+    
+    Args:
+        action_file: アクションファイルのパス
+        queries: 検索クエリのリスト
+        concurrency: 同時に実行するコンテキスト数
+        slowmo: スローモーションの時間 (ミリ秒)
+        headless: ヘッドレスモードで実行するかどうか
+        recording: 録画ポリシー (off, always, on-failure, sampled:N%)
+        fast: 高速モード (インジケータと表示用の待機を省略する)
+        network: リクエストのブロック・キャッシュ・HAR 再生を行う NetworkRouter
+        session: 同意バナーなどを省略するためのストレージ状態のスナップショット (SessionSnapshot)
+        scheduler: ホストごとの同時実行数・レート制限・再試行を行う HostScheduler
+        sink: run_actions が yield したレコードの出力先 (result_pipeline.open_sink() の戻り値)
+        output_batch: 出力先にまとめて書き込むレコード数
+        result_cache: 成功した結果を保存・再利用する ResultCache
+        monitor: メモリと CPU を記録し、しきい値でコンテキスト・ブラウザを作り直す ResourceMonitor
+        profiling: トレースとステップごとの内訳を記録するシナリオを選ぶ ProfilingPolicy
+        video_finalizer: 録画したコンテキストの終了と動画の書き出しをバックグラウンドで行う VideoFinalizer
+        reuse: シナリオの合間のコンテキストとページのリセット方法 (PageReusePolicy)
+    
+    Returns:
+        クエリごとの結果 (query, success, cached, elapsed, timings, resources) のリスト
+    """
+    if load_action_module(action_file) is None:
+        return []
+    
+    results = [None] * len(queries)
+    job_queue = asyncio.Queue()
+    
+    def record_result(index, query, success, cached, elapsed, timings):
+        results[index] = {
+            "query": query,
+            "success": success,
+            "cached": cached,
+            "elapsed": elapsed,
+            "timings": timings.records,
+            # 前回以降のリソースの記録 (時系列としてレポートに出力する)
+            "resources": monitor.drain() if monitor is not None else []
+        }
+        mark = "💾" if cached else "✅" if success else "❌"
+        print(f"{mark} [{index + 1}/{len(queries)}] {query} ({elapsed:.2f}秒)")
+    
+    async def worker():
+        while True:
+            try:
+                index, query = job_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            timings = TimingRecorder(action=Path(action_file).stem, query=query)
+            started = time.perf_counter()
+            success = await run_scenario(
+                action_file,
+                query=query,
+                slowmo=slowmo,
+                headless=headless,
+                countdown=None,
+                pool=pool,
+                fast=fast,
+                timings=timings,
+                scheduler=scheduler,
+                output=output,
+                result_cache=result_cache,
+                profiling=profiling,
+                # キャッシュは事前に確認済み
+                lookup_cache=False
+            )
+            elapsed = time.perf_counter() - started
+            record_result(index, query, success, timings.has("phase", "result_cache_hit"), elapsed, timings)
+    
+    started = time.perf_counter()
+    async with open_pipeline(sink, output_batch) as output:
+        # キャッシュ済みのクエリはブラウザを起動せずに結果を返す
+        for index, query in enumerate(queries):
+            timings = TimingRecorder(action=Path(action_file).stem, query=query)
+            lookup_started = time.perf_counter()
+            if result_cache is not None and await serve_cached(result_cache, action_file, query, output, timings):
+                record_result(index, query, True, True, time.perf_counter() - lookup_started, timings)
+            else:
+                job_queue.put_nowait((index, query))
+        
+        if not job_queue.empty():
+            # ブラウザは1回だけ起動し、ワーカー数分のコンテキストを事前に用意する
+            worker_count = max(1, min(concurrency, job_queue.qsize()))
+            pool = BrowserPool(
+                headless=headless,
+                slowmo=slowmo,
+                max_size=worker_count,
+                min_idle=worker_count,
+                recording=recording,
+                network=network,
+                session=session,
+                monitor=monitor,
+                video_finalizer=video_finalizer,
+                reuse=reuse
+            )
+            async with pool:
+                await asyncio.gather(*(worker() for _ in range(worker_count)))
+            if monitor is not None:
+                results[-1]["resources"].extend(monitor.drain())
+    
+    print_batch_summary(results, time.perf_counter() - started)
+    return results
+
+async def run_sequence(action_file, queries, reuse=None, **options):
+    """
+    1つのコンテキストの1つのページを使い回し、クエリを順番に実行する
+    
+    クエリごとにコンテキストとページを作らないため、HTTP キャッシュ・コンパイル済みの JS・接続を引き継げる。
+    シナリオの合間は reuse に従ってオーバーレイの除去・ストレージの消去・ベース URL への移動だけを行い、
+    reuse.recycle_every 件ごとにコンテキストを作り直す。
+    
+    Args:
+        action_file: アクションファイルのパス
+        queries: 検索クエリのリスト (この順に実行する)
+        reuse: リセット方法 (PageReusePolicy、None の場合は分離レベル page)
+        **options: run_batch() の concurrency 以外の引数
+    
+    Returns:
+        run_batch() と同じ形式の結果のリスト
+    """
+    if reuse is None:
+        reuse = PageReusePolicy("page")
+    video_finalizer = options.get("video_finalizer")
+    if video_finalizer is not None and video_finalizer.per_scenario and reuse.isolation != "context":
+        raise ValueError("シナリオごとの録画 (per_scenario) ではコンテキストを使い回せません")
+    print(f"📄 1つのページで {len(queries)}件を順番に実行します "
+          f"(分離レベル: {reuse}, {reuse.recycle_every}件ごとにコンテキストを作り直し)")
+    return await run_batch(action_file, queries, concurrency=1, reuse=reuse, **options)
+
+def print_batch_summary(results, total_elapsed):
+    """バッチ実行の結果とスループットを表示"""
+    succeeded = sum(1 for result in results if result and result["success"])
+    failed = [result for result in results if result and not result["success"]]
+    cached = sum(1 for result in results if result and result.get("cached"))
+    throughput = len(results) / total_elapsed if total_elapsed > 0 else 0.0
+    
+    print(f"\nバッチ実行結果: 成功 {succeeded}/{len(results)}件 (うちキャッシュ {cached}件), 失敗 {len(failed)}件")
+    print(f"合計時間: {total_elapsed:.2f}秒, スループット: {throughput:.2f}件/秒")
+    for result in failed:
+        label = f"{result['action']}: {result['query']}" if "action" in result else result["query"]
+        print(f"  失敗: {label}")
+
+def finish_report(results, report=None):
+    """
+    バッチ実行の計測結果を集計・出力し、終了コードを返す
+    
+    Args:
+        results: run_batch() または run_sharded() の結果
+        report: 計測結果の出力先 (.jsonl または .csv、None の場合は出力しない)
+    """
+    records = [record for result in results for record in result.get("timings", [])]
+    records += [record for result in results for record in result.get("resources", [])]
+    print_summary(records)
+    print_profile_summary(records)
+    print_resource_summary(records)
+    if report:
+        write_report(records, report)
+        print(f"📝 計測結果を保存しました: {report}")
+    if results and all(result["success"] for result in results):
+        return 0
+    return 1
+
+def build_network_router(block=None, block_urls=None, cache_dir=None, cache_ttl=3600, cache_max_mb=200,
+                         har=None, har_mode="replay"):
+    """
+    コマンドラインオプションから NetworkRouter を作成する (何も指定されていなければ None)
+    
+    Args:
+        block: ブロックするリソースの種類 (カンマ区切り、例: "image,font,media")
+        block_urls: ブロックする URL パターンのリスト
+        cache_dir: 静的リソースキャッシュの保存先
+        cache_ttl: キャッシュの有効期限 (秒)
+        cache_max_mb: キャッシュの最大サイズ (MB)
+        har: HAR ファイルのパス
+        har_mode: HAR の利用モード (record または replay)
+    """
+    resource_types = [name.strip() for name in (block or "").split(",") if name.strip()]
+    if not (resource_types or block_urls or cache_dir or har):
+        return None
+    
+    cache = None
+    if cache_dir:
+        cache = ResponseCache(cache_dir, ttl=cache_ttl, max_bytes=cache_max_mb * 1024 * 1024)
+    return NetworkRouter(
+        block_resource_types=resource_types,
+        block_url_patterns=block_urls or [],
+        cache=cache,
+        har_path=har,
+        har_mode=har_mode
+    )
+
+def build_scheduler(host_concurrency=None, rate=None, retries=0, retry_delay=1.0, adaptive=True):
+    """
+    コマンドラインオプションから HostScheduler を作成する (何も指定されていなければ None)
+    
+    Args:
+        host_concurrency: ホストごとの同時実行数の上限
+        rate: ホストごとの1秒あたりのシナリオ開始数
+        retries: 一時的な失敗を再試行する回数
+        retry_delay: 1回目の再試行までの待ち時間 (秒)
+        adaptive: 失敗やレイテンシに応じて同時実行数を調整するかどうか
+    """
+    if host_concurrency is None and rate is None and not retries:
+        return None
+    return HostScheduler(
+        max_per_host=host_concurrency or 4,
+        rate=rate,
+        retry=RetryPolicy(max_attempts=retries + 1, base_delay=retry_delay),
+        adaptive=adaptive
+    )
 
 def create_action_template(action_name):
     """新しいアクションファイルのテンプレートを作成"""
-    actions_dir = Path(__file__).parent / "actions"
-    actions_dir.mkdir(exist_ok=True)
+    registry.actions_dir.mkdir(exist_ok=True)
     
-    file_path = actions_dir / f"{action_name}.py"
+    try:
+        file_path = registry.path_for(action_name)
+    except ValueError as e:
+        print(f"エラー: {e}")
+        return
     if file_path.exists():
         print(f"警告: {file_path} はすでに存在します。上書きせずに終了します。")
         return
     
-    template = '''async def run_actions(page, query=None):
+    template = '''from browser_base import extract_links, presentation_wait
+
+async def run_actions(page, query=None):
     """
     ブラウザ自動化アクション
     
@@ -81,10 +552,16 @@ def create_action_template(action_name):
     # 検索クエリを使用する例
     if query:
         await page.fill("input[name=q]", query)
-        await page.press("input[name=q]", "Enter")
+        # 検索結果ページの読み込み完了を待つ
+        async with page.expect_navigation(wait_until="domcontentloaded"):
+            await page.press("input[name=q]", "Enter")
+    
+    # 結果を --output に出力する場合は、レコード (dict) を yield する
+    # for result in await extract_links(page, "article h2 a"):
+    #     yield result
     
-    # 結果を表示する時間
-    await page.wait_for_timeout(5000)
+    # 結果を表示する時間 (--fast 指定時は待機しない)
+    await presentation_wait(page, 5000)
 '''
     
     with open(file_path, "w") as f:
@@ -94,23 +571,27 @@ def create_action_template(action_name):
     print("このファイルを編集して、playwrightのcodegenで生成したコードを貼り付けてください。")
 
 def list_actions():
-    """利用可能なアクションファイルを一覧表示"""
-    actions_dir = Path(__file__).parent / "actions"
-    if not actions_dir.exists():
+    """利用可能なアクションファイルを一覧表示 (アクションのコードは実行しない)"""
+    if not registry.actions_dir.exists():
         print("アクションディレクトリが見つかりません。")
         return
     
-    action_files = list(actions_dir.glob("*.py"))
-    if not action_files:
+    actions = registry.list()
+    if not actions:
         print("アクションファイルが見つかりません。")
         return
     
-    print(f"\n利用可能なアクションファイル ({len(action_files)}個):")
-    for i, file_path in enumerate(action_files):
-        print(f"{i+1}. {file_path.stem}")
+    print(f"\n利用可能なアクションファイル ({len(actions)}個):")
+    for i, info in enumerate(actions):
+        if info.valid:
+            print(f"{i+1}. ✅ {info.name} {info.signature}")
+        else:
+            print(f"{i+1}. ❌ {info.name} - {info.error}")
     
-    print("\n使用例:")
-    print(f"python {Path(__file__).name} --action {action_files[0].stem} --query 'テスト検索'")
+    valid_actions = [info for info in actions if info.valid]
+    if valid_actions:
+        print("\n使用例:")
+        print(f"python {Path(__file__).name} --action {valid_actions[0].name} --query 'テスト検索'")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="ブラウザ自動化アクションランナー")
@@ -119,29 +600,309 @@ if __name__ == "__main__":
     parser.add_argument("--slowmo", type=int, default=0, help="スロー実行の時間 (ミリ秒)")
     parser.add_argument("--headless", action="store_true", help="ヘッドレスモードで実行")
     parser.add_argument("--countdown", type=int, default=5, help="終了カウントダウン時間 (秒)")
+    parser.add_argument("--queries-file", help="バッチ実行するクエリファイル (1行1クエリ)")
+    parser.add_argument("--concurrency", type=int, default=4, help="バッチ実行時の同時実行数 (プロセスごと)")
+    parser.add_argument("--jobs-file", help="複数アクションのジョブファイル (1行に「アクション名<TAB>クエリ」)")
+    parser.add_argument("--processes", type=int, help="バッチ実行を分散するワーカープロセス数")
+    parser.add_argument("--fast", action="store_true",
+                        help="高速モード (インジケータ・カウントダウン・表示用の待機を省略)")
+    parser.add_argument("--record", default=os.environ.get("RECORDING_MODE", "always"),
+                        help="録画モード: off, always, on-failure, sampled:N%% (環境変数 RECORDING_MODE でも指定可)")
+    parser.add_argument("--block", help="ブロックするリソースの種類 (カンマ区切り、例: image,font,media)")
+    parser.add_argument("--block-url", action="append", default=[],
+                        help="ブロックする URL パターン (fnmatch 形式、複数指定可)")
+    parser.add_argument("--response-cache", help="静的リソースをキャッシュするディレクトリ")
+    parser.add_argument("--cache-ttl", type=int, default=3600, help="レスポンスキャッシュの有効期限 (秒)")
+    parser.add_argument("--cache-max-mb", type=int, default=200, help="レスポンスキャッシュの最大サイズ (MB)")
+    parser.add_argument("--har", help="通信を記録・再生する HAR ファイル")
+    parser.add_argument("--har-mode", choices=["record", "replay"], default="replay",
+                        help="HAR の利用モード (record: 記録, replay: オフライン再生)")
+    parser.add_argument("--video-max-mb", type=int, help="録画の保存先の合計の最大サイズ (MB、超えると古いものから削除)")
+    parser.add_argument("--video-max-age", type=int, help="録画を残す期間 (秒)")
+    parser.add_argument("--video-scale", type=int, help="録画を ffmpeg で再エンコードするときの幅 (ピクセル)")
+    parser.add_argument("--video-crf", type=int, help="録画を ffmpeg で再エンコードするときの品質 (VP9 の CRF)")
+    parser.add_argument("--video-jobs", type=int, default=2, help="同時に実行する ffmpeg のプロセス数")
+    parser.add_argument("--video-per-scenario", action="store_true",
+                        help="録画したコンテキストを再利用せず、シナリオごとに1つの動画にする "
+                             "(コンテキストを毎回作り直すため、バッチ実行のスループットが下がる)")
+    parser.add_argument("--reuse-page", action="store_true",
+                        help="クエリファイルのクエリを1つのページで順番に実行する (コンテキストを作り直さない)")
+    parser.add_argument("--isolation", choices=ISOLATION_LEVELS,
+                        help="シナリオの合間にリセットする範囲 (--reuse-page 時の既定は page、それ以外は storage)")
+    parser.add_argument("--recycle-every", type=int, help="コンテキストを作り直すまでのシナリオ数 (デフォルト: 50)")
+    parser.add_argument("--base-url", help="シナリオの合間に移動する URL")
+    parser.add_argument("--clear-storage", help="シナリオの合間に消去するストレージ (local,session の組み合わせ)")
+    parser.add_argument("--host-concurrency", type=int, help="ホストごとの同時実行数の上限 (プロセスごと)")
+    parser.add_argument("--rate", type=float, help="ホストごとの1秒あたりのシナリオ開始数の上限 (プロセスごと)")
+    parser.add_argument("--retries", type=int, default=0,
+                        help="一時的な失敗 (ナビゲーションのタイムアウト・通信エラー・429/5xx) を再試行する回数")
+    parser.add_argument("--retry-delay", type=float, default=1.0, help="1回目の再試行までの待ち時間 (秒、以降は倍々)")
+    parser.add_argument("--no-adaptive", dest="adaptive", action="store_false",
+                        help="失敗やレイテンシの悪化に応じた同時実行数の自動調整を無効にする")
+    parser.add_argument("--output", help="アクションが yield したレコードの出力先 (.jsonl / .csv / .parquet / .arrow)")
+    parser.add_argument("--output-batch", type=int, default=500, help="出力先にまとめて書き込むレコード数")
+    parser.add_argument("--result-cache", help="成功したシナリオの結果を保存・再利用する SQLite ファイル")
+    parser.add_argument("--result-cache-ttl", type=int, default=86400, help="結果キャッシュの有効期限 (秒)")
+    parser.add_argument("--result-cache-max-mb", type=int, default=100, help="結果キャッシュの最大サイズ (MB)")
+    parser.add_argument("--max-age", type=int, help="この実行で使うキャッシュ済みの結果の最大経過時間 (秒)")
+    parser.add_argument("--refresh", action="store_true", help="キャッシュ済みの結果を使わずに実行し直す")
+    parser.add_argument("--monitor-interval", type=float,
+                        help="ブラウザのメモリと CPU を記録する間隔 (秒、バッチ・デーモン実行時)")
+    parser.add_argument("--max-context-heap-mb", type=float, help="コンテキストを作り直す JS ヒープの使用量 (MB)")
+    parser.add_argument("--max-browser-rss-mb", type=float, help="ブラウザを再起動する Chromium プロセスの RSS の合計 (MB)")
+    parser.add_argument("--profile", default="off",
+                        help="トレースとステップごとの内訳を記録するシナリオ (off, always, sampled:N%%)")
+    parser.add_argument("--profile-slow-ms", type=float,
+                        help="run_actions の所要時間がこの値 (ミリ秒) を超えたシナリオのトレースも保存する")
+    parser.add_argument("--profile-dir", default="./tmp/traces", help="トレースの保存先")
+    parser.add_argument("--report", help="フェーズ・ステップごとの所要時間の出力先 (.jsonl または .csv)")
+    parser.add_argument("--session", help="同意バナーなどの状態を保存・再利用するスナップショット名")
+    parser.add_argument("--prime", action="store_true", help="スナップショットを破棄して取り直す")
+    parser.add_argument("--session-dir", default="./tmp/session_state", help="スナップショットの保存先")
+    parser.add_argument("--session-max-age", type=int, default=86400, help="スナップショットの有効期限 (秒)")
+    parser.add_argument("--daemon", action="store_true", help="ブラウザを起動したままジョブを待ち受けるデーモンとして実行")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="デーモンの Unix ソケット")
+    parser.add_argument("--port", type=int, help="デーモンの TCP ポート (指定時は Unix ソケットの代わりに使用)")
+    parser.add_argument("--max-queue", type=int, default=100, help="デーモンが待機させるジョブの最大数")
     parser.add_argument("--new", help="新しいアクションテンプレートを作成")
     parser.add_argument("--list", action="store_true", help="利用可能なアクションを一覧表示")
     
     args = parser.parse_args()
     
-    if args.new:
+    try:
+        RecordingPolicy.parse(args.record)
+        profiling = ProfilingPolicy.parse(args.profile, slow_ms=args.profile_slow_ms, trace_dir=args.profile_dir)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    # HAR はコンテキストを閉じるときに書き出されるため、コンテキストが1つの単発実行でのみ記録できる
+    if args.har and args.har_mode == "record" and (args.daemon or args.jobs_file or args.queries_file):
+        parser.error("--har-mode record は --query による単発実行でのみ指定できます")
+    
+    sink = None
+    if args.output and (args.daemon or args.jobs_file or args.action):
+        try:
+            sink = open_sink(args.output)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    network = build_network_router(
+        block=args.block,
+        block_urls=args.block_url,
+        cache_dir=args.response_cache,
+        cache_ttl=args.cache_ttl,
+        cache_max_mb=args.cache_max_mb,
+        har=args.har,
+        har_mode=args.har_mode
+    )
+    
+    scheduler = build_scheduler(
+        host_concurrency=args.host_concurrency,
+        rate=args.rate,
+        retries=args.retries,
+        retry_delay=args.retry_delay,
+        adaptive=args.adaptive
+    )
+    
+    result_cache = None
+    if args.result_cache:
+        result_cache = ResultCache(
+            args.result_cache,
+            ttl=args.result_cache_ttl,
+            max_bytes=args.result_cache_max_mb * 1024 * 1024,
+            max_age=args.max_age,
+            refresh=args.refresh
+        )
+    
+    video_finalizer = VideoFinalizer(
+        max_bytes=args.video_max_mb * 1024 * 1024 if args.video_max_mb is not None else None,
+        max_age=args.video_max_age,
+        scale=args.video_scale,
+        crf=args.video_crf,
+        jobs=args.video_jobs,
+        per_scenario=args.video_per_scenario
+    )
+    
+    reuse = None
+    if args.reuse_page or args.isolation or args.recycle_every is not None or args.base_url or args.clear_storage:
+        if args.reuse_page and (args.processes or not args.queries_file):
+            parser.error("--reuse-page は --queries-file と一緒に、--processes なしで指定してください")
+        if args.reuse_page and args.video_per_scenario:
+            parser.error("--reuse-page はページを使い回すため、--video-per-scenario と一緒には指定できません")
+        try:
+            reuse = PageReusePolicy(
+                isolation=args.isolation or ("page" if args.reuse_page else "storage"),
+                base_url=args.base_url,
+                clear_storage=PageReusePolicy.parse_storage(args.clear_storage),
+                recycle_every=args.recycle_every if args.recycle_every is not None else 50
+            )
+        except ValueError as e:
+            parser.error(str(e))
+    
+    monitor = None
+    if args.monitor_interval or args.max_context_heap_mb or args.max_browser_rss_mb:
+        monitor = ResourceMonitor(
+            interval=args.monitor_interval or 5.0,
+            context_memory_mb=args.max_context_heap_mb,
+            browser_memory_mb=args.max_browser_rss_mb
+        )
+    
+    session = None
+    if args.session:
+        session = SessionSnapshot(args.session, state_dir=args.session_dir, max_age=args.session_max_age)
+        if args.prime:
+            session.invalidate()
+    
+    if args.daemon:
+        from runner_daemon import RunnerDaemon
+        daemon = RunnerDaemon(
+            socket_path=args.socket,
+            port=args.port,
+            concurrency=args.concurrency,
+            max_queue=args.max_queue,
+            headless=args.headless,
+            slowmo=args.slowmo,
+            recording=args.record,
+            fast=args.fast,
+            network=network,
+            session=session,
+            scheduler=scheduler,
+            sink=sink,
+            output_batch=args.output_batch,
+            result_cache=result_cache,
+            monitor=monitor,
+            profiling=profiling,
+            video_finalizer=video_finalizer,
+            reuse=reuse
+        )
+        try:
+            if not asyncio.run(daemon.serve()):
+                sys.exit(1)
+        except KeyboardInterrupt:
+            pass
+    elif args.new:
         create_action_template(args.new)
     elif args.list:
         list_actions()
+    elif args.jobs_file:
+        from process_executor import read_jobs_file, run_sharded
+        results = run_sharded(
+            read_jobs_file(args.jobs_file),
+            processes=args.processes,
+            concurrency=args.concurrency,
+            slowmo=args.slowmo,
+            headless=args.headless,
+            recording=args.record,
+            fast=args.fast,
+            network=network,
+            session=session,
+            scheduler=scheduler,
+            sink=sink,
+            output_batch=args.output_batch,
+            result_cache=result_cache,
+            monitor=monitor,
+            profiling=profiling,
+            video_finalizer=video_finalizer,
+            reuse=reuse
+        )
+        sys.exit(finish_report(results, args.report))
     elif args.action:
-        actions_dir = Path(__file__).parent / "actions"
-        action_file = actions_dir / f"{args.action}.py"
+        try:
+            action_file = registry.path_for(args.action)
+        except ValueError as e:
+            parser.error(str(e))
         
         if not action_file.exists():
             print(f"エラー: アクションファイル '{action_file}' が見つかりません。")
             sys.exit(1)
         
-        asyncio.run(run_scenario(
-            action_file, 
-            query=args.query, 
-            slowmo=args.slowmo, 
-            headless=args.headless,
-            countdown=args.countdown
-        ))
+        if args.queries_file and args.processes:
+            from process_executor import run_sharded
+            jobs = [(args.action, query) for query in read_queries_file(args.queries_file)]
+            results = run_sharded(
+                jobs,
+                processes=args.processes,
+                concurrency=args.concurrency,
+                slowmo=args.slowmo,
+                headless=args.headless,
+                recording=args.record,
+                fast=args.fast,
+                network=network,
+                session=session,
+                scheduler=scheduler,
+                sink=sink,
+                output_batch=args.output_batch,
+                result_cache=result_cache,
+                monitor=monitor,
+                profiling=profiling,
+                video_finalizer=video_finalizer,
+                reuse=reuse
+            )
+            sys.exit(finish_report(results, args.report))
+        elif args.queries_file and args.reuse_page:
+            results = asyncio.run(run_sequence(
+                action_file,
+                read_queries_file(args.queries_file),
+                reuse=reuse,
+                slowmo=args.slowmo,
+                headless=args.headless,
+                recording=args.record,
+                fast=args.fast,
+                network=network,
+                session=session,
+                scheduler=scheduler,
+                sink=sink,
+                output_batch=args.output_batch,
+                result_cache=result_cache,
+                monitor=monitor,
+                profiling=profiling,
+                video_finalizer=video_finalizer
+            ))
+            sys.exit(finish_report(results, args.report))
+        elif args.queries_file:
+            queries = read_queries_file(args.queries_file)
+            results = asyncio.run(run_batch(
+                action_file,
+                queries,
+                concurrency=args.concurrency,
+                slowmo=args.slowmo,
+                headless=args.headless,
+                recording=args.record,
+                fast=args.fast,
+                network=network,
+                session=session,
+                scheduler=scheduler,
+                sink=sink,
+                output_batch=args.output_batch,
+                result_cache=result_cache,
+                monitor=monitor,
+                profiling=profiling,
+                video_finalizer=video_finalizer,
+                reuse=reuse
+            ))
+            sys.exit(finish_report(results, args.report))
+        else:
+            # プロファイリングの内訳はステップの記録に追加するため、計測も行う
+            timings = TimingRecorder(action=args.action, query=args.query) if args.report or profiling.enabled else None
+            success = asyncio.run(run_with_output(
+                action_file,
+                sink=sink,
+                output_batch=args.output_batch,
+                query=args.query,
+                slowmo=args.slowmo, 
+                headless=args.headless,
+                countdown=args.countdown,
+                recording=args.record,
+                fast=args.fast,
+                network=network,
+                timings=timings,
+                session=session,
+                scheduler=scheduler,
+                result_cache=result_cache,
+                profiling=profiling,
+                video_finalizer=video_finalizer
+            ))
+            if timings is not None:
+                sys.exit(finish_report([{"success": success, "timings": timings.records}], args.report))
     else:
         parser.print_help()
@@ -1,20 +1,31 @@
+from browser_base import accept_consent, extract_links, presentation_wait
+
 async def run_actions(page, query=None):
     """
     nogtipsサイトでの検索アクションを実行
     
+    検索結果の記事 (順位・タイトル・URL) を1件ずつ yield する。
+    
     Args:
         page: Playwrightのページオブジェクト
         query: 検索クエリ (文字列)
     """
     # nogtips検索処理
     await page.goto("https://nogtips.wordpress.com", wait_until='domcontentloaded', timeout=30000)
-    await page.get_by_role("button", name="閉じて承認").click()
+    # 同意バナー (セッションのスナップショットがあれば表示されない)
+    await accept_consent(page.get_by_role("button", name="閉じて承認"))
     await page.get_by_role("link", name="nogtips").click()
     await page.get_by_role("heading", name="Personal AI Assistant（PAIA）を作る").get_by_role("link").click()
     await page.get_by_role("link", name="bykilt", exact=True).click()
     await page.get_by_role("searchbox", name="検索:").click()
     await page.get_by_role("searchbox", name="検索:").fill(query)
-    await page.get_by_role("searchbox", name="検索:").press("Enter")
+    # 検索結果ページの読み込み完了を待つ
+    async with page.expect_navigation(wait_until="domcontentloaded"):
+        await page.get_by_role("searchbox", name="検索:").press("Enter")
+    
+    # 検索結果を出力
+    for result in await extract_links(page, "article h2 a"):
+        yield result
     
-    # 検索結果を表示
-    await page.wait_for_timeout(5000)
+    # 検索結果を表示 (--fast 指定時は待機しない)
+    await presentation_wait(page, 5000)
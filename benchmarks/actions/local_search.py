@@ -0,0 +1,22 @@
+import os
+from browser_base import accept_consent
+
+async def run_actions(page, query=None):
+    """
+    ローカルのフィクスチャサーバーで nogtips_search と同じ検索フローを実行
+
+    Args:
+        page: Playwrightのページオブジェクト
+        query: 検索クエリ (文字列)
+    """
+    base_url = os.environ.get("BENCH_BASE_URL", "http://127.0.0.1:8765")
+    await page.goto(base_url, wait_until='domcontentloaded', timeout=30000)
+    await accept_consent(page.get_by_role("button", name="閉じて承認"))
+    await page.get_by_role("link", name="nogtips").click()
+    await page.get_by_role("heading", name="Personal AI Assistant（PAIA）を作る").get_by_role("link").click()
+    await page.get_by_role("link", name="bykilt", exact=True).click()
+    await page.get_by_role("searchbox", name="検索:").click()
+    await page.get_by_role("searchbox", name="検索:").fill(query or "bykilt")
+    async with page.expect_navigation(wait_until="domcontentloaded"):
+        await page.get_by_role("searchbox", name="検索:").press("Enter")
+    await page.locator("body.search").wait_for()
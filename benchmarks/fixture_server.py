@@ -0,0 +1,135 @@
+import html
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 検索結果として返す記事のタイトル
+ARTICLES = [
+    "Personal AI Assistant（PAIA）を作る",
+    "LLMs.txtについて",
+    "bykilt でブラウザ操作を自動化する",
+    "Playwright の codegen を使う",
+    "ヘッドレスブラウザの起動を速くする",
+]
+
+_PAGE = """<!DOCTYPE html>
+<html lang="ja">
+<head><meta charset="utf-8"><title>{title}</title>
+<style>body {{ font-family: sans-serif; }} #consent {{ position: fixed; bottom: 0; left: 0; right: 0; background: #eee; padding: 8px; }}</style>
+</head>
+<body class="{body_class}">
+<header><a href="/">nogtips</a>
+<form role="search" action="/" method="get">
+<label for="s">検索:</label><input type="search" id="s" name="s">
+</form></header>
+<main>{main}</main>
+<div id="consent"><button type="button" onclick="document.cookie='consent=1;path=/';this.parentNode.remove()">閉じて承認</button></div>
+<script>if (document.cookie.indexOf('consent=1') >= 0) document.getElementById('consent').remove();</script>
+</body>
+</html>
+"""
+
+def render_home():
+    articles = "".join(
+        f'<article><h2><a href="/posts/{index}/">{html.escape(title)}</a></h2></article>'
+        for index, title in enumerate(ARTICLES)
+    )
+    return _PAGE.format(title="nogtips", body_class="home", main=articles)
+
+def render_post(index):
+    title = ARTICLES[index % len(ARTICLES)]
+    main = f'<article><h1>{html.escape(title)}</h1><p><a href="/tags/bykilt/">bykilt</a></p></article>'
+    return _PAGE.format(title=html.escape(title), body_class="single", main=main)
+
+def render_tag():
+    return _PAGE.format(title="bykilt", body_class="tag", main="<h1>bykilt</h1>")
+
+def render_search(query):
+    hits = [title for title in ARTICLES if query.lower() in title.lower()] or ARTICLES[:3]
+    items = "".join(
+        f'<article class="search-result"><h2><a href="/posts/{position}/">{html.escape(title)}</a></h2></article>'
+        for position, title in enumerate(hits)
+    )
+    main = f'<h1 class="page-title">「{html.escape(query)}」の検索結果</h1>{items}'
+    return _PAGE.format(title="検索結果", body_class="search", main=main)
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """nogtips の検索フローを模したページを返すハンドラ"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        if "s" in params:
+            body = render_search(params["s"][0])
+        elif url.path == "/":
+            body = render_home()
+        elif url.path.startswith("/posts/"):
+            try:
+                body = render_post(int(url.path.strip("/").split("/")[-1]))
+            except ValueError:
+                self.send_error(404)
+                return
+        elif url.path.startswith("/tags/"):
+            body = render_tag()
+        else:
+            self.send_error(404)
+            return
+
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # ベンチマーク中のアクセスログは出力しない
+        pass
+
+class FixtureServer:
+    """
+    ローカルで起動するテスト用 HTTP サーバー
+
+    使用例:
+        with FixtureServer() as server:
+            print(server.base_url)
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self._server.server_address[1]}"
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), FixtureHandler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+if __name__ == "__main__":
+    import time
+    with FixtureServer(port=8765) as server:
+        print(f"フィクスチャサーバーを起動しました: {server.base_url}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,227 @@
+"""
+ランナーと BrowserAutomationBase のベンチマーク
+
+ローカルのフィクスチャサーバーに対してヘッドレスで実行するため、ネットワーク接続は不要。
+
+使用例:
+    python -m benchmarks.run_benchmarks --output ./tmp/bench.json
+    python -m benchmarks.run_benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+
+from action_runner import run_batch, run_scenario
+from benchmarks.fixture_server import FixtureServer
+from browser_base import BrowserAutomationBase
+from browser_pool import BrowserPool
+from timing import percentile
+
+LOCAL_ACTION = Path(__file__).parent / "actions" / "local_search.py"
+
+# 各ベンチマークで共通のブラウザ設定 (ヘッドレス・録画なし)
+BROWSER_OPTIONS = {"headless": True, "recording": "off"}
+
+def latency_result(samples_ms):
+    """所要時間 (ミリ秒) のサンプルを集計する。値が小さいほど良い"""
+    return {
+        "unit": "ms",
+        "better": "lower",
+        "samples": len(samples_ms),
+        "median": round(percentile(samples_ms, 50), 3),
+        "p95": round(percentile(samples_ms, 95), 3),
+        "min": round(min(samples_ms), 3)
+    }
+
+def throughput_result(queries, elapsed):
+    """スループット (件/秒)。値が大きいほど良い"""
+    return {
+        "unit": "queries/s",
+        "better": "higher",
+        "samples": queries,
+        "median": round(queries / elapsed, 3)
+    }
+
+async def bench_cold_launch(iterations):
+    """ドライバ起動からブラウザ終了までの時間 (毎回新しいプロセス)"""
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        automation = BrowserAutomationBase(**BROWSER_OPTIONS)
+        await automation.launch()
+        await automation.cleanup()
+        samples.append((time.perf_counter() - started) * 1000)
+    return latency_result(samples)
+
+async def bench_warm_launch(iterations):
+    """起動済みのブラウザで、コンテキストとページを作成して閉じるまでの時間"""
+    launcher = BrowserAutomationBase(**BROWSER_OPTIONS)
+    await launcher.launch()
+    samples = []
+    try:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            automation = BrowserAutomationBase(browser=launcher.browser, **BROWSER_OPTIONS)
+            await automation.setup()
+            await automation.cleanup()
+            samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        await launcher.cleanup()
+    return latency_result(samples)
+
+async def bench_pool_acquire(iterations):
+    """ブラウザプールからコンテキストを借りて返却するまでの時間"""
+    samples = []
+    async with BrowserPool(max_size=1, min_idle=1, **BROWSER_OPTIONS) as pool:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            async with pool.acquire():
+                pass
+            samples.append((time.perf_counter() - started) * 1000)
+    return latency_result(samples)
+
+async def bench_scenario(iterations, pool=None):
+    """run_scenario のエンドツーエンドの所要時間"""
+    samples = []
+    for index in range(iterations):
+        started = time.perf_counter()
+        success = await run_scenario(
+            LOCAL_ACTION,
+            query=f"bykilt {index}",
+            headless=True,
+            countdown=None,
+            recording="off",
+            fast=True,
+            pool=pool
+        )
+        if not success:
+            raise RuntimeError("ベンチマーク用シナリオが失敗しました")
+        samples.append((time.perf_counter() - started) * 1000)
+    return latency_result(samples)
+
+async def bench_scenario_warm(iterations):
+    async with BrowserPool(max_size=1, min_idle=1, **BROWSER_OPTIONS) as pool:
+        # 1回目はウォームアップとして計測しない
+        await bench_scenario(1, pool=pool)
+        return await bench_scenario(iterations, pool=pool)
+
+async def bench_batch(queries, concurrency):
+    """run_batch のスループット"""
+    started = time.perf_counter()
+    # クエリごとの進捗表示は出力しない
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = await run_batch(
+            LOCAL_ACTION,
+            [f"bykilt {index}" for index in range(queries)],
+            concurrency=concurrency,
+            headless=True,
+            recording="off",
+            fast=True
+        )
+    if not results or not all(result["success"] for result in results):
+        raise RuntimeError(f"バッチ実行が失敗しました (concurrency={concurrency})")
+    return throughput_result(queries, time.perf_counter() - started)
+
+async def run_all(iterations, batch_queries, concurrency_levels):
+    """すべてのベンチマークを実行し、名前 -> 結果 の辞書を返す"""
+    benchmarks = [
+        ("cold_launch", lambda: bench_cold_launch(iterations)),
+        ("warm_context", lambda: bench_warm_launch(iterations)),
+        ("pool_acquire", lambda: bench_pool_acquire(iterations * 5)),
+        ("scenario_cold", lambda: bench_scenario(iterations)),
+        ("scenario_warm", lambda: bench_scenario_warm(iterations)),
+    ]
+    for concurrency in concurrency_levels:
+        benchmarks.append((
+            f"batch_throughput_c{concurrency}",
+            lambda concurrency=concurrency: bench_batch(batch_queries, concurrency)
+        ))
+
+    results = {}
+    for name, bench in benchmarks:
+        print(f"⏱  {name} ...", end=" ", flush=True)
+        results[name] = await bench()
+        print(f"{results[name]['median']} {results[name]['unit']}")
+    return results
+
+def compare(results, baseline, tolerance):
+    """
+    ベースラインと比較し、許容範囲を超えて悪化した項目を返す
+
+    Args:
+        results: 今回の結果
+        baseline: ベースラインの結果
+        tolerance: 許容する悪化の割合 (0.2 なら 20%)
+
+    Returns:
+        (名前, ベースライン値, 今回の値, 単位) のリスト
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if current["better"] == "lower":
+            regressed = current["median"] > base["median"] * (1 + tolerance)
+        else:
+            regressed = current["median"] < base["median"] * (1 - tolerance)
+        if regressed:
+            regressions.append((name, base["median"], current["median"], current["unit"]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="ランナーと BrowserAutomationBase のベンチマーク")
+    parser.add_argument("--iterations", type=int, default=5, help="各ベンチマークの繰り返し回数")
+    parser.add_argument("--batch-queries", type=int, default=20, help="バッチ実行のクエリ数")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="バッチ実行の同時実行数 (カンマ区切り)")
+    parser.add_argument("--output", help="結果を保存する JSON ファイル")
+    parser.add_argument("--baseline", help="比較するベースラインの JSON ファイル")
+    parser.add_argument("--save-baseline", help="今回の結果をベースラインとして保存する JSON ファイル")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="許容する悪化の割合 (デフォルト: 0.2)")
+    args = parser.parse_args()
+
+    concurrency_levels = [int(value) for value in args.concurrency.split(",") if value.strip()]
+
+    with FixtureServer() as server:
+        os.environ["BENCH_BASE_URL"] = server.base_url
+        results = asyncio.run(run_all(args.iterations, args.batch_queries, concurrency_levels))
+
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "batch_queries": args.batch_queries
+        },
+        "results": results
+    }
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"📝 結果を保存しました: {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ ベースラインから {args.tolerance:.0%} を超えて悪化しました:")
+            for name, base, current, unit in regressions:
+                print(f"  {name}: {base} -> {current} {unit}")
+            sys.exit(1)
+        print(f"\n✅ ベースラインとの差は許容範囲内です ({args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,190 @@
 import os
+import re
+import time
 import asyncio
-from playwright.async_api import async_playwright
+import contextvars
+from urllib.parse import urlparse
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from recording import RecordingPolicy
+from session_state import current_session
+from timing import timed_phase
+
+# コンテキストを再利用する前に消去するストレージの種類 (CDP の Storage.clearDataForOrigin)
+_SITE_DATA_TYPES = "local_storage,indexeddb,websql,service_workers,cache_storage,file_systems"
+
+# 高速モード (表示用の待機やオーバーレイを省略する) かどうか
+fast_mode = contextvars.ContextVar("fast_mode", default=False)
+
+async def presentation_wait(page, milliseconds):
+    """
+    結果を画面で確認するための待機 (高速モードでは待機しない)
+    
+    Args:
+        page: Playwrightのページオブジェクト
+        milliseconds: 待機時間 (ミリ秒)
+    """
+    if fast_mode.get():
+        return
+    await page.wait_for_timeout(milliseconds)
+
+async def accept_consent(locator, timeout=5000):
+    """
+    同意バナーのボタンが表示されていればクリックする
+    
+    セッションのスナップショットが適用済みの場合や、前のシナリオのクッキーを引き継いだ場合は
+    バナーが出ない前提で待たずに確認し、
+    表示されていなければ何もしない。バナーが再表示された場合はスナップショットを取り直す。
+    
+    Args:
+        locator: 同意ボタンのロケータ (例: page.get_by_role("button", name="閉じて承認"))
+        timeout: スナップショットがない場合にバナーの表示を待つ時間 (ミリ秒)
+    
+    Returns:
+        クリックした場合は True
+    """
+    session = current_session.get()
+    if session is not None and session.applied:
+        visible = await locator.is_visible()
+    else:
+        try:
+            await locator.wait_for(state="visible", timeout=timeout)
+            visible = True
+        except PlaywrightTimeoutError:
+            visible = False
+    
+    if not visible:
+        return False
+    await locator.click()
+    if session is not None:
+        session.consent_clicked = True
+    return True
+
+async def extract_links(page, selector):
+    """
+    selector に一致するリンクのタイトルと URL を取得する
+
+    要素ごとに問い合わせず、1回の evaluate_all でまとめて取得する。
+
+    Args:
+        page: Playwrightのページオブジェクト
+        selector: リンク (a 要素) のセレクタ (例: "article h2 a")
+
+    Returns:
+        {"position": 1始まりの順位, "title": ..., "url": ...} のリスト
+    """
+    links = await page.locator(selector).evaluate_all(
+        "elements => elements.map(element => ({title: element.textContent.trim(), url: element.href}))"
+    )
+    return [{"position": position, **link} for position, link in enumerate(links, 1)]
 
 class BrowserAutomationBase:
     """ブラウザ自動化の共通機能を提供するベースクラス"""
     
-    def __init__(self, headless=False, slowmo=0, recording_dir="./tmp/record_videos"):
+    def __init__(self, headless=False, slowmo=0, recording_dir="./tmp/record_videos", browser=None,
+                 recording=None, fast=False, network=None, timings=None, session=None, video_finalizer=None):
+        """
+        Args:
+            headless: ヘッドレスモードで実行するかどうか
+            slowmo: スローモーションの時間 (ミリ秒)
+            recording_dir: 録画ファイル・失敗時スクリーンショットの保存先
+            browser: 共有するブラウザ (指定時はブラウザを起動せず、コンテキストのみ作成する)
+            recording: 録画ポリシー (RecordingPolicy または "off" などの文字列。
+                None の場合は環境変数 RECORDING_MODE、未設定なら always)
+            fast: 高速モード (インジケータとカウントダウンを表示しない)
+            network: リクエストのブロック・キャッシュ・HAR 再生を行う NetworkRouter
+            timings: 起動・コンテキスト作成・解放の所要時間を記録する TimingRecorder
+            session: コンテキストの初期状態にするストレージ状態のスナップショット (SessionSnapshot)
+            video_finalizer: 録画したコンテキストの終了と動画の書き出しを行う VideoFinalizer。
+                指定時は cleanup() で書き出しを待たず、動画の名前を video_label から付ける
+        """
         self.headless = headless
         self.slowmo = slowmo
         self.recording_dir = recording_dir
-        self.browser = None
+        if recording is None:
+            recording = RecordingPolicy.from_env()
+        elif isinstance(recording, str):
+            recording = RecordingPolicy.parse(recording)
+        self.recording = recording
+        self.recording_video = False
+        self.video_finalizer = video_finalizer
+        # 録画ファイル名に含める識別子 (アクション名とクエリなど、再利用時は最初のシナリオのもの)
+        self.video_label = None
+        self.fast = fast
+        self.network = network
+        self.timings = timings
+        self.session = session
+        self.session_applied = False
+        # 前のシナリオのクッキーをそのまま引き継いでいるか (PageReusePolicy の分離レベル page)
+        self.cookies_retained = False
+        # ページが訪れたオリジン (コンテキストを再利用する前にストレージを消去する対象)
+        self.visited_origins = set()
+        self.playwright = None
+        self.browser = browser
         self.context = None
         self.page = None
+        # 自分で起動したブラウザだけを cleanup() で閉じる
+        self._owns_browser = browser is None
     
-    async def setup(self):
-        """ブラウザとコンテキストを設定"""
-        os.makedirs(self.recording_dir, exist_ok=True)
+    async def launch(self):
+        """Playwrightドライバを起動してブラウザを立ち上げる"""
+        with timed_phase(self.timings, "driver_start"):
+            self.playwright = await async_playwright().start()
+        with timed_phase(self.timings, "browser_launch"):
+            self.browser = await self.playwright.chromium.launch(
+                headless=self.headless, 
+                slow_mo=self.slowmo, 
+                args=[
+                    '--no-sandbox',
+                    '--disable-setuid-sandbox',
+                    '--disable-dev-shm-usage',
+                    '--disable-accelerated-2d-canvas',
+                    '--no-zygote',
+                    '--single-process',
+                    '--window-position=50,50',
+                    '--window-size=1280,720'
+                ]
+            )
+        return self.browser
+    
+    async def setup(self, record_video=None):
+        """
+        ブラウザとコンテキストを設定
+        
+        Args:
+            record_video: 動画を録画するかどうか (None の場合は録画ポリシーで決める)
+        """
+        if self.browser is None:
+            await self.launch()
+        
+        # 録画はポリシーで選ばれたコンテキストだけで行う
+        context_options = {}
+        self.recording_video = self.recording.should_record_video() if record_video is None else record_video
+        if self.recording_video:
+            os.makedirs(self.recording_dir, exist_ok=True)
+            context_options["record_video_dir"] = self.recording_dir
+            context_options["record_video_size"] = {"width": 1280, "height": 720}
+        
+        # 保存済みのセッションがあればクッキーと localStorage を引き継ぐ
+        storage_state = self.session.path() if self.session else None
+        if storage_state:
+            context_options["storage_state"] = storage_state
+        self.session_applied = storage_state is not None
         
-        playwright = await async_playwright().start()
-        self.browser = await playwright.chromium.launch(
-            headless=self.headless, 
-            slow_mo=self.slowmo, 
-            args=[
-                '--no-sandbox',
-                '--disable-setuid-sandbox',
-                '--disable-dev-shm-usage',
-                '--disable-accelerated-2d-canvas',
-                '--no-zygote',
-                '--single-process',
-                '--window-position=50,50',
-                '--window-size=1280,720'
-            ]
-        )
-        
-        self.context = await self.browser.new_context(
-            record_video_dir=self.recording_dir,
-            record_video_size={"width": 1280, "height": 720}
-        )
-        
-        self.page = await self.context.new_page()
+        with timed_phase(self.timings, "context_creation"):
+            self.context = await self.browser.new_context(**context_options)
+            if self.network:
+                await self.network.install(self.context)
+        
+        with timed_phase(self.timings, "page_creation"):
+            self.page = await self.context.new_page()
+        self.page.on("framenavigated", self._on_frame_navigated)
+        if self.recording_video and self.video_finalizer is not None:
+            await self.video_finalizer.track(self.page)
         return self.page
     
     async def show_automation_indicator(self):
         """自動操作中であることを示すオーバーレイを表示"""
-        if not self.page:
+        if not self.page or self.fast or fast_mode.get():
             return
         
         await self.page.evaluate("""() => {
@@ -61,7 +202,7 @@ class BrowserAutomationBase:
     
     async def show_countdown_overlay(self, seconds=5):
         """ブラウザを閉じる前にカウントダウンオーバーレイを表示"""
-        if not self.page:
+        if not self.page or self.fast or fast_mode.get():
             return
             
         await self.page.evaluate(f"""() => {{
@@ -120,9 +261,125 @@ class BrowserAutomationBase:
         }""")
         await self.page.wait_for_timeout(1000)
     
+    def _on_frame_navigated(self, frame):
+        url = urlparse(frame.url)
+        if url.scheme in ("http", "https"):
+            self.visited_origins.add(f"{url.scheme}://{url.netloc}")
+    
+    async def clear_site_data(self):
+        """
+        訪れたオリジンのストレージと HTTP キャッシュを消去する (Chromium の CDP を使用)
+        
+        localStorage・sessionStorage・IndexedDB・Service Worker・Cache Storage を消去し、
+        次のシナリオが新しいコンテキストと同じ状態から始まるようにする。クッキーは restore_session() で戻す。
+        """
+        origins, self.visited_origins = self.visited_origins, set()
+        cdp = await self.context.new_cdp_session(self.page)
+        try:
+            await cdp.send("DOMStorage.enable")
+            for origin in origins:
+                await cdp.send("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": _SITE_DATA_TYPES})
+                # sessionStorage はページごとにあるため、このページの分を消去する
+                await cdp.send("DOMStorage.clear", {"storageId": {"securityOrigin": origin, "isLocalStorage": False}})
+            await cdp.send("Network.clearBrowserCache")
+        finally:
+            await cdp.detach()
+    
+    async def restore_session(self):
+        """
+        クッキーと localStorage をセッションのスナップショットの状態に戻す
+        
+        コンテキストを再利用する前に呼び出す。スナップショットにあるオリジンの localStorage は
+        消去してから設定し直す。スナップショットがない場合はクッキーを消去するだけ。
+        """
+        state = self.session.state() if self.session else {}
+        await self.context.clear_cookies()
+        cookies = state.get("cookies", [])
+        if cookies:
+            await self.context.add_cookies(cookies)
+        for origin in state.get("origins", []):
+            await self._restore_local_storage(origin["origin"], origin.get("localStorage", []))
+        self.session_applied = bool(cookies) or bool(state.get("origins"))
+    
+    async def _restore_local_storage(self, origin, items):
+        """
+        オリジンの localStorage を items の内容にする
+        
+        localStorage はそのオリジンのページからしか操作できないため、空のページを返すようにして
+        オリジンに移動する (サイトへのリクエストは発生しない)。
+        """
+        url = f"{origin}/"
+        
+        async def serve_blank(route):
+            await route.fulfill(status=200, content_type="text/html", body="<html></html>")
+        
+        await self.page.route(url, serve_blank)
+        try:
+            await self.page.goto(url)
+            await self.page.evaluate("""(items) => {
+                localStorage.clear();
+                for (const { name, value } of items) {
+                    localStorage.setItem(name, value);
+                }
+            }""", items)
+        finally:
+            await self.page.unroute(url, serve_blank)
+    
+    async def start_trace(self):
+        """Playwright のトレース (スクリーンショット・DOM スナップショット・通信) の記録を開始する"""
+        await self.context.tracing.start(screenshots=True, snapshots=True)
+    
+    async def stop_trace(self, path=None):
+        """
+        トレースの記録を終了する
+        
+        Args:
+            path: 保存先の .zip ファイル (None の場合は保存せずに破棄する)
+        """
+        await self.context.tracing.stop(path=path)
+    
+    async def capture_failure(self, name="failure"):
+        """
+        失敗時のスクリーンショットを保存する (録画ポリシーが on-failure の場合のみ)
+        
+        Args:
+            name: ファイル名に含める識別子 (アクション名など)
+        
+        Returns:
+            保存したファイルのパス (保存しなかった場合は None)
+        """
+        if not self.recording.capture_on_failure or not self.page or self.page.is_closed():
+            return None
+        
+        os.makedirs(self.recording_dir, exist_ok=True)
+        safe_name = re.sub(r"[^\w.-]+", "_", name)
+        path = os.path.join(self.recording_dir, f"failure_{safe_name}_{time.strftime('%Y%m%d-%H%M%S')}.png")
+        try:
+            await self.page.screenshot(path=path, full_page=True)
+        except Exception as e:
+            print(f"警告: スクリーンショットの保存に失敗しました: {str(e)}")
+            return None
+        print(f"📸 失敗時のスクリーンショットを保存しました: {path}")
+        return path
+    
     async def cleanup(self):
         """リソースの解放"""
-        if self.context:
-            await self.context.close()
-        if self.browser:
-            await self.browser.close()
+        with timed_phase(self.timings, "cleanup"):
+            if self.context:
+                if self.recording_video and self.video_finalizer is not None:
+                    if self._owns_browser:
+                        # ブラウザを閉じる前に書き出しを終える
+                        await self.video_finalizer.finalize(self.context, self.page, self.video_label)
+                    else:
+                        # 動画の書き出しを待たずに次のシナリオへ進む
+                        self.video_finalizer.submit(self.context, self.page, self.video_label)
+                else:
+                    await self.context.close()
+                self.context = None
+                self.page = None
+            if self._owns_browser and self.browser:
+                await self.browser.close()
+                self.browser = None
+            if self.playwright:
+                await self.playwright.stop()
+                self.playwright = None
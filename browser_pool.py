@@ -0,0 +1,344 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from browser_base import BrowserAutomationBase
+from page_reuse import PageReusePolicy
+from recording import RecordingPolicy
+
+class PooledContext:
+    """プールで管理するブラウザコンテキスト (BrowserAutomationBase) と利用状況"""
+
+    def __init__(self, automation):
+        self.automation = automation
+        self.uses = 0
+        self.last_used = time.monotonic()
+
+class BrowserPool:
+    """
+    ウォームアップ済みのブラウザコンテキストを貸し出すプール
+
+    ブラウザは1回だけ起動し、コンテキストとページを事前に作成しておく。
+    acquire() で準備済みの BrowserAutomationBase を借り、ブロックを抜けると返却される。
+
+    使用例:
+        async with BrowserPool(headless=True, max_size=4) as pool:
+            async with pool.acquire() as automation:
+                await automation.page.goto("https://example.com")
+    """
+
+    def __init__(self, headless=False, slowmo=0, recording_dir="./tmp/record_videos",
+                 max_size=4, min_idle=1, max_uses=50, idle_timeout=300,
+                 browser_max_uses=None, health_check_timeout=2.0, recording=None,
+                 network=None, session=None, monitor=None, video_finalizer=None, reuse=None):
+        """
+        Args:
+            headless: ヘッドレスモードで実行するかどうか
+            slowmo: スローモーションの時間 (ミリ秒)
+            recording_dir: 録画ファイルの保存先
+            max_size: 同時に貸し出せるコンテキストの最大数
+            min_idle: 常に待機させておくコンテキスト数
+            max_uses: コンテキストを作り直すまでの利用回数 (reuse 指定時は reuse.recycle_every)
+            idle_timeout: 待機中のコンテキストを破棄するまでの時間 (秒)
+            browser_max_uses: ブラウザを再起動するまでのシナリオ数 (None の場合は再起動しない)
+            health_check_timeout: ヘルスチェックのタイムアウト (秒)
+            recording: 録画ポリシー (None の場合は環境変数 RECORDING_MODE)。
+                sampled の場合は貸し出しごとに抽選し、結果に合う録画状態のコンテキストを貸し出す
+            network: 各コンテキストに設定する NetworkRouter
+            session: コンテキストの初期状態にするストレージ状態のスナップショット (SessionSnapshot)
+            monitor: メモリと CPU を記録する ResourceMonitor。
+                しきい値を超えたコンテキストは返却時に破棄し、ブラウザはすべて返却されてから再起動する
+            video_finalizer: 録画したコンテキストを閉じる VideoFinalizer。
+                video_finalizer.per_scenario の場合は録画したコンテキストを1回の利用ごとに破棄し、
+                動画をシナリオごとのファイルにする
+            reuse: 返却されたコンテキストのリセット方法 (PageReusePolicy、None の場合は訪れたオリジンのストレージを消去し、
+                クッキーを戻して about:blank に移動)
+        """
+        self.headless = headless
+        self.slowmo = slowmo
+        self.recording_dir = recording_dir
+        self.max_size = max_size
+        self.min_idle = min(min_idle, max_size)
+        self.reuse = reuse if reuse is not None else PageReusePolicy(recycle_every=max_uses)
+        self.max_uses = self.reuse.recycle_every
+        self.idle_timeout = idle_timeout
+        self.browser_max_uses = browser_max_uses
+        self.health_check_timeout = health_check_timeout
+        if recording is None:
+            recording = RecordingPolicy.from_env()
+        elif isinstance(recording, str):
+            recording = RecordingPolicy.parse(recording)
+        self.recording = recording
+        self.network = network
+        self.session = session
+        self.monitor = monitor
+        self.video_finalizer = video_finalizer
+
+        self._launcher = None
+        self._idle = []
+        # 貸し出し中と作成中のコンテキスト数 (ページやブラウザの I/O はロックの外で行うため、事前に数えておく)
+        self._in_use = 0
+        self._browser_uses = 0
+        self._semaphore = asyncio.Semaphore(max_size)
+        self._lock = asyncio.Lock()
+        # 貸し出し中のコンテキストがなくなったことを待つ (メモリ超過によるブラウザの再起動用)
+        self._drained = asyncio.Condition(self._lock)
+        self._reaper = None
+
+    @property
+    def browser(self):
+        return self._launcher.browser if self._launcher else None
+
+    async def start(self):
+        """ブラウザを起動し、min_idle 個のコンテキストを事前に作成する"""
+        await self._launch_browser()
+        await self._warm_up()
+        self._reaper = asyncio.create_task(self._reap_idle())
+        if self.monitor is not None:
+            await self.monitor.start()
+        return self
+
+    async def close(self):
+        """すべてのコンテキストとブラウザを閉じる"""
+        if self.monitor is not None:
+            await self.monitor.stop()
+        if self._reaper:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+        await self._close_idle()
+        if self.video_finalizer is not None:
+            await self.video_finalizer.drain()
+        if self._launcher:
+            await self._launcher.cleanup()
+            self._launcher = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        準備済みの BrowserAutomationBase を借りる
+
+        ブロック内で例外が発生した場合、そのコンテキストは状態が不明なため再利用せずに破棄する。
+        """
+        async with self._semaphore:
+            entry = await self._checkout()
+            failed = False
+            try:
+                yield entry.automation
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                await self._release(entry, discard=failed)
+
+    async def _launch_browser(self):
+        self._launcher = BrowserAutomationBase(
+            headless=self.headless,
+            slowmo=self.slowmo,
+            recording_dir=self.recording_dir
+        )
+        await self._launcher.launch()
+        self._browser_uses = 0
+        if self.monitor is not None:
+            self.monitor.browser_restarted()
+
+    async def _restart_browser(self):
+        """ブラウザを再起動する (待機中のコンテキストはすべて破棄)"""
+        await self._close_idle()
+        if self.video_finalizer is not None:
+            await self.video_finalizer.drain()
+        try:
+            await self._launcher.cleanup()
+        except Exception as e:
+            print(f"警告: ブラウザの終了に失敗しました: {str(e)}")
+        await self._launch_browser()
+
+    async def _new_entry(self, record_video=None):
+        automation = BrowserAutomationBase(
+            headless=self.headless,
+            slowmo=self.slowmo,
+            recording_dir=self.recording_dir,
+            browser=self.browser,
+            recording=self.recording,
+            network=self.network,
+            session=self.session,
+            video_finalizer=self.video_finalizer
+        )
+        await automation.setup(record_video=record_video)
+        if self.monitor is not None:
+            self.monitor.register(automation)
+        return PooledContext(automation)
+
+    async def _warm_up(self):
+        """待機中のコンテキストが min_idle 個になるまで作成する"""
+        while True:
+            async with self._lock:
+                if len(self._idle) >= self.min_idle or len(self._idle) + self._in_use >= self.max_size:
+                    return
+                # 作成中の分も数え、同時に呼ばれても max_size を超えないようにする
+                self._in_use += 1
+            entry = None
+            try:
+                entry = await self._new_entry()
+            finally:
+                async with self._lock:
+                    if entry is not None:
+                        self._idle.append(entry)
+                    self._in_use -= 1
+                    self._drained.notify_all()
+
+    async def _checkout(self):
+        async with self._lock:
+            browser_expired = (
+                self.browser_max_uses is not None
+                and self._browser_uses >= self.browser_max_uses
+                and self._in_use == 0
+            )
+            if not self.browser.is_connected() or browser_expired:
+                await self._restart_browser()
+            elif self.monitor is not None and self.monitor.browser_over_limit() is not None:
+                # 実行中のシナリオを中断しないよう、すべて返却されてから再起動する
+                await self._drained.wait_for(lambda: self._in_use == 0)
+                rss_mb = self.monitor.browser_over_limit()
+                if rss_mb is not None:
+                    print(f"♻️  ブラウザのメモリ使用量が上限を超えたため再起動します ({rss_mb:.0f}MB)")
+                    await self._restart_browser()
+
+            self._in_use += 1
+            self._browser_uses += 1
+            # sampled の録画はコンテキストではなくシナリオごとに抽選する
+            record_video = self.recording.should_record_video() if self.recording.varies else None
+            entry = self._pop_idle(record_video)
+            surplus = None
+            if entry is None and self._idle and len(self._idle) + self._in_use > self.max_size:
+                # 録画状態の合わないコンテキストが残って max_size を超えないよう、最も古いものを破棄する
+                surplus = self._idle.pop(0)
+
+        # ヘルスチェックとコンテキストの作成は他の利用者を待たせないようロックの外で行う
+        try:
+            if surplus is not None:
+                await self._discard(surplus)
+            while entry is not None and not await self._is_healthy(entry):
+                await self._discard(entry)
+                async with self._lock:
+                    entry = self._pop_idle(record_video)
+            if entry is None:
+                entry = await self._new_entry(record_video)
+        except BaseException:
+            if entry is not None:
+                await self._discard(entry)
+            async with self._lock:
+                self._in_use -= 1
+                self._drained.notify_all()
+            raise
+        return entry
+
+    def _pop_idle(self, record_video=None):
+        """
+        待機中のコンテキストを取り出す (ロックを取得して呼ぶ)
+
+        Args:
+            record_video: 録画状態の条件 (None の場合は問わない)
+
+        Returns:
+            最近使われた条件に合うコンテキスト (ない場合は None)
+        """
+        for index in range(len(self._idle) - 1, -1, -1):
+            if record_video is None or self._idle[index].automation.recording_video == record_video:
+                return self._idle.pop(index)
+        return None
+
+    async def _release(self, entry, discard=False):
+        entry.uses += 1
+        entry.last_used = time.monotonic()
+        reusable = False
+        try:
+            # リセットや破棄の間も貸し出し中として数え、ブラウザが再起動されないようにする
+            reusable = await self._recycle(entry, discard)
+        finally:
+            async with self._lock:
+                if reusable:
+                    self._idle.append(entry)
+                self._in_use -= 1
+                self._drained.notify_all()
+
+    async def _recycle(self, entry, discard):
+        """
+        返却されたコンテキストをリセットする (ロックの外で呼ぶ)
+
+        Returns:
+            再利用できる場合は True、破棄した場合は False
+        """
+        # シナリオごとの動画にする場合は録画したコンテキストを再利用しない
+        recorded = (entry.automation.recording_video and self.video_finalizer is not None
+                    and self.video_finalizer.per_scenario)
+        if discard or recorded or entry.uses >= self.max_uses or not self.browser.is_connected():
+            await self._discard(entry)
+            return False
+        if self.monitor is not None:
+            heap_mb = await self.monitor.context_over_limit(entry.automation)
+            if heap_mb is not None:
+                print(f"♻️  コンテキストの JS ヒープが上限を超えたため作り直します ({heap_mb:.0f}MB)")
+                await self._discard(entry)
+                return False
+        try:
+            await self._reset(entry)
+        except Exception:
+            await self._discard(entry)
+            return False
+        return True
+
+    async def _reset(self, entry):
+        """次の利用者のためにコンテキストの状態をリセットする (範囲は reuse の分離レベルによる)"""
+        await self.reuse.reset(entry.automation)
+
+    async def _is_healthy(self, entry):
+        """ページが応答するかどうかを確認する"""
+        page = entry.automation.page
+        if page is None or page.is_closed():
+            return False
+        try:
+            await asyncio.wait_for(page.evaluate("1"), timeout=self.health_check_timeout)
+            return True
+        except Exception:
+            return False
+
+    async def _discard(self, entry):
+        if self.monitor is not None:
+            self.monitor.unregister(entry.automation)
+        try:
+            await entry.automation.cleanup()
+        except Exception as e:
+            print(f"警告: コンテキストの終了に失敗しました: {str(e)}")
+
+    async def _close_idle(self):
+        while self._idle:
+            await self._discard(self._idle.pop())
+
+    async def _reap_idle(self):
+        """一定時間使われていないコンテキストを破棄し、min_idle 個を維持する"""
+        interval = max(1.0, self.idle_timeout / 2)
+        while True:
+            await asyncio.sleep(interval)
+            async with self._lock:
+                now = time.monotonic()
+                keep = []
+                stale = []
+                # 最近使われたものから残す
+                for entry in reversed(self._idle):
+                    if len(keep) < self.min_idle or now - entry.last_used < self.idle_timeout:
+                        keep.append(entry)
+                    else:
+                        stale.append(entry)
+                self._idle = list(reversed(keep))
+            for entry in stale:
+                await self._discard(entry)
+            await self._warm_up()
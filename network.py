@@ -0,0 +1,203 @@
+import asyncio
+import fnmatch
+import hashlib
+import json
+import os
+import time
+
+# キャッシュ対象とする静的リソースの種類
+CACHEABLE_RESOURCE_TYPES = ("stylesheet", "script", "image", "font", "media")
+
+# 保存済みの本文と矛盾するため、キャッシュから返すときに除外するヘッダー
+_DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+class ResponseCache:
+    """
+    ディスク上の HTTP レスポンスキャッシュ
+
+    URL とメソッドをキーに、本文 (.body) とメタデータ (.json) を保存する。
+    有効期限 (TTL) を過ぎたエントリは使わず、合計サイズが上限を超えると
+    最後に使われた時刻が古いものから削除する (LRU)。
+    複数のコンテキストや実行をまたいで共有できる。
+    """
+
+    def __init__(self, cache_dir="./tmp/response_cache", ttl=3600, max_bytes=200 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: キャッシュの保存先
+            ttl: 有効期限 (秒)
+            max_bytes: キャッシュ全体の最大サイズ (バイト)
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    def _key(self, method, url):
+        return hashlib.sha256(f"{method.upper()} {url}".encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".json", base + ".body"
+
+    def get(self, method, url):
+        """
+        キャッシュされたレスポンスを返す
+
+        Returns:
+            (status, headers, body) のタプル (未キャッシュまたは期限切れの場合は None)
+        """
+        meta_path, body_path = self._paths(self._key(method, url))
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if time.time() - meta["stored_at"] > self.ttl:
+                return None
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+        # LRU 判定用に最終利用時刻を更新する
+        os.utime(meta_path)
+        return meta["status"], meta["headers"], body
+
+    def put(self, method, url, status, headers, body):
+        """レスポンスを保存し、必要なら古いエントリを削除する"""
+        key = self._key(method, url)
+        meta_path, body_path = self._paths(key)
+        headers = {name: value for name, value in headers.items() if name.lower() not in _DROPPED_HEADERS}
+        meta = {"url": url, "method": method, "status": status, "headers": headers, "stored_at": time.time()}
+
+        previous_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+        # 別のコンテキストが同時に読んでも壊れないよう、一時ファイルから置き換える
+        suffix = f".{os.getpid()}.{id(body)}.tmp"
+        with open(body_path + suffix, "wb") as f:
+            f.write(body)
+        os.replace(body_path + suffix, body_path)
+        with open(meta_path + suffix, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_path + suffix, meta_path)
+
+        self._total_bytes += len(body) - previous_size
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """合計サイズが上限の 90% 以下になるまで、最後の利用が古いエントリから削除する"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for key, size, _ in entries:
+            if total <= target:
+                break
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+        self._total_bytes = total
+
+    def _entries(self):
+        """(キー, 本文サイズ, 最終利用時刻) の一覧"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-len(".json")]
+            meta_path, body_path = self._paths(key)
+            try:
+                entries.append((key, os.path.getsize(body_path), os.path.getmtime(meta_path)))
+            except OSError:
+                continue
+        return entries
+
+class NetworkRouter:
+    """
+    ブラウザコンテキストのリクエストを振り分けるルーティング層
+
+    - リソースの種類や URL パターンによるブロック
+    - 静的リソースのディスクキャッシュ (ResponseCache)
+    - HAR ファイルへの記録 (har_mode="record") と、HAR からのオフライン再生 (har_mode="replay")
+    """
+
+    def __init__(self, block_resource_types=(), block_url_patterns=(), cache=None,
+                 har_path=None, har_mode="replay"):
+        """
+        Args:
+            block_resource_types: ブロックするリソースの種類 (image, font, media など)
+            block_url_patterns: ブロックする URL のパターン (fnmatch 形式、例: "*google-analytics.com*")
+            cache: 静的リソースのキャッシュ (ResponseCache)
+            har_path: HAR ファイルのパス
+            har_mode: "record" (実際の通信を HAR に記録) または "replay" (HAR にない通信は中断)。
+                記録した HAR はコンテキストを閉じるときに書き出されるため、record は
+                コンテキストを1つだけ作る単発実行で使う
+        """
+        if har_mode not in ("record", "replay"):
+            raise ValueError(f"不正な HAR モードです: {har_mode} (record または replay)")
+        self.block_resource_types = set(block_resource_types)
+        self.block_url_patterns = list(block_url_patterns)
+        self.cache = cache
+        self.har_path = har_path
+        self.har_mode = har_mode
+        self.stats = {"blocked": 0, "cache_hits": 0, "cache_misses": 0}
+
+    async def install(self, context):
+        """コンテキストにルーティングを設定する"""
+        if self.har_path:
+            if self.har_mode == "record":
+                os.makedirs(os.path.dirname(os.path.abspath(self.har_path)), exist_ok=True)
+            await context.route_from_har(
+                self.har_path,
+                not_found="abort" if self.har_mode == "replay" else "fallback",
+                update=self.har_mode == "record",
+                update_content="embed",
+                update_mode="minimal"
+            )
+        # 後から登録したルートが先に評価されるため、HAR より前にブロック・キャッシュを判定できる
+        if self.block_resource_types or self.block_url_patterns or self._cache_enabled:
+            await context.route("**/*", self._handle_route)
+
+    @property
+    def _cache_enabled(self):
+        # HAR の記録・再生中は HAR 側に通信を任せる
+        return self.cache is not None and not self.har_path
+
+    def is_blocked(self, request):
+        if request.resource_type in self.block_resource_types:
+            return True
+        return any(fnmatch.fnmatchcase(request.url, pattern) for pattern in self.block_url_patterns)
+
+    async def _handle_route(self, route):
+        request = route.request
+        if self.is_blocked(request):
+            self.stats["blocked"] += 1
+            await route.abort("blockedbyclient")
+            return
+
+        if not self._cache_enabled or request.method != "GET" or request.resource_type not in CACHEABLE_RESOURCE_TYPES:
+            await route.fallback()
+            return
+
+        cached = await asyncio.to_thread(self.cache.get, request.method, request.url)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            status, headers, body = cached
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+
+        self.stats["cache_misses"] += 1
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception:
+            # 取得に失敗した場合はブラウザに通常どおり処理させ、リクエストを未解決のまま残さない
+            await route.fallback()
+            return
+        cache_control = response.headers.get("cache-control", "")
+        if response.ok and "no-store" not in cache_control:
+            await asyncio.to_thread(
+                self.cache.put, request.method, request.url, response.status, response.headers, body
+            )
+        await route.fulfill(response=response, body=body)
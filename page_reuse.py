@@ -0,0 +1,89 @@
+# シナリオの合間にリセットする範囲
+ISOLATION_LEVELS = ("page", "storage", "context")
+
+# 選択して消去できるストレージ
+STORAGE_KINDS = ("local", "session")
+
+# 自動操作インジケータとカウントダウンのオーバーレイを取り除く
+_REMOVE_OVERLAYS = """() => {
+    for (const id of ['automation-indicator', 'countdown-overlay']) {
+        const overlay = document.getElementById(id);
+        if (overlay) overlay.remove();
+    }
+}"""
+
+# 現在のオリジンの localStorage / sessionStorage を消去する (about:blank などでは何もしない)
+_CLEAR_STORAGE = """(kinds) => {
+    try {
+        if (kinds.includes('local')) localStorage.clear();
+        if (kinds.includes('session')) sessionStorage.clear();
+    } catch (e) {}
+}"""
+
+class PageReusePolicy:
+    """
+    コンテキストとページを複数のシナリオで使い回すときのリセット方法
+
+    isolation で指定できるレベル:
+        page: クッキーとストレージを残し、オーバーレイだけを取り除く
+            (HTTP キャッシュ・コンパイル済みの JS・接続に加えてログイン状態なども引き継ぐ)
+        storage: 訪れたオリジンのストレージと HTTP キャッシュを消去し、クッキーをセッションの
+            スナップショットの状態に戻す (新しいコンテキストと同じ状態から始まる)
+        context: シナリオごとにコンテキストを作り直す
+
+    いずれのレベルでも recycle_every 回使うとコンテキストを作り直す。
+    """
+
+    def __init__(self, isolation="storage", base_url=None, clear_storage=(), recycle_every=50):
+        """
+        Args:
+            isolation: page / storage / context のいずれか
+            base_url: シナリオの合間に移動する URL
+                (None の場合は storage では about:blank、page では移動しない)
+            clear_storage: シナリオの合間に消去する現在のオリジンのストレージ ("local" / "session" の組み合わせ、
+                storage では訪れたオリジンのストレージをすべて消去するため不要)
+            recycle_every: コンテキストを作り直すまでのシナリオ数
+        """
+        if isolation not in ISOLATION_LEVELS:
+            raise ValueError(f"不正な分離レベルです: {isolation} ({', '.join(ISOLATION_LEVELS)} のいずれか)")
+        unknown = [kind for kind in clear_storage if kind not in STORAGE_KINDS]
+        if unknown:
+            raise ValueError(f"不正なストレージの種類です: {', '.join(unknown)} ({', '.join(STORAGE_KINDS)} の組み合わせ)")
+        if recycle_every < 1:
+            raise ValueError(f"コンテキストを作り直すまでのシナリオ数は 1 以上で指定してください: {recycle_every}")
+        self.isolation = isolation
+        self.base_url = base_url
+        self.clear_storage = list(clear_storage)
+        self._recycle_every = recycle_every
+
+    @classmethod
+    def parse_storage(cls, value):
+        """カンマ区切りの文字列 (例: "local,session") から消去するストレージのリストを作る"""
+        return [kind.strip() for kind in (value or "").split(",") if kind.strip()]
+
+    @property
+    def recycle_every(self):
+        """コンテキストを作り直すまでのシナリオ数 (context の場合は毎回)"""
+        return 1 if self.isolation == "context" else self._recycle_every
+
+    async def reset(self, automation):
+        """次のシナリオのためにページの状態をリセットする (BrowserAutomationBase)"""
+        page = automation.page
+        await page.evaluate(_REMOVE_OVERLAYS)
+        # sessionStorage はページに残るため、移動する前に消去する
+        if self.clear_storage:
+            await page.evaluate(_CLEAR_STORAGE, self.clear_storage)
+        if self.isolation != "page":
+            await automation.clear_site_data()
+            await automation.restore_session()
+        # クッキーを残した場合、次のシナリオの accept_consent() はバナーの表示を待たない
+        automation.cookies_retained = self.isolation == "page"
+
+        target = self.base_url
+        if target is None and self.isolation != "page":
+            target = "about:blank"
+        if target is not None:
+            await page.goto(target)
+
+    def __str__(self):
+        return self.isolation
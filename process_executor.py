@@ -0,0 +1,266 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import time
+from pathlib import Path
+from action_registry import ACTIONS_DIR, find_action_file
+from action_runner import registry, run_scenario, print_batch_summary
+from browser_pool import BrowserPool
+from result_pipeline import BatchWriter, RecordBuffer
+from timing import TimingRecorder
+
+# ワーカーに終了を知らせる番兵
+_STOP = None
+
+def read_jobs_file(jobs_file):
+    """
+    ジョブファイルを読み込む (1行1ジョブ、「アクション名<TAB>クエリ」形式)
+
+    空行と # で始まる行は無視する。クエリを省略した行はクエリなしのジョブになる。
+
+    Args:
+        jobs_file: ジョブファイルのパス
+
+    Returns:
+        (アクション名, クエリ) のリスト
+    """
+    jobs = []
+    with open(jobs_file, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            action, _, query = line.partition("\t")
+            jobs.append((action.strip(), query.strip() or None))
+    return jobs
+
+def run_sharded(jobs, processes=None, concurrency=2, slowmo=0, headless=True, actions_dir=ACTIONS_DIR,
+                recording=None, fast=False, network=None, session=None, scheduler=None, sink=None,
+                output_batch=500, result_cache=None, monitor=None, profiling=None, video_finalizer=None,
+                reuse=None):
+    """
+    (アクション, クエリ) のジョブを複数のワーカープロセスに分散して実行する
+
+    ジョブは共有キューに積まれ、手の空いたワーカーから順に取り出すため、
+    処理の遅いプロセスがあっても他のプロセスが残りのジョブを引き受ける。
+    各プロセスは独自のイベントループとブラウザプールを持つ。
+
+    Args:
+        jobs: (アクション名, クエリ) のリスト
+        processes: ワーカープロセス数 (None の場合は CPU コア数)
+        concurrency: 1プロセスあたりの同時実行数
+        slowmo: スローモーションの時間 (ミリ秒)
+        headless: ヘッドレスモードで実行するかどうか
+        actions_dir: アクションファイルのディレクトリ
+        recording: 録画ポリシー (off, always, on-failure, sampled:N%)
+        fast: 高速モード (インジケータと表示用の待機を省略する)
+        network: リクエストのブロック・キャッシュ・HAR 再生を行う NetworkRouter
+        session: 同意バナーなどを省略するためのストレージ状態のスナップショット (SessionSnapshot)
+        scheduler: ホストごとの同時実行数・レート制限・再試行を行う HostScheduler。
+            各プロセスが複製を持つため、上限はプロセスごとに適用される
+        sink: run_actions が yield したレコードの出力先 (result_pipeline.open_sink() の戻り値)。
+            レコードはジョブの結果と一緒に親プロセスへ送られ、親プロセスがまとめて書き込む
+        output_batch: 出力先にまとめて書き込むレコード数
+        result_cache: 成功した結果を保存・再利用する ResultCache (各プロセスが同じファイルを開く)
+        monitor: メモリと CPU を記録する ResourceMonitor (各プロセスが設定を複製し、自分のブラウザを記録する)
+        profiling: トレースとステップごとの内訳を記録するシナリオを選ぶ ProfilingPolicy
+        video_finalizer: 録画したコンテキストの終了と動画の書き出しをバックグラウンドで行う VideoFinalizer
+            (各プロセスが設定を複製する)
+        reuse: シナリオの合間のコンテキストとページのリセット方法 (PageReusePolicy)
+
+    Returns:
+        ジョブごとの結果 (action, query, success, cached, elapsed, pid, timings, resources) のリスト
+    """
+    if not jobs:
+        return []
+
+    started = time.perf_counter()
+    writer = BatchWriter(sink, batch_size=output_batch) if sink is not None else None
+    results = [None] * len(jobs)
+    try:
+        # キャッシュ済みのジョブはワーカープロセスを起動せずに結果を返す
+        pending = []
+        for index, (action, query) in enumerate(jobs):
+            try:
+                action_file = find_action_file(actions_dir, action)
+            except ValueError as e:
+                # actions ディレクトリの外を指す名前はワーカーに渡さない
+                print(f"エラー: {e}")
+                results[index] = {
+                    "index": index,
+                    "action": action,
+                    "query": query,
+                    "success": False,
+                    "cached": False,
+                    "elapsed": 0.0,
+                    "pid": None,
+                    "timings": []
+                }
+                continue
+            records = None
+            if result_cache is not None:
+                if action_file.exists():
+                    records = _lookup_cached(result_cache, action_file, action, query)
+            if records is None:
+                pending.append((index, action, query))
+                continue
+            if writer is not None:
+                for record in records:
+                    writer.add({"action": action, "query": query, **record})
+            results[index] = {
+                "index": index,
+                "action": action,
+                "query": query,
+                "success": True,
+                "cached": True,
+                "elapsed": 0.0,
+                "pid": None,
+                "timings": []
+            }
+            print(f"💾 {action}: {query}")
+
+        processes = max(1, min(processes or os.cpu_count() or 1, len(pending) or 1))
+        # Playwright のドライバやイベントループを引き継がないよう spawn で起動する
+        mp_context = multiprocessing.get_context("spawn")
+        job_queue = mp_context.Queue()
+        result_queue = mp_context.Queue()
+        workers = []
+        if pending:
+            for job in pending:
+                job_queue.put(job)
+            for _ in range(processes * concurrency):
+                job_queue.put(_STOP)
+            workers = [
+                mp_context.Process(
+                    target=_worker_main,
+                    args=(job_queue, result_queue, str(actions_dir), concurrency, slowmo, headless, recording, fast,
+                          network, session, scheduler, sink is not None, result_cache, monitor,
+                          profiling, video_finalizer, reuse),
+                    daemon=True
+                )
+                for _ in range(processes)
+            ]
+            for worker in workers:
+                worker.start()
+
+        received = 0
+        while received < len(pending):
+            try:
+                result = result_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    break
+                continue
+            # レコードは書き込んだら結果から外し、メモリに残さない
+            for record in result.pop("records", []):
+                writer.add(record)
+            results[result["index"]] = result
+            received += 1
+    finally:
+        if writer is not None:
+            writer.close()
+            print(f"📝 {writer.written}件のレコードを保存しました: {sink.path}")
+
+    for worker in workers:
+        worker.join(timeout=10)
+
+    # 異常終了したプロセスが抱えていたジョブは失敗として扱う
+    for index, (action, query) in enumerate(jobs):
+        if results[index] is None:
+            results[index] = {
+                "index": index,
+                "action": action,
+                "query": query,
+                "success": False,
+                "elapsed": 0.0,
+                "pid": None,
+                "timings": [],
+                "error": "ワーカープロセスが異常終了しました"
+            }
+
+    print_batch_summary(results, time.perf_counter() - started)
+    return results
+
+def _lookup_cached(result_cache, action_file, action, query):
+    """キャッシュ済みのレコードを返す (なければ None)"""
+    cached = result_cache.get(action, query, registry.digest(action_file))
+    return cached[0] if cached is not None else None
+
+def _worker_main(job_queue, result_queue, actions_dir, concurrency, slowmo, headless, recording, fast, network,
+                 session, scheduler, collect_records, result_cache, monitor, profiling, video_finalizer, reuse):
+    """ワーカープロセスのエントリポイント"""
+    asyncio.run(_run_worker(
+        job_queue, result_queue, Path(actions_dir), concurrency, slowmo, headless, recording, fast, network, session,
+        scheduler, collect_records, result_cache, monitor, profiling, video_finalizer, reuse
+    ))
+
+async def _run_worker(job_queue, result_queue, actions_dir, concurrency, slowmo, headless, recording, fast,
+                      network, session, scheduler, collect_records, result_cache, monitor, profiling,
+                      video_finalizer, reuse):
+    loop = asyncio.get_running_loop()
+    pid = os.getpid()
+
+    def drain_resources():
+        if monitor is None:
+            return []
+        # プロセスごとにブラウザが異なるため、対象に pid を付ける
+        return [{**record, "target": f"{record['target']} (pid {pid})"} for record in monitor.drain()]
+
+    async def consume():
+        while True:
+            # 共有キューの取得はブロッキングなのでスレッドで待つ
+            job = await loop.run_in_executor(None, job_queue.get)
+            if job is _STOP:
+                return
+            index, action, query = job
+            timings = TimingRecorder(action=action, query=query)
+            output = RecordBuffer() if collect_records else None
+            started = time.perf_counter()
+            success = await run_scenario(
+                find_action_file(actions_dir, action),
+                query=query,
+                slowmo=slowmo,
+                headless=headless,
+                countdown=None,
+                pool=pool,
+                fast=fast,
+                timings=timings,
+                scheduler=scheduler,
+                output=output,
+                result_cache=result_cache,
+                profiling=profiling,
+                # キャッシュは親プロセスで確認済み
+                lookup_cache=False
+            )
+            elapsed = time.perf_counter() - started
+            cached = timings.has("phase", "result_cache_hit")
+            result_queue.put({
+                "index": index,
+                "action": action,
+                "query": query,
+                "success": success,
+                "cached": cached,
+                "elapsed": elapsed,
+                "pid": pid,
+                "timings": timings.records,
+                "resources": drain_resources(),
+                "records": output.records if output is not None else []
+            })
+            mark = "💾" if cached else "✅" if success else "❌"
+            print(f"{mark} [pid {pid}] {action}: {query} ({elapsed:.2f}秒)")
+
+    pool = BrowserPool(
+        headless=headless,
+        slowmo=slowmo,
+        max_size=concurrency,
+        min_idle=concurrency,
+        recording=recording,
+        network=network,
+        session=session,
+        monitor=monitor,
+        video_finalizer=video_finalizer,
+        reuse=reuse
+    )
+    async with pool:
+        await asyncio.gather(*(consume() for _ in range(concurrency)))
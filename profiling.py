@@ -0,0 +1,284 @@
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+
+# CDP の Performance.getMetrics の項目 (秒) と、レポートに出力する内訳 (ミリ秒)
+_CDP_BREAKDOWN = {
+    "scripting_ms": ("ScriptDuration",),
+    "rendering_ms": ("LayoutDuration", "RecalcStyleDuration"),
+    "main_thread_ms": ("TaskDuration",),
+}
+
+# ステップの記録に追加する内訳の列
+PROFILE_FIELDS = ["network_ms", "scripting_ms", "rendering_ms", "main_thread_ms"]
+
+class ProfilingPolicy:
+    """
+    プロファイリングの対象を選ぶポリシー
+
+    指定できるモード:
+        off: プロファイリングしない (slow_ms 指定時は遅いシナリオのみ)
+        always: すべてのシナリオをプロファイリングする
+        sampled:N%: N% のシナリオだけをプロファイリングする (例: sampled:1%)
+
+    選ばれなかったシナリオは計測しない。slow_ms を指定した場合だけ、選ばれなかったシナリオも
+    トレースだけを記録しておき (ステップごとの内訳は取らない)、run_actions の所要時間が slow_ms を超えた場合に保存する。
+    """
+
+    def __init__(self, mode="off", sample_rate=0.0, slow_ms=None, trace_dir="./tmp/traces"):
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.trace_dir = trace_dir
+
+    @classmethod
+    def parse(cls, value, slow_ms=None, trace_dir="./tmp/traces"):
+        """文字列からポリシーを作成する"""
+        value = (value or "off").strip().lower()
+        if value == "off":
+            return cls("off", 0.0, slow_ms, trace_dir)
+        if value == "always":
+            return cls("always", 1.0, slow_ms, trace_dir)
+        if value.startswith("sampled:"):
+            rate = value[len("sampled:"):].rstrip("%")
+            try:
+                percent = float(rate)
+            except ValueError:
+                raise ValueError(f"不正なサンプリング率です: {value}")
+            if not 0 <= percent <= 100:
+                raise ValueError(f"サンプリング率は 0〜100% で指定してください: {value}")
+            return cls("sampled", percent / 100, slow_ms, trace_dir)
+        raise ValueError(f"不正なプロファイリングモードです: {value} (off, always, sampled:N% のいずれか)")
+
+    @property
+    def enabled(self):
+        """いずれかのシナリオをプロファイリングする可能性があるかどうか"""
+        return self.sample_rate > 0 or self.slow_ms is not None
+
+    def should_profile(self):
+        """新しいシナリオをサンプリングの対象にするかどうか"""
+        return random.random() < self.sample_rate
+
+    def __str__(self):
+        if self.mode == "sampled":
+            return f"sampled:{self.sample_rate * 100:g}%"
+        return self.mode
+
+class _NetworkActivity:
+    """ページのリクエストが1件以上処理中だった時間 (重なりは1回だけ数える) を累積する"""
+
+    def __init__(self, page):
+        self.page = page
+        self._in_flight = 0
+        self._busy_since = None
+        self._busy = 0.0
+
+    def start(self):
+        self.page.on("request", self._on_request)
+        self.page.on("requestfinished", self._on_done)
+        self.page.on("requestfailed", self._on_done)
+
+    def stop(self):
+        self.page.remove_listener("request", self._on_request)
+        self.page.remove_listener("requestfinished", self._on_done)
+        self.page.remove_listener("requestfailed", self._on_done)
+
+    def busy_ms(self):
+        busy = self._busy
+        if self._busy_since is not None:
+            busy += time.perf_counter() - self._busy_since
+        return busy * 1000
+
+    def _on_request(self, request):
+        if self._in_flight == 0:
+            self._busy_since = time.perf_counter()
+        self._in_flight += 1
+
+    def _on_done(self, request):
+        if self._in_flight == 0:
+            return
+        self._in_flight -= 1
+        if self._in_flight == 0:
+            self._busy += time.perf_counter() - self._busy_since
+            self._busy_since = None
+
+class ScenarioProfiler:
+    """
+    1回のシナリオのトレースとステップごとの内訳を記録する
+
+    TimingRecorder.profiler に設定すると、ページ操作のステップの前後で
+    CDP の Performance.getMetrics とネットワークの処理中時間を取得し、
+    ステップの記録に network_ms / scripting_ms / rendering_ms / main_thread_ms を追加する。
+    トレースは Playwright の tracing で記録し、対象に選ばれたシナリオだけ保存する。
+    シナリオごとの作成は for_scenario() で行い、計測しないシナリオでは作成しない。
+    """
+
+    @classmethod
+    def for_scenario(cls, policy, automation, timings=None, name="scenario"):
+        """
+        ポリシーに従ってシナリオの計測方法を選ぶ
+
+        Returns:
+            サンプリングに選ばれた場合はトレースと内訳を記録する ScenarioProfiler、
+            slow_ms だけが対象の場合はトレースだけを記録する ScenarioProfiler、
+            どちらでもない場合は None (トレースも CDP の計測も行わない)
+        """
+        if policy is None:
+            return None
+        if policy.should_profile():
+            return cls(policy, automation, timings, name, sampled=True)
+        if policy.slow_ms is not None:
+            return cls(policy, automation, None, name, sampled=False)
+        return None
+
+    def __init__(self, policy, automation, timings=None, name="scenario", sampled=True):
+        """
+        Args:
+            policy: ProfilingPolicy
+            automation: シナリオを実行する BrowserAutomationBase
+            timings: 内訳を追加する TimingRecorder (None の場合はトレースのみ)
+            name: トレースのファイル名に含める識別子 (アクション名とクエリなど)
+            sampled: サンプリングの対象かどうか (False の場合は slow_ms を超えたときだけトレースを保存する)
+        """
+        self.policy = policy
+        self.automation = automation
+        self.timings = timings
+        self.name = name
+        self.sampled = sampled
+        self.trace_path = None
+
+        self._cdp = None
+        self._network = None
+        self._stack = []
+        self._pending = []
+        self._elapsed = 0.0
+        self._tracing = False
+
+    async def start(self):
+        """トレースと CDP の計測を開始する"""
+        try:
+            await self.automation.start_trace()
+            self._tracing = True
+        except Exception as e:
+            print(f"警告: トレースを開始できません: {str(e)}")
+        if self.timings is None:
+            return
+        try:
+            self._cdp = await self.automation.context.new_cdp_session(self.automation.page)
+            await self._cdp.send("Performance.enable")
+        except Exception:
+            # Chromium 以外のブラウザではトレースのみ記録する
+            self._cdp = None
+        self._network = _NetworkActivity(self.automation.page)
+        self._network.start()
+        self.timings.profiler = self
+
+    @contextmanager
+    def measure(self):
+        """
+        slow_ms と比べる所要時間に含める区間 (アクションの実行部分) を計測する
+
+        インジケータやカウントダウンなど表示用の待機を含めないよう、run_actions の前後だけを囲む。
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._elapsed += time.perf_counter() - started
+
+    async def stop(self):
+        """
+        計測を終了し、対象に選ばれたシナリオであればトレースを保存して内訳を記録に追加する
+
+        Returns:
+            保存したトレースのパス (保存しなかった場合は None)
+        """
+        elapsed_ms = self._elapsed * 1000
+        keep = self.sampled or (self.policy.slow_ms is not None and elapsed_ms > self.policy.slow_ms)
+        if self.timings is not None:
+            self.timings.profiler = None
+        if self._network is not None:
+            self._network.stop()
+        if self._cdp is not None:
+            try:
+                await self._cdp.detach()
+            except Exception:
+                pass
+
+        if keep:
+            for record, breakdown in self._pending:
+                record.update(breakdown)
+        if not self._tracing:
+            return None
+        if keep:
+            os.makedirs(self.policy.trace_dir, exist_ok=True)
+            safe_name = re.sub(r"[^\w.-]+", "_", self.name)
+            self.trace_path = os.path.join(
+                self.policy.trace_dir, f"trace_{safe_name}_{time.strftime('%Y%m%d-%H%M%S')}.zip"
+            )
+        try:
+            # 保存しない場合はパスを指定せずに破棄する
+            await self.automation.stop_trace(self.trace_path)
+        except Exception as e:
+            print(f"警告: トレースを保存できません: {str(e)}")
+            self.trace_path = None
+        if self.trace_path:
+            reason = "サンプリング" if self.sampled else f"{elapsed_ms:.0f}ms"
+            print(f"🔍 トレースを保存しました ({reason}): {self.trace_path}")
+        return self.trace_path
+
+    async def step_started(self):
+        """ステップの開始時の値を記録する (TimingRecorder から呼び出される)"""
+        self._stack.append((self._network.busy_ms(), await self._metrics()))
+
+    async def step_finished(self, record):
+        """ステップの終了時の値との差を内訳として保留する (保存する場合のみ記録に追加する)"""
+        if not self._stack:
+            return
+        network_before, metrics_before = self._stack.pop()
+        breakdown = {"network_ms": round(self._network.busy_ms() - network_before, 3)}
+        metrics_after = await self._metrics()
+        for field, names in _CDP_BREAKDOWN.items():
+            if all(name in metrics_before and name in metrics_after for name in names):
+                seconds = sum(metrics_after[name] - metrics_before[name] for name in names)
+                breakdown[field] = round(seconds * 1000, 3)
+        self._pending.append((record, breakdown))
+
+    async def _metrics(self):
+        if self._cdp is None:
+            return {}
+        try:
+            response = await self._cdp.send("Performance.getMetrics")
+        except Exception:
+            return {}
+        return {metric["name"]: metric["value"] for metric in response.get("metrics", [])}
+
+def print_profile_summary(records, limit=10):
+    """プロファイリングしたステップの内訳の平均を、所要時間の長い順に表示する"""
+    groups = {}
+    for record in records:
+        if record["kind"] == "step" and "network_ms" in record:
+            groups.setdefault((record["name"], record["target"]), []).append(record)
+    if not groups:
+        return
+
+    rows = []
+    for (name, target), group in groups.items():
+        row = {"name": name, "target": target, "count": len(group)}
+        for field in ["duration_ms"] + PROFILE_FIELDS:
+            values = [record[field] for record in group if record.get(field) is not None]
+            row[field] = sum(values) / len(values) if values else None
+        rows.append(row)
+    rows.sort(key=lambda row: row["duration_ms"], reverse=True)
+
+    def cell(value):
+        return f"{value:>10.1f}" if value is not None else f"{'-':>10}"
+
+    print(f"\nプロファイリングの内訳 (平均、所要時間の長い順、上位 {min(limit, len(rows))}件):")
+    print(f"{'名前':<20} {'件数':>5} {'所要(ms)':>10} {'通信(ms)':>10} {'JS(ms)':>10} {'描画(ms)':>10} {'メイン(ms)':>10}  対象")
+    for row in rows[:limit]:
+        print(f"{row['name']:<20} {row['count']:>5} " + " ".join(
+            cell(row[field]) for field in ["duration_ms"] + PROFILE_FIELDS
+        ) + f"  {row['target'] or ''}")
@@ -0,0 +1,110 @@
+"""
+BrowserAutomationBase を使ったブラウザテスト用の pytest プラグイン
+
+フィクスチャ:
+    browser: セッション全体で共有するブラウザ (プロセスごとに1回だけ起動)
+    automation: テストごとに新しいコンテキストを作成した BrowserAutomationBase
+    page: automation.page
+    query: --query / --queries-file で指定したクエリ (クエリごとにテストがパラメータ化される)
+
+pytest-xdist で並列実行した場合も、各ワーカーが自分のブラウザを起動する。
+録画ポリシーが on-failure の場合、失敗したテストのスクリーンショットを保存する。
+"""
+import os
+import pytest
+import pytest_asyncio
+from browser_base import BrowserAutomationBase, fast_mode
+from recording import RecordingPolicy
+from session_state import SessionSnapshot, SessionTracker, current_session
+
+def pytest_addoption(parser):
+    group = parser.getgroup("browser", "browser automation")
+    group.addoption("--query", action="append", default=[], help="Search query for the test (repeatable)")
+    group.addoption("--queries-file", action="store", default=None, help="File with one search query per line")
+    group.addoption("--slowmo", action="store", type=int, default=0, help="Slow motion delay in milliseconds")
+    group.addoption("--headless", action="store_true", default=False, help="Run the browser headless")
+    group.addoption("--fast", action="store_true", default=False, help="Skip overlays and presentation waits")
+    group.addoption("--record", action="store", default=None,
+                    help="Recording mode: off, always, on-failure, sampled:N% (default: $RECORDING_MODE or always)")
+    group.addoption("--session", action="store", default=None, help="Name of the storage-state snapshot to reuse")
+
+@pytest.hookimpl(hookwrapper=True, tryfirst=True)
+def pytest_runtest_makereport(item, call):
+    """フィクスチャの後処理からテストの結果を参照できるよう、フェーズごとのレポートを item に保存する"""
+    outcome = yield
+    report = outcome.get_result()
+    setattr(item, f"rep_{report.when}", report)
+
+def _read_queries(config):
+    queries = [query for query in config.getoption("--query") if query]
+    queries_file = config.getoption("--queries-file")
+    if queries_file:
+        with open(queries_file, encoding="utf-8") as f:
+            queries += [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+    return queries
+
+def pytest_generate_tests(metafunc):
+    """query フィクスチャを使うテストをクエリごとにパラメータ化する"""
+    if "query" in metafunc.fixturenames:
+        queries = _read_queries(metafunc.config)
+        metafunc.parametrize("query", queries or [None], ids=queries or ["no-query"])
+
+def _worker_id():
+    """pytest-xdist のワーカー名 (並列実行していない場合は main)"""
+    return os.environ.get("PYTEST_XDIST_WORKER", "main")
+
+def _browser_options(config):
+    recording = config.getoption("--record")
+    return {
+        "headless": config.getoption("--headless"),
+        "slowmo": config.getoption("--slowmo"),
+        # 並列実行時にファイル名が衝突しないようワーカーごとに分ける
+        "recording_dir": os.path.join(os.environ.get("RECORDING_PATH", "./tmp/record_videos"), _worker_id()),
+        "recording": RecordingPolicy.parse(recording) if recording else None,
+        "fast": config.getoption("--fast"),
+    }
+
+@pytest_asyncio.fixture(scope="session")
+async def browser(pytestconfig):
+    """セッション全体で共有するブラウザ"""
+    launcher = BrowserAutomationBase(**_browser_options(pytestconfig))
+    await launcher.launch()
+    yield launcher.browser
+    await launcher.cleanup()
+
+@pytest.fixture
+def query(request):
+    """検索クエリ (pytest_generate_tests でパラメータ化される)"""
+    return getattr(request, "param", None)
+
+@pytest_asyncio.fixture
+async def automation(browser, pytestconfig, request):
+    """テストごとに新しいコンテキストを作成した BrowserAutomationBase"""
+    session_name = pytestconfig.getoption("--session")
+    automation = BrowserAutomationBase(
+        browser=browser,
+        session=SessionSnapshot(session_name) if session_name else None,
+        **_browser_options(pytestconfig)
+    )
+    await automation.setup()
+    # presentation_wait() と accept_consent() に高速モードとセッションの状態を伝える
+    tracker = SessionTracker(automation.session, automation.session_applied) if automation.session else None
+    # フィクスチャの後処理は別のコンテキストで実行されることがあるため、reset() ではなく元の値を設定し直す
+    previous_fast, previous_session = fast_mode.get(), current_session.get()
+    fast_mode.set(automation.fast)
+    current_session.set(tracker)
+    yield automation
+    current_session.set(previous_session)
+    fast_mode.set(previous_fast)
+    report = getattr(request.node, "rep_call", None)
+    if report is not None and report.failed:
+        await automation.capture_failure(request.node.nodeid)
+    # 同意バナーを閉じた場合は次のテストのためにスナップショットを保存する
+    if tracker is not None and tracker.consent_clicked:
+        await tracker.snapshot.save(automation.context)
+    await automation.cleanup()
+
+@pytest.fixture
+def page(automation):
+    """テスト用のページ"""
+    return automation.page
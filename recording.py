@@ -0,0 +1,65 @@
+import os
+import random
+
+# 録画ポリシーを指定する環境変数
+RECORDING_MODE_ENV = "RECORDING_MODE"
+
+class RecordingPolicy:
+    """
+    動画録画のポリシー
+
+    指定できるモード:
+        off: 録画しない
+        always: 常に録画する
+        on-failure: 録画せず、失敗したシナリオのみスクリーンショットを保存する
+        sampled:N%: N% のシナリオだけを録画する (例: sampled:10%)
+    """
+
+    def __init__(self, mode="always", sample_rate=1.0):
+        self.mode = mode
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def parse(cls, value):
+        """文字列からポリシーを作成する"""
+        value = (value or "always").strip().lower()
+        if value in ("off", "always", "on-failure"):
+            return cls(value)
+        if value.startswith("sampled:"):
+            rate = value[len("sampled:"):].rstrip("%")
+            try:
+                percent = float(rate)
+            except ValueError:
+                raise ValueError(f"不正なサンプリング率です: {value}")
+            if not 0 <= percent <= 100:
+                raise ValueError(f"サンプリング率は 0〜100% で指定してください: {value}")
+            return cls("sampled", percent / 100)
+        raise ValueError(f"不正な録画モードです: {value} (off, always, on-failure, sampled:N% のいずれか)")
+
+    @classmethod
+    def from_env(cls, default="always"):
+        """環境変数 RECORDING_MODE からポリシーを作成する"""
+        return cls.parse(os.environ.get(RECORDING_MODE_ENV, default))
+
+    def should_record_video(self):
+        """シナリオを録画するかどうか (sampled の場合は呼び出すたびに抽選する)"""
+        if self.mode == "always":
+            return True
+        if self.mode == "sampled":
+            return random.random() < self.sample_rate
+        return False
+
+    @property
+    def varies(self):
+        """シナリオごとに録画するかどうかが変わるか (sampled の場合のみ)"""
+        return self.mode == "sampled"
+
+    @property
+    def capture_on_failure(self):
+        """失敗時にスクリーンショットを保存するかどうか"""
+        return self.mode == "on-failure"
+
+    def __str__(self):
+        if self.mode == "sampled":
+            return f"sampled:{self.sample_rate * 100:g}%"
+        return self.mode
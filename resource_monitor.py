@@ -0,0 +1,229 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+# Chromium のプロセス名に含まれる文字列
+_BROWSER_PROCESS_NAMES = ("chrome", "chromium", "headless_shell")
+
+class ResourceMonitor:
+    """
+    ブラウザのメモリと CPU を一定間隔で記録するモニター
+
+    - psutil がインストールされていれば、このプロセスが起動した Chromium の各プロセス
+      (browser / renderer / gpu-process など) の RSS と CPU 使用率
+    - 登録されたコンテキストごとに CDP の Performance.getMetrics による JS ヒープと DOM ノード数
+
+    記録は TimingRecorder と同じ形式 (kind="resource"、value に値) で、計測結果のレポートに時系列として出力できる。
+    しきい値を超えたコンテキストやブラウザは、BrowserPool がシナリオの合間に作り直す。
+    """
+
+    def __init__(self, interval=5.0, context_memory_mb=None, browser_memory_mb=None, max_samples=10000):
+        """
+        Args:
+            interval: 記録する間隔 (秒)
+            context_memory_mb: コンテキストを作り直す JS ヒープの使用量 (MB、None の場合は作り直さない)
+            browser_memory_mb: ブラウザを再起動する Chromium プロセスの RSS の合計 (MB、None の場合は再起動しない)
+            max_samples: drain() されるまで保持する記録の最大数 (古いものから捨てる)
+        """
+        self.interval = interval
+        self.context_memory_mb = context_memory_mb
+        self.browser_memory_mb = browser_memory_mb
+        self.max_samples = max_samples
+        self.samples = deque(maxlen=max_samples)
+        self.latest = {}
+
+        self._contexts = {}
+        self._context_ids = 0
+        self._processes = {}
+        self._psutil = None
+        self._task = None
+        self._origin = time.perf_counter()
+
+    def __getstate__(self):
+        # ワーカープロセスには設定だけを渡す
+        return {
+            "interval": self.interval,
+            "context_memory_mb": self.context_memory_mb,
+            "browser_memory_mb": self.browser_memory_mb,
+            "max_samples": self.max_samples,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    async def start(self):
+        """定期的な記録を開始する"""
+        try:
+            import psutil
+            self._psutil = psutil
+        except ImportError:
+            print("警告: psutil がインストールされていないため、プロセスの RSS と CPU は記録しません (pip install psutil)")
+        self._origin = time.perf_counter()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def register(self, automation):
+        """JS ヒープを記録するコンテキスト (BrowserAutomationBase) を登録する"""
+        self._context_ids += 1
+        self._contexts[id(automation)] = {"label": f"context {self._context_ids}", "automation": automation,
+                                          "cdp": None}
+
+    def unregister(self, automation):
+        self._contexts.pop(id(automation), None)
+
+    def drain(self):
+        """前回以降の記録を取り出す (長時間の実行でもメモリに溜め込まない)"""
+        samples = list(self.samples)
+        self.samples.clear()
+        return samples
+
+    async def context_over_limit(self, automation):
+        """
+        コンテキストの JS ヒープがしきい値を超えているか (シナリオの合間に呼び出す)
+
+        Returns:
+            超えている場合は使用量 (MB)、超えていなければ None
+        """
+        if self.context_memory_mb is None:
+            return None
+        entry = self._contexts.get(id(automation))
+        if entry is None:
+            return None
+        metrics = await self._context_metrics(entry)
+        heap_mb = metrics.get("js_heap_used_mb")
+        if heap_mb is not None and heap_mb > self.context_memory_mb:
+            return heap_mb
+        return None
+
+    def browser_over_limit(self):
+        """
+        直近の記録で Chromium の RSS の合計がしきい値を超えているか
+
+        Returns:
+            超えている場合は RSS の合計 (MB)、超えていなければ None
+        """
+        rss_mb = self.latest.get(("rss_mb", "total"))
+        if self.browser_memory_mb is not None and rss_mb is not None and rss_mb > self.browser_memory_mb:
+            return rss_mb
+        return None
+
+    def browser_restarted(self):
+        """ブラウザの再起動後に、古いプロセスの記録を判定に使わないようにする"""
+        self.latest.pop(("rss_mb", "total"), None)
+        self._processes = {}
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sample()
+            except Exception as e:
+                print(f"警告: リソースの記録に失敗しました: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def sample(self):
+        """すべてのプロセスとコンテキストを1回記録する"""
+        if self._psutil is not None:
+            for name, target, value in await asyncio.to_thread(self._process_metrics):
+                self._add(name, target, value)
+        for entry in list(self._contexts.values()):
+            for name, value in (await self._context_metrics(entry)).items():
+                self._add(name, entry["label"], value)
+
+    def _add(self, name, target, value):
+        self.latest[(name, target)] = value
+        self.samples.append({
+            "action": None,
+            "query": None,
+            "kind": "resource",
+            "name": name,
+            "target": target,
+            "start_ms": round((time.perf_counter() - self._origin) * 1000, 3),
+            "duration_ms": None,
+            "ok": True,
+            "value": value
+        })
+
+    def _browser_processes(self):
+        """このプロセスの子孫の Chromium プロセス (cpu_percent を比較できるよう同じオブジェクトを使い回す)"""
+        psutil = self._psutil
+        processes = {}
+        for child in psutil.Process(os.getpid()).children(recursive=True):
+            try:
+                if not any(name in child.name().lower() for name in _BROWSER_PROCESS_NAMES):
+                    continue
+                processes[child.pid] = self._processes.get(child.pid, child)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        self._processes = processes
+        return processes.values()
+
+    def _process_metrics(self):
+        """プロセスの種類 (browser / renderer / gpu-process など) ごとの RSS と CPU 使用率"""
+        psutil = self._psutil
+        totals = {}
+        for process in self._browser_processes():
+            try:
+                process_type = "browser"
+                for arg in process.cmdline():
+                    if arg.startswith("--type="):
+                        process_type = arg.split("=", 1)[1]
+                rss_mb = process.memory_info().rss / (1024 * 1024)
+                cpu = process.cpu_percent(interval=None)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            rss, cpu_total = totals.get(process_type, (0.0, 0.0))
+            totals[process_type] = (rss + rss_mb, cpu_total + cpu)
+
+        metrics = []
+        for process_type, (rss_mb, cpu) in sorted(totals.items()):
+            metrics.append(("rss_mb", process_type, round(rss_mb, 1)))
+            metrics.append(("cpu_percent", process_type, round(cpu, 1)))
+        if totals:
+            metrics.append(("rss_mb", "total", round(sum(rss for rss, _ in totals.values()), 1)))
+        return metrics
+
+    async def _context_metrics(self, entry):
+        """CDP の Performance.getMetrics で JS ヒープと DOM ノード数を取得する"""
+        automation = entry["automation"]
+        if automation.page is None or automation.page.is_closed():
+            return {}
+        try:
+            if entry["cdp"] is None:
+                entry["cdp"] = await automation.context.new_cdp_session(automation.page)
+                await entry["cdp"].send("Performance.enable")
+            response = await entry["cdp"].send("Performance.getMetrics")
+        except Exception:
+            # Chromium 以外のブラウザやページの遷移中は記録しない
+            entry["cdp"] = None
+            return {}
+        values = {metric["name"]: metric["value"] for metric in response.get("metrics", [])}
+        metrics = {}
+        if "JSHeapUsedSize" in values:
+            metrics["js_heap_used_mb"] = round(values["JSHeapUsedSize"] / (1024 * 1024), 1)
+        if "JSHeapTotalSize" in values:
+            metrics["js_heap_total_mb"] = round(values["JSHeapTotalSize"] / (1024 * 1024), 1)
+        if "Nodes" in values:
+            metrics["dom_nodes"] = values["Nodes"]
+        return metrics
+
+def print_resource_summary(records):
+    """ResourceMonitor の記録から、項目ごとの最大値と最後の値を表示する"""
+    groups = {}
+    for record in records:
+        if record["kind"] == "resource":
+            groups.setdefault((record["name"], record["target"]), []).append(record["value"])
+    if not groups:
+        return
+    print("\nリソース使用量 (最大 / 最後):")
+    for (name, target), values in sorted(groups.items()):
+        print(f"  {name:<18} {target:<14} {max(values):>10.1f} / {values[-1]:.1f}")
@@ -0,0 +1,164 @@
+import json
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+
+def normalize_query(query):
+    """キャッシュのキーに使うクエリ (全角・半角の揺れと前後・連続する空白をそろえる)"""
+    if query is None:
+        return ""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", query)).strip()
+
+class ResultCache:
+    """
+    シナリオの結果の SQLite キャッシュ
+
+    アクション名・正規化したクエリ・アクションファイルの内容のハッシュをキーに、
+    成功したシナリオが yield したレコードを保存する。キャッシュにある組み合わせはブラウザを使わずに結果を返す。
+    アクションファイルを変更するとハッシュが変わるため、古い結果は使われない。
+    有効期限 (TTL) を過ぎたエントリは使わず、合計サイズが上限を超えると
+    最後に使われた時刻が古いものから削除する (LRU)。
+    複数のプロセスから同じファイルを共有できる。
+    """
+
+    def __init__(self, path="./tmp/result_cache.sqlite3", ttl=86400, max_bytes=100 * 1024 * 1024, max_age=None,
+                 refresh=False):
+        """
+        Args:
+            path: SQLite ファイルのパス
+            ttl: 有効期限 (秒)
+            max_bytes: 保存するレコードの合計の最大サイズ (バイト)
+            max_age: この実行で使うエントリの最大経過時間 (秒、None の場合は ttl)
+            refresh: True の場合はキャッシュを使わずに実行し直し、結果で置き換える
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.refresh = refresh
+        self.stats = {"hits": 0, "misses": 0, "stored": 0}
+        self._connection = None
+
+    def __getstate__(self):
+        # ワーカープロセスには接続を渡さず、各プロセスで開き直す
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "action TEXT NOT NULL, query TEXT NOT NULL, digest TEXT NOT NULL, records TEXT NOT NULL, "
+                "size INTEGER NOT NULL, stored_at REAL NOT NULL, used_at REAL NOT NULL, "
+                "PRIMARY KEY (action, query, digest))"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS results_used_at ON results (used_at)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS results_stored_at ON results (stored_at)")
+            # 合計サイズはトリガーで更新し、保存のたびに SUM(size) で全件を数えないようにする
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results BEGIN "
+                "UPDATE usage SET total = total + new.size; END"
+            )
+            self._connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS results_update AFTER UPDATE OF size ON results BEGIN "
+                "UPDATE usage SET total = total + new.size - old.size; END"
+            )
+            self._connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results BEGIN "
+                "UPDATE usage SET total = total - old.size; END"
+            )
+            # 合計サイズを持たない既存のファイルは、最初に開いたときだけ数える
+            self._connection.execute(
+                "INSERT OR IGNORE INTO usage (id, total) "
+                "SELECT 0, COALESCE(SUM(size), 0) FROM results WHERE NOT EXISTS (SELECT 1 FROM usage)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, action, query, digest):
+        """
+        キャッシュされたレコードを返す
+
+        Returns:
+            (レコードのリスト, 保存してからの経過秒数) のタプル (未キャッシュ・期限切れ・refresh 時は None)
+        """
+        if self.refresh:
+            self.stats["misses"] += 1
+            return None
+        key = (action, normalize_query(query), digest)
+        now = time.time()
+        try:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT records, stored_at FROM results WHERE action = ? AND query = ? AND digest = ?", key
+            ).fetchone()
+            max_age = self.ttl if self.max_age is None else self.max_age
+            if row is None or now - row[1] > max_age:
+                self.stats["misses"] += 1
+                return None
+
+            # LRU 判定用に最終利用時刻を更新する
+            with connection:
+                connection.execute(
+                    "UPDATE results SET used_at = ? WHERE action = ? AND query = ? AND digest = ?", (now,) + key
+                )
+        except sqlite3.Error as e:
+            # キャッシュが使えなくてもシナリオは実行する
+            print(f"警告: 結果キャッシュを読み込めません: {e}")
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return json.loads(row[0]), now - row[1]
+
+    def put(self, action, query, digest, records):
+        """成功したシナリオのレコードを保存し、必要なら古いエントリを削除する"""
+        payload = json.dumps(records, ensure_ascii=False)
+        now = time.time()
+        try:
+            connection = self._connect()
+            with connection:
+                # INSERT OR REPLACE は削除のトリガーを起動しないため、既存のエントリは UPDATE で置き換える
+                connection.execute(
+                    "INSERT INTO results (action, query, digest, records, size, stored_at, used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (action, query, digest) DO UPDATE SET "
+                    "records = excluded.records, size = excluded.size, "
+                    "stored_at = excluded.stored_at, used_at = excluded.used_at",
+                    (action, normalize_query(query), digest, payload, len(payload.encode("utf-8")), now, now)
+                )
+            self.evict()
+        except sqlite3.Error as e:
+            print(f"警告: 結果キャッシュに保存できません: {e}")
+            return
+        self.stats["stored"] += 1
+
+    def evict(self):
+        """期限切れのエントリを削除し、合計サイズが上限を超えていれば上限の 90% まで LRU で削除する"""
+        connection = self._connect()
+        with connection:
+            connection.execute("DELETE FROM results WHERE stored_at < ?", (time.time() - self.ttl,))
+            total = connection.execute("SELECT total FROM usage").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            target = self.max_bytes * 0.9
+            removed = []
+            for rowid, size in connection.execute("SELECT rowid, size FROM results ORDER BY used_at"):
+                if total <= target:
+                    break
+                removed.append((rowid,))
+                total -= size
+            connection.executemany("DELETE FROM results WHERE rowid = ?", removed)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,255 @@
+"""
+アクションが yield したレコードをファイルに書き出すパイプライン
+
+レコードは上限付きのキューを通して書き込みタスクに渡され、batch_size 件ずつまとめて書き込まれる。
+書き込みが追いつかずキューが満杯になると、put() が待たされる (バックプレッシャー)。
+大量のクエリを実行しても、結果をすべてメモリに保持することはない。
+"""
+import asyncio
+import csv
+import json
+import os
+from contextlib import asynccontextmanager
+
+# 出力形式と拡張子
+SINK_SUFFIXES = {
+    ".jsonl": "jsonl",
+    ".json": "jsonl",
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+}
+
+class JsonlSink:
+    """1行1レコードの JSON"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write_batch(self, records):
+        self._file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class CsvSink:
+    """CSV (列は最初のバッチに含まれるキーで決め、以降に現れたキーは警告して出力しない)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = None
+        self._dropped = set()
+
+    def write_batch(self, records):
+        if self._writer is None:
+            fieldnames = list(dict.fromkeys(key for record in records for key in record))
+            self._writer = csv.DictWriter(self._file, fieldnames=fieldnames, extrasaction="ignore")
+            self._writer.writeheader()
+        else:
+            known = set(self._writer.fieldnames) | self._dropped
+            new_keys = list(dict.fromkeys(key for record in records for key in record if key not in known))
+            if new_keys:
+                self._dropped.update(new_keys)
+                print(f"警告: {os.path.basename(self.path)}: 最初のバッチにない列は出力しません: {', '.join(new_keys)}")
+        self._writer.writerows(records)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class _ArrowSink:
+    """pyarrow を使う列指向形式 (スキーマは最初のバッチから決め、1バッチを1つのまとまりとして書く)"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow
+        except ImportError:
+            raise ValueError(f"{os.path.basename(path)}: Parquet / Arrow の出力には pyarrow が必要です (pip install pyarrow)")
+        self._pa = pyarrow
+        self.path = path
+        self._writer = None
+
+    def write_batch(self, records):
+        if self._writer is None:
+            table = self._pa.Table.from_pylist(records)
+            self._writer = self._open_writer(table.schema)
+        else:
+            table = self._pa.Table.from_pylist(records, schema=self._writer.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+class ParquetSink(_ArrowSink):
+    """Parquet (1バッチが1つの行グループになる)"""
+
+    def _open_writer(self, schema):
+        import pyarrow.parquet
+        return pyarrow.parquet.ParquetWriter(self.path, schema)
+
+class ArrowSink(_ArrowSink):
+    """Arrow IPC ファイル (Feather v2)"""
+
+    def _open_writer(self, schema):
+        return self._pa.ipc.new_file(self.path, schema)
+
+SINKS = {"jsonl": JsonlSink, "csv": CsvSink, "parquet": ParquetSink, "arrow": ArrowSink}
+
+def open_sink(path):
+    """
+    拡張子に応じた出力先を開く
+
+    Args:
+        path: 出力先のパス (.jsonl / .csv / .parquet / .arrow)
+
+    Returns:
+        write_batch(records) と close() を持つ出力先 (対応していない形式の場合は ValueError)
+    """
+    suffix = os.path.splitext(str(path))[1].lower()
+    if suffix not in SINK_SUFFIXES:
+        raise ValueError(f"対応していない出力形式です: {path} (.jsonl, .csv, .parquet, .arrow のいずれか)")
+    sink_class = SINKS[SINK_SUFFIXES[suffix]]
+    directory = os.path.dirname(os.path.abspath(str(path)))
+    os.makedirs(directory, exist_ok=True)
+    return sink_class(str(path))
+
+class BatchWriter:
+    """レコードをためて batch_size 件ずつ書き込む (同期版、プロセス分散時の親プロセスで使用)"""
+
+    def __init__(self, sink, batch_size=500):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.written = 0
+        self._batch = []
+
+    def add(self, record):
+        self._batch.append(record)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._batch:
+            self.sink.write_batch(self._batch)
+            self.written += len(self._batch)
+            self._batch = []
+
+    def close(self):
+        self.flush()
+        self.sink.close()
+
+class ResultPipeline:
+    """
+    レコードを上限付きのキュー経由で出力先にまとめて書き込む
+
+    書き込みはスレッドで行うため、ディスクへの書き込み中もシナリオの実行は止まらない。
+    """
+
+    def __init__(self, sink, batch_size=500, max_queue=10000, flush_interval=1.0):
+        """
+        Args:
+            sink: 出力先 (open_sink() の戻り値)
+            batch_size: まとめて書き込むレコード数
+            max_queue: キューに保持するレコードの上限 (超えると put() が待たされる)
+            flush_interval: batch_size に満たなくても書き込むまでの時間 (秒)
+        """
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def put(self, record):
+        """レコードを追加する (キューが満杯の場合は空くまで待つ)"""
+        await self._enqueue(record)
+
+    async def close(self):
+        """残りのレコードを書き込んで出力先を閉じる"""
+        if self._task is None:
+            return
+        try:
+            if not self._task.done():
+                await self._enqueue(None)
+            await self._task
+        finally:
+            self._task = None
+            await asyncio.to_thread(self.sink.close)
+
+    async def _enqueue(self, item):
+        """
+        キューに追加する
+
+        書き込みタスクが異常終了している場合は、キューが空くのを待たずにその例外を送出する。
+        """
+        if self._task.done():
+            self._task.result()
+        if not self._queue.full():
+            self._queue.put_nowait(item)
+            return
+        put = asyncio.ensure_future(self._queue.put(item))
+        try:
+            await asyncio.wait({put, self._task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not put.done():
+                put.cancel()
+        if not put.done() or put.cancelled():
+            self._task.result()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        finished = False
+        while not finished:
+            record = await self._queue.get()
+            if record is None:
+                break
+            batch = [record]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if record is None:
+                    finished = True
+                    break
+                batch.append(record)
+            await asyncio.to_thread(self.sink.write_batch, batch)
+            self.written += len(batch)
+
+class RecordBuffer:
+    """1件のジョブのレコードを保持する (ワーカープロセスから親プロセスへまとめて送る)"""
+
+    def __init__(self):
+        self.records = []
+
+    async def put(self, record):
+        self.records.append(record)
+
+@asynccontextmanager
+async def open_pipeline(sink, batch_size=500):
+    """
+    sink への ResultPipeline を開始し、終了時に書き込み件数を表示する
+
+    sink が None の場合は None を返す (レコードを出力しない)。
+    """
+    if sink is None:
+        yield None
+        return
+    async with ResultPipeline(sink, batch_size=batch_size) as pipeline:
+        yield pipeline
+    print(f"📝 {pipeline.written}件のレコードを保存しました: {sink.path}")
@@ -0,0 +1,91 @@
+"""
+ランナーデーモン (action_runner.py --daemon) にジョブを送信する軽量クライアント
+
+Playwright を読み込まないため、起動してすぐにジョブを送信できる。
+"""
+import argparse
+import json
+import socket
+import sys
+
+# デーモンのソケットの既定のパス
+DEFAULT_SOCKET = "./tmp/action_runner.sock"
+
+def connect(socket_path=DEFAULT_SOCKET, host="127.0.0.1", port=None, timeout=None):
+    """デーモンに接続する (port 指定時は TCP、それ以外は Unix ソケット)"""
+    if port is not None:
+        return socket.create_connection((host, port), timeout=timeout)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(socket_path)
+    return sock
+
+def request(message, socket_path=DEFAULT_SOCKET, host="127.0.0.1", port=None, timeout=None):
+    """
+    メッセージを送信し、デーモンからの応答を1行ずつ返すジェネレータ
+
+    Args:
+        message: 送信するメッセージ (dict)
+        socket_path: Unix ソケットのパス
+        host: TCP のホスト
+        port: TCP のポート
+        timeout: 応答を待つ時間 (秒、None の場合は無制限)
+    """
+    with connect(socket_path, host, port, timeout) as sock:
+        sock.sendall((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as stream:
+            for line in stream:
+                response = json.loads(line)
+                yield response
+                if response.get("status") in ("done", "rejected", "error", "ok"):
+                    return
+
+def submit(action, query=None, options=None, **connection):
+    """ジョブを送信し、状態を1件ずつ返すジェネレータ"""
+    message = {"type": "submit", "action": action, "query": query, "options": options or {}}
+    yield from request(message, **connection)
+
+def main():
+    parser = argparse.ArgumentParser(description="ランナーデーモンのクライアント")
+    parser.add_argument("--action", help="実行するアクションファイル名")
+    parser.add_argument("--query", help="検索クエリ")
+    parser.add_argument("--fast", dest="fast", action="store_true", default=None, help="高速モードで実行")
+    parser.add_argument("--no-fast", dest="fast", action="store_false", help="表示用の待機を省略しない")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="デーモンの Unix ソケット")
+    parser.add_argument("--port", type=int, help="デーモンの TCP ポート (指定時は Unix ソケットの代わりに使用)")
+    parser.add_argument("--status", action="store_true", help="デーモンの状態を表示")
+    parser.add_argument("--shutdown", action="store_true", help="デーモンを停止")
+    args = parser.parse_args()
+
+    connection = {"socket_path": args.socket, "port": args.port}
+    try:
+        if args.status or args.shutdown:
+            message = {"type": "status" if args.status else "shutdown"}
+            for response in request(message, **connection):
+                print(json.dumps(response, ensure_ascii=False))
+            return
+        if not args.action:
+            parser.print_help()
+            return
+
+        options = {} if args.fast is None else {"fast": args.fast}
+        for response in submit(args.action, args.query, options, **connection):
+            status = response.get("status")
+            if status == "queued":
+                print(f"📥 ジョブ {response['job_id']} を受け付けました (待ち {response['position']}件)")
+            elif status == "running":
+                print(f"▶️  ジョブ {response['job_id']} を実行中...")
+            elif status == "done":
+                mark = "✅" if response["success"] else "❌"
+                source = ", キャッシュ" if response.get("cached") else ""
+                print(f"{mark} ジョブ {response['job_id']} が完了しました ({response['elapsed']:.2f}秒{source})")
+                sys.exit(0 if response["success"] else 1)
+            else:
+                print(f"エラー: {response.get('reason', response)}")
+                sys.exit(1)
+    except OSError as e:
+        print(f"エラー: デーモンに接続できません: {e}")
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
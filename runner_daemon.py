@@ -0,0 +1,253 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+from action_runner import registry, run_scenario
+from browser_pool import BrowserPool
+from result_pipeline import open_pipeline
+from runner_client import DEFAULT_SOCKET
+from timing import TimingRecorder
+
+class Job:
+    """デーモンが受け付けた1件のジョブ"""
+
+    def __init__(self, job_id, action, query=None, options=None):
+        self.job_id = job_id
+        self.action = action
+        self.query = query
+        self.options = options or {}
+        self.events = asyncio.Queue()
+
+class RunnerDaemon:
+    """
+    ブラウザを起動したまま待機し、ローカルソケット経由でジョブを受け付けるデーモン
+
+    プロトコルは1行1メッセージの JSON。クライアントは次のいずれかを送信する。
+        {"type": "submit", "action": "nogtips_search", "query": "...", "options": {"fast": true}}
+        {"type": "status"}
+        {"type": "shutdown"}
+
+    submit に対しては queued / running / done (または rejected) の順に状態を返す。
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, host="127.0.0.1", port=None, concurrency=4,
+                 max_queue=100, headless=True, slowmo=0, recording=None, fast=False, network=None,
+                 session=None, scheduler=None, sink=None, output_batch=500, result_cache=None, monitor=None,
+                 profiling=None, video_finalizer=None, reuse=None):
+        """
+        Args:
+            socket_path: Unix ソケットのパス (port 指定時は使用しない)
+            host: TCP で待ち受けるホスト
+            port: TCP で待ち受けるポート (指定時は Unix ソケットの代わりに使用)
+            concurrency: 同時に実行するジョブ数
+            max_queue: 待機できるジョブの最大数 (超えた場合は rejected を返す)
+            headless: ヘッドレスモードで実行するかどうか
+            slowmo: スローモーションの時間 (ミリ秒)
+            recording: 録画ポリシー (off, always, on-failure, sampled:N%)
+            fast: ジョブの既定の高速モード (ジョブの options で上書き可)
+            network: リクエストのブロック・キャッシュ・HAR 再生を行う NetworkRouter
+            session: 同意バナーなどを省略するためのストレージ状態のスナップショット (SessionSnapshot)
+            scheduler: ホストごとの同時実行数・レート制限・再試行を行う HostScheduler
+            sink: 全ジョブの run_actions が yield したレコードの出力先 (result_pipeline.open_sink() の戻り値)
+            output_batch: 出力先にまとめて書き込むレコード数
+            result_cache: 成功した結果を保存・再利用する ResultCache
+            monitor: メモリと CPU を記録し、しきい値でコンテキスト・ブラウザを作り直す ResourceMonitor
+            profiling: トレースとステップごとの内訳を記録するシナリオを選ぶ ProfilingPolicy
+            video_finalizer: 録画したコンテキストの終了と動画の書き出しをバックグラウンドで行う VideoFinalizer
+            reuse: ジョブの合間のコンテキストとページのリセット方法 (PageReusePolicy)
+        """
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+        self.concurrency = concurrency
+        self.headless = headless
+        self.slowmo = slowmo
+        self.recording = recording
+        self.fast = fast
+        self.network = network
+        self.session = session
+        self.scheduler = scheduler
+        self.sink = sink
+        self.output_batch = output_batch
+        self.result_cache = result_cache
+        self.monitor = monitor
+        self.profiling = profiling
+        self.video_finalizer = video_finalizer
+        self.reuse = reuse
+        self.stats = {"completed": 0, "failed": 0, "running": 0}
+
+        self._jobs = asyncio.Queue(maxsize=max_queue)
+        self._job_ids = itertools.count(1)
+        self._pool = None
+        self._output = None
+        self._server = None
+        self._stopped = asyncio.Event()
+
+    async def serve(self):
+        """
+        ブラウザプールを起動してジョブを待ち受ける (shutdown を受け取るまで戻らない)
+
+        Returns:
+            停止した場合は True、別のデーモンがソケットを使用中で起動しなかった場合は False
+        """
+        if self.port is None and not await self._release_stale_socket():
+            print(f"エラー: 別のランナーデーモンが {self.socket_path} で起動しています。")
+            return False
+
+        self._pool = BrowserPool(
+            headless=self.headless,
+            slowmo=self.slowmo,
+            max_size=self.concurrency,
+            min_idle=self.concurrency,
+            recording=self.recording,
+            network=self.network,
+            session=self.session,
+            monitor=self.monitor,
+            video_finalizer=self.video_finalizer,
+            reuse=self.reuse
+        )
+        async with open_pipeline(self.sink, self.output_batch) as self._output, self._pool:
+            workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+            try:
+                if self.port is not None:
+                    self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+                    address = f"{self.host}:{self.port}"
+                else:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+                    self._server = await asyncio.start_unix_server(self._handle_client, self.socket_path)
+                    address = self.socket_path
+                print(f"🚀 ランナーデーモンを起動しました: {address} (同時実行数 {self.concurrency})")
+
+                async with self._server:
+                    await self._stopped.wait()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                if self.port is None and os.path.exists(self.socket_path):
+                    os.remove(self.socket_path)
+        print("ランナーデーモンを停止しました。")
+        return True
+
+    async def _release_stale_socket(self):
+        """
+        前回のデーモンが残したソケットファイルを削除する
+
+        Returns:
+            待ち受けに使える場合は True、別のデーモンが接続を受け付けている場合は False
+        """
+        if not os.path.exists(self.socket_path):
+            return True
+        try:
+            _, writer = await asyncio.open_unix_connection(self.socket_path)
+        except OSError:
+            # 接続できなければ誰も待ち受けていない
+            os.remove(self.socket_path)
+            return True
+        writer.close()
+        return False
+
+    def stop(self):
+        self._stopped.set()
+
+    async def _worker(self):
+        while True:
+            job = await self._jobs.get()
+            self.stats["running"] += 1
+            await job.events.put({"status": "running", "job_id": job.job_id})
+
+            timings = TimingRecorder(action=job.action, query=job.query)
+            started = time.perf_counter()
+            success = await run_scenario(
+                registry.path_for(job.action),
+                query=job.query,
+                countdown=None,
+                pool=self._pool,
+                fast=job.options.get("fast", self.fast),
+                timings=timings,
+                scheduler=self.scheduler,
+                output=self._output,
+                result_cache=self.result_cache,
+                profiling=self.profiling
+            )
+            elapsed = time.perf_counter() - started
+
+            self.stats["running"] -= 1
+            self.stats["completed" if success else "failed"] += 1
+            await job.events.put({
+                "status": "done",
+                "job_id": job.job_id,
+                "success": success,
+                "cached": timings.has("phase", "result_cache_hit"),
+                "elapsed": round(elapsed, 3),
+                "timings": timings.records
+            })
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    await self._send(writer, {"status": "error", "reason": "JSON を解釈できません"})
+                    continue
+
+                message_type = message.get("type", "submit")
+                if message_type == "status":
+                    status = {"status": "ok", "queued": self._jobs.qsize(), **self.stats}
+                    if self.scheduler is not None:
+                        status["hosts"] = self.scheduler.snapshot()
+                    if self.result_cache is not None:
+                        status["result_cache"] = self.result_cache.stats
+                    if self.video_finalizer is not None:
+                        status["videos"] = self.video_finalizer.stats
+                    if self.monitor is not None:
+                        status["resources"] = {
+                            f"{name} {target}": value for (name, target), value in self.monitor.latest.items()
+                        }
+                    await self._send(writer, status)
+                elif message_type == "shutdown":
+                    await self._send(writer, {"status": "ok"})
+                    self.stop()
+                    break
+                elif message_type == "submit":
+                    await self._submit(message, writer)
+                else:
+                    await self._send(writer, {"status": "error", "reason": f"不明な種類です: {message_type}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _submit(self, message, writer):
+        """ジョブを登録し、完了するまで状態を送り続ける"""
+        action = message.get("action")
+        try:
+            action_file = registry.path_for(action)
+        except ValueError:
+            action_file = None
+        if action_file is None or registry.load(action_file) is None:
+            await self._send(writer, {"status": "rejected", "reason": f"アクションが見つからないか不正です: {action}"})
+            return
+
+        job = Job(next(self._job_ids), action, message.get("query"), message.get("options"))
+        try:
+            self._jobs.put_nowait(job)
+        except asyncio.QueueFull:
+            await self._send(writer, {"status": "rejected", "reason": "キューが満杯です"})
+            return
+        await self._send(writer, {"status": "queued", "job_id": job.job_id, "position": self._jobs.qsize()})
+
+        while True:
+            event = await job.events.get()
+            await self._send(writer, event)
+            if event["status"] == "done":
+                return
+
+    async def _send(self, writer, message):
+        writer.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+        await writer.drain()
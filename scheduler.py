@@ -0,0 +1,225 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+# 一時的な通信エラーとみなす Chromium のエラーコード
+TRANSIENT_NETWORK_ERRORS = (
+    "net::ERR_CONNECTION_RESET",
+    "net::ERR_CONNECTION_CLOSED",
+    "net::ERR_CONNECTION_REFUSED",
+    "net::ERR_CONNECTION_TIMED_OUT",
+    "net::ERR_TIMED_OUT",
+    "net::ERR_NETWORK_CHANGED",
+    "net::ERR_EMPTY_RESPONSE",
+    "net::ERR_HTTP2_PROTOCOL_ERROR",
+)
+
+# ナビゲーションのタイムアウトとみなすメッセージ (API 名と呼び出しログ)
+NAVIGATION_TIMEOUT_MARKERS = (
+    "goto:",
+    "reload:",
+    "go_back:",
+    "go_forward:",
+    "wait_for_load_state:",
+    "wait_for_url:",
+    "expect_navigation:",
+    "navigating to",
+    "waiting for navigation",
+)
+
+class TransientHTTPError(Exception):
+    """ページの読み込みで 429 / 5xx が返されたことによる失敗"""
+
+    def __init__(self, status, url, retry_after=None):
+        super().__init__(f"HTTP {status}: {url}")
+        self.status = status
+        self.url = url
+        self.retry_after = retry_after
+
+def is_transient(exc):
+    """再試行すれば成功する可能性のある失敗かどうか"""
+    if isinstance(exc, (TransientHTTPError, asyncio.TimeoutError)):
+        return True
+    message = str(exc)
+    if isinstance(exc, PlaywrightTimeoutError):
+        # クリックなどのタイムアウトはセレクタの誤りの可能性が高いため、ナビゲーションだけを再試行する
+        return any(marker in message for marker in NAVIGATION_TIMEOUT_MARKERS)
+    return any(code in message for code in TRANSIENT_NETWORK_ERRORS)
+
+class RetryPolicy:
+    """指数バックオフとジッターによる再試行の方針"""
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=30.0, jitter=0.5):
+        """
+        Args:
+            max_attempts: 最大試行回数 (1 の場合は再試行しない)
+            base_delay: 1回目の再試行までの待ち時間 (秒)
+            max_delay: 待ち時間の上限 (秒)
+            jitter: 待ち時間のばらつきの割合 (0.5 なら ±50%)
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt, exc=None):
+        """attempt 回目の失敗の後に待つ時間 (秒)"""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        # 429 の Retry-After はそれより短くしない
+        retry_after = getattr(exc, "retry_after", None)
+        if retry_after:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+class TokenBucket:
+    """トークンバケットによるレート制限"""
+
+    def __init__(self, rate, burst=None):
+        """
+        Args:
+            rate: 1秒あたりのリクエスト数
+            burst: 連続して送れる最大数 (省略時は rate と 1 の大きい方)
+        """
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class HostState:
+    """ホストごとの同時実行数・レート・レイテンシの状態"""
+
+    def __init__(self, max_concurrency, rate=None, burst=None):
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.active = 0
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.latency = None
+        self.baseline_latency = None
+        self.condition = asyncio.Condition()
+
+    @property
+    def allowed(self):
+        return max(1, int(self.limit))
+
+class HostScheduler:
+    """
+    シナリオの実行をホスト単位で制御するスケジューラ
+
+    - ホストごとの同時実行数の上限
+    - トークンバケットによるホストごとのレート制限
+    - 一時的な失敗 (タイムアウト、通信エラー、429 / 5xx) の指数バックオフによる再試行
+    - 失敗やレイテンシの悪化に応じて同時実行数を下げ、回復したら少しずつ戻す (AIMD)
+    """
+
+    def __init__(self, max_per_host=4, rate=None, burst=None, retry=None, adaptive=True, latency_factor=2.0):
+        """
+        Args:
+            max_per_host: ホストごとの同時実行数の上限
+            rate: ホストごとの1秒あたりのシナリオ開始数 (None の場合は制限しない)
+            burst: レート制限で連続して開始できる最大数
+            retry: 再試行の方針 (RetryPolicy、None の場合は再試行しない)
+            adaptive: 失敗やレイテンシに応じて同時実行数を調整するかどうか
+            latency_factor: 最良時の何倍のレイテンシで同時実行数を下げるか
+        """
+        self.max_per_host = max_per_host
+        self.rate = rate
+        self.burst = burst
+        self.retry = retry or RetryPolicy(max_attempts=1)
+        self.adaptive = adaptive
+        self.latency_factor = latency_factor
+        self._hosts = {}
+
+    def host_state(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = HostState(self.max_per_host, self.rate, self.burst)
+        return self._hosts[host]
+
+    @asynccontextmanager
+    async def slot(self, host):
+        """ホストの同時実行数とレートの制限内で実行枠を確保する"""
+        state = self.host_state(host)
+        async with state.condition:
+            await state.condition.wait_for(lambda: state.active < state.allowed)
+            state.active += 1
+        try:
+            if state.bucket:
+                await state.bucket.acquire()
+            yield state
+        finally:
+            async with state.condition:
+                state.active -= 1
+                state.condition.notify_all()
+
+    async def run(self, host, attempt):
+        """
+        attempt() を制限内で実行し、一時的な失敗は再試行する
+
+        Args:
+            host: 対象のホスト名
+            attempt: 1回分の実行を行うコルーチン関数 (失敗時は例外を送出する)
+
+        Returns:
+            attempt() の戻り値 (再試行しても失敗した場合は最後の例外を送出する)
+        """
+        for number in range(1, self.retry.max_attempts + 1):
+            async with self.slot(host) as state:
+                started = time.perf_counter()
+                try:
+                    result = await attempt()
+                except Exception as e:
+                    transient = is_transient(e)
+                    await self._record(state, time.perf_counter() - started, failed=transient)
+                    if not transient or number >= self.retry.max_attempts:
+                        raise
+                    error = e
+                else:
+                    await self._record(state, time.perf_counter() - started, failed=False)
+                    return result
+
+            delay = self.retry.delay(number, error)
+            print(f"🔁 {host}: 一時的な失敗のため {delay:.1f}秒後に再試行します "
+                  f"({number + 1}/{self.retry.max_attempts}): {error}")
+            await asyncio.sleep(delay)
+
+    async def _record(self, state, latency, failed):
+        """結果に応じて同時実行数を調整する"""
+        if not self.adaptive:
+            return
+        async with state.condition:
+            if failed:
+                # 乗算的に減らす
+                state.limit = max(1.0, state.limit / 2)
+            else:
+                state.latency = latency if state.latency is None else state.latency * 0.8 + latency * 0.2
+                if state.baseline_latency is None or state.latency < state.baseline_latency:
+                    state.baseline_latency = state.latency
+                if state.latency > state.baseline_latency * self.latency_factor:
+                    state.limit = max(1.0, state.limit * 0.8)
+                else:
+                    # 加算的に戻す (おおよそ同時実行数分の成功で +1)
+                    state.limit = min(float(state.max_concurrency), state.limit + 1 / state.limit)
+            state.condition.notify_all()
+
+    def snapshot(self):
+        """ホストごとの現在の状態 (表示用)"""
+        return {
+            host: {
+                "limit": state.allowed,
+                "active": state.active,
+                "latency": round(state.latency, 3) if state.latency is not None else None
+            }
+            for host, state in self._hosts.items()
+        }
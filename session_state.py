@@ -0,0 +1,100 @@
+import contextvars
+import json
+import os
+import re
+import time
+
+# 実行中のシナリオのセッション状態 (accept_consent() から参照する)
+current_session = contextvars.ContextVar("current_session", default=None)
+
+class SessionSnapshot:
+    """
+    名前付きのストレージ状態 (クッキーと localStorage) のスナップショット
+
+    同意バナーを閉じた後の状態を保存しておき、以降のコンテキストをその状態から作成することで、
+    毎回のバナー操作を省略する。有効期限を過ぎたスナップショットは使わずに取り直す。
+    """
+
+    def __init__(self, name, state_dir="./tmp/session_state", max_age=86400):
+        """
+        Args:
+            name: スナップショットの名前 (サイトやアクションごとに付ける)
+            state_dir: 保存先のディレクトリ
+            max_age: 有効期限 (秒)
+        """
+        self.name = name
+        self.state_dir = state_dir
+        self.max_age = max_age
+
+    @property
+    def file_path(self):
+        safe_name = re.sub(r"[^\w.-]+", "_", self.name)
+        return os.path.join(self.state_dir, f"{safe_name}.json")
+
+    def path(self):
+        """有効なスナップショットのパス (存在しないか期限切れの場合は None)"""
+        try:
+            age = time.time() - os.path.getmtime(self.file_path)
+        except OSError:
+            return None
+        if age > self.max_age:
+            return None
+        return self.file_path
+
+    def state(self):
+        """スナップショットのストレージ状態 (有効なスナップショットがない場合は空の辞書)"""
+        path = self.path()
+        if path is None:
+            return {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def cookies(self):
+        """スナップショットのクッキー (有効なスナップショットがない場合は空のリスト)"""
+        return self.state().get("cookies", [])
+
+    def origins(self):
+        """スナップショットのオリジンごとの localStorage ({"origin": ..., "localStorage": [...]} のリスト)"""
+        return self.state().get("origins", [])
+
+    async def save(self, context):
+        """コンテキストの現在のストレージ状態を保存する"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        # 並列に保存しても壊れないよう、一時ファイルから置き換える
+        temp_path = f"{self.file_path}.{os.getpid()}.{id(context)}.tmp"
+        await context.storage_state(path=temp_path)
+        os.replace(temp_path, self.file_path)
+
+    def invalidate(self):
+        """スナップショットを削除する (次の実行で取り直される)"""
+        try:
+            os.remove(self.file_path)
+        except FileNotFoundError:
+            pass
+
+class SessionTracker:
+    """1回のシナリオ実行中のセッション状態"""
+
+    def __init__(self, snapshot, applied):
+        """
+        Args:
+            snapshot: SessionSnapshot (None の場合は保存しない)
+            applied: コンテキストにスナップショット (または前のシナリオのクッキー) が適用済みかどうか
+        """
+        self.snapshot = snapshot
+        self.applied = applied
+        self.consent_clicked = False
+
+    @property
+    def needs_save(self):
+        """
+        スナップショットを保存し直す必要があるか
+
+        スナップショットがない (初回) か、適用済みなのに同意バナーが再表示された (状態が古い) 場合に保存する。
+        """
+        if self.snapshot is None:
+            return False
+        return not self.applied or self.consent_clicked
@@ -0,0 +1,194 @@
+# test_action_plan.py
+# 宣言的なアクションのコンパイル (検証・最適化・Python への変換) のテスト。ブラウザは起動しない
+import ast
+from pathlib import Path
+import pytest
+from action_plan import PlanError, compile_plan, load_plan, read_definition
+
+SEARCHBOX = {"role": "searchbox", "name": "検索:"}
+
+def kinds(plan):
+    return [step.kind for step in plan.steps]
+
+def test_click_before_fill_is_dropped():
+    plan = compile_plan([
+        {"click": SEARCHBOX},
+        {"fill": SEARCHBOX, "value": "{query}"},
+    ])
+    assert kinds(plan) == ["fill"]
+    assert plan.steps[0].sources == [2]
+    assert len(plan.optimizations) == 1
+
+def test_click_with_options_before_fill_is_kept():
+    plan = compile_plan([
+        {"click": SEARCHBOX, "timeout": 1000},
+        {"fill": SEARCHBOX, "value": "{query}"},
+    ])
+    assert kinds(plan) == ["click", "fill"]
+
+def test_click_on_other_element_is_kept():
+    plan = compile_plan([
+        {"click": {"role": "link", "name": "nogtips"}},
+        {"fill": SEARCHBOX, "value": "{query}"},
+    ])
+    assert kinds(plan) == ["click", "fill"]
+
+def test_visible_wait_for_before_action_is_dropped():
+    plan = compile_plan([
+        {"wait_for": SEARCHBOX},
+        {"click": SEARCHBOX},
+    ])
+    assert kinds(plan) == ["click"]
+
+def test_wait_for_with_timeout_is_kept():
+    plan = compile_plan([
+        {"wait_for": SEARCHBOX, "timeout": 60000},
+        {"click": SEARCHBOX},
+    ])
+    assert kinds(plan) == ["wait_for", "click"]
+    assert plan.steps[0].options["timeout"] == 60000
+
+def test_wait_for_other_state_is_kept():
+    plan = compile_plan([
+        {"wait_for": SEARCHBOX, "state": "attached"},
+        {"click": SEARCHBOX},
+    ])
+    assert kinds(plan) == ["wait_for", "click"]
+
+def test_overwritten_fill_is_dropped():
+    plan = compile_plan([
+        {"fill": SEARCHBOX, "value": "a"},
+        {"fill": SEARCHBOX, "value": "b"},
+    ])
+    assert kinds(plan) == ["fill"]
+    assert plan.steps[0].options["value"] == "b"
+
+def test_consecutive_waits_are_merged():
+    plan = compile_plan([{"wait": 100}, {"wait": 200}, {"wait": 300}])
+    assert kinds(plan) == ["wait"]
+    assert plan.steps[0].options["milliseconds"] == 600
+    assert plan.steps[0].sources == [1, 2, 3]
+
+def test_optimizations_cascade():
+    # click の省略で wait_for と fill が隣り合っても、wait_for は fill の前として省略される
+    plan = compile_plan([
+        {"wait_for": SEARCHBOX},
+        {"click": SEARCHBOX},
+        {"fill": SEARCHBOX, "value": "{query}"},
+    ])
+    assert kinds(plan) == ["fill"]
+
+def test_locators_are_shared_and_renumbered():
+    link = {"role": "link", "name": "nogtips"}
+    plan = compile_plan([
+        {"click": SEARCHBOX},
+        {"click": link},
+        {"fill": SEARCHBOX, "value": "x"},
+        {"click": "#submit"},
+        {"click": link},
+    ])
+    assert kinds(plan) == ["click", "click", "fill", "click", "click"]
+    assert plan.locators == [[SEARCHBOX], [link], [{"selector": "#submit"}]]
+    assert [step.locator for step in plan.steps] == [0, 1, 0, 2, 1]
+
+def test_unused_locators_are_removed():
+    link = {"role": "link", "name": "nogtips"}
+    plan = compile_plan([
+        {"click": link},
+        {"fill": link, "value": "x"},
+        {"click": SEARCHBOX},
+    ])
+    assert plan.locators == [[link], [SEARCHBOX]]
+    assert [step.locator for step in plan.steps] == [0, 1]
+
+def test_hosts_skip_urls_with_query():
+    plan = compile_plan([
+        {"goto": "https://example.com/search?q={query}"},
+        {"goto": "https://nogtips.wordpress.com"},
+        {"goto": "https://nogtips.wordpress.com/about"},
+    ])
+    assert plan.hosts == ["nogtips.wordpress.com"]
+
+def test_definition_dict_sets_name():
+    plan = compile_plan({"name": "custom", "steps": [{"wait": 1}]}, name="file")
+    assert plan.name == "custom"
+
+@pytest.mark.parametrize("definition, message", [
+    ([], "steps"),
+    ({"steps": None}, "steps"),
+    (["goto"], "辞書"),
+    ([{"click": "#a", "fill": "#a"}], "いずれか1つ"),
+    ([{"unknown": "#a"}], "いずれか1つ"),
+    ([{"click": "#a", "value": "x"}], "指定できないオプション"),
+    ([{"goto": 1}], "URL"),
+    ([{"wait": True}], "ミリ秒"),
+    ([{"wait": "5000"}], "ミリ秒"),
+    ([{"extract": {"selector": "a"}}], "セレクタ"),
+    ([{"fill": "#a"}], "value"),
+    ([{"select": "#a", "value": 1}], "value"),
+    ([{"press": "#a"}], "key"),
+    ([{"click": 1}], "ロケータ"),
+    ([{"click": []}], "ロケータ"),
+    ([{"click": {"name": "x"}}], "いずれか1つ"),
+    ([{"click": {"role": "link", "text": "x"}}], "いずれか1つ"),
+    ([{"click": {"role": "link", "level": 1}}], "不明なロケータのオプション"),
+])
+def test_invalid_definitions(definition, message):
+    with pytest.raises(PlanError, match=message):
+        compile_plan(definition)
+
+def test_invalid_step_reports_its_number():
+    with pytest.raises(PlanError, match="ステップ 2"):
+        compile_plan([{"wait": 1}, {"press": "#a"}])
+
+def test_read_definition_rejects_broken_json(tmp_path):
+    path = tmp_path / "broken.json"
+    path.write_text("{", encoding="utf-8")
+    with pytest.raises(PlanError, match="JSON"):
+        read_definition(path)
+
+def test_read_definition_rejects_unknown_suffix(tmp_path):
+    with pytest.raises(PlanError, match="対応していない形式"):
+        read_definition(tmp_path / "action.txt", source="steps: []")
+
+def test_to_python_is_valid_code():
+    plan = compile_plan([
+        {"goto": "https://example.com/?q={query}", "wait_until": "domcontentloaded", "timeout": 30000},
+        {"consent": {"role": "button", "name": "閉じて承認"}},
+        {"fill": SEARCHBOX, "value": "{query}"},
+        {"press": SEARCHBOX, "key": "Enter", "navigation": "domcontentloaded"},
+        {"click": [{"role": "heading", "name": "見出し"}, {"role": "link", "nth": 0}]},
+        {"select": "#sort", "value": "date"},
+        {"extract": "article h2 a"},
+        {"wait": 5000},
+    ], name="example")
+    source = plan.to_python()
+    tree = ast.parse(source)
+
+    functions = [node for node in tree.body if isinstance(node, ast.AsyncFunctionDef)]
+    assert [function.name for function in functions] == ["run_actions"]
+    assert "from browser_base import accept_consent, extract_links, presentation_wait" in source
+    assert "await page.goto('https://example.com/?q={query}'.replace('{query}', query or ''), " \
+           "wait_until='domcontentloaded', timeout=30000)" in source
+    assert "await locator_2.fill(query or \"\")" in source
+    assert "async with page.expect_navigation(wait_until='domcontentloaded'):" in source
+    assert "locator_3 = page.get_by_role('heading', name='見出し').get_by_role('link').nth(0)" in source
+    assert "await locator_4.select_option('date')" in source
+    assert "    for result in await extract_links(page, 'article h2 a'):" in source
+    assert "await presentation_wait(page, 5000)" in source
+
+def test_to_python_without_extract_omits_import():
+    source = compile_plan([{"click": "#a", "timeout": 1000}]).to_python()
+    assert "from browser_base import accept_consent, presentation_wait" in source
+    assert "await locator_1.click(timeout=1000)" in source
+
+def test_bundled_plan_compiles():
+    path = Path(__file__).parent / "actions" / "nogtips_search_plan.yaml"
+    pytest.importorskip("yaml")
+    plan = load_plan(path)
+    assert plan.name == "nogtips_search_plan"
+    assert plan.hosts == ["nogtips.wordpress.com"]
+    assert "click" in kinds(plan) and "fill" in kinds(plan)
+    # codegen が記録した fill の直前の click は省略される
+    assert len(plan.steps) == plan.source_count - 1
+    ast.parse(plan.to_python())
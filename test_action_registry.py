@@ -0,0 +1,55 @@
+# test_action_registry.py
+# アクションファイルの AST による検証 (run_actions の定義と引数) のテスト。モジュールのコードは実行しない
+import pytest
+from action_registry import inspect_action
+
+@pytest.mark.parametrize("signature, params", [
+    ("page, query", ["page", "query"]),
+    ("page, query=None", ["page", "query=None"]),
+    ("page, query=None, limit=10", ["page", "query=None", "limit=10"]),
+    ("page, *args", ["page", "*args"]),
+    ("*args", ["*args"]),
+    ("page, query, *, limit=10", ["page", "query", "limit=10"]),
+    ("page, query, **options", ["page", "query", "**options"]),
+])
+def test_accepted_signatures(signature, params):
+    info = inspect_action("action.py", source=f"async def run_actions({signature}):\n    pass\n")
+    assert info.valid, info.error
+    assert info.params == params
+
+@pytest.mark.parametrize("signature, message", [
+    ("", "page 引数"),
+    ("page", "query 引数"),
+    ("page, query, limit", "必須引数は page と query まで"),
+    ("page, query, *, limit", "キーワード専用の必須引数"),
+])
+def test_rejected_signatures(signature, message):
+    info = inspect_action("action.py", source=f"async def run_actions({signature}):\n    pass\n")
+    assert not info.valid
+    assert message in info.error
+
+def test_sync_run_actions_is_rejected():
+    info = inspect_action("action.py", source="def run_actions(page, query=None):\n    pass\n")
+    assert not info.valid
+    assert "async def" in info.error
+
+def test_missing_run_actions_is_rejected():
+    info = inspect_action("action.py", source="async def main(page):\n    pass\n")
+    assert not info.valid
+    assert "定義されていません" in info.error
+
+def test_syntax_error_reports_line():
+    info = inspect_action("action.py", source="async def run_actions(page, query=None):\n    return (\n")
+    assert not info.valid
+    assert "構文エラー" in info.error
+
+def test_module_code_is_not_executed():
+    source = "raise SystemExit(1)\n\nasync def run_actions(page, query=None):\n    pass\n"
+    assert inspect_action("action.py", source=source).valid
+
+def test_hosts_are_collected():
+    source = (
+        "async def run_actions(page, query=None):\n"
+        "    await page.goto('https://nogtips.wordpress.com/')\n"
+    )
+    assert inspect_action("action.py", source=source).hosts == ["nogtips.wordpress.com"]
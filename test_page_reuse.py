@@ -0,0 +1,77 @@
+# test_page_reuse.py
+# ページ再利用のリセット方法 (分離レベルと消去するストレージ) の解析とリセット手順のテスト。ブラウザは起動しない
+import pytest
+from page_reuse import PageReusePolicy
+
+class RecordingPage:
+    """呼び出されたページ操作を記録するページ"""
+
+    def __init__(self):
+        self.calls = []
+
+    def is_closed(self):
+        return False
+
+    async def evaluate(self, script, arg=None):
+        self.calls.append(("evaluate", arg))
+
+    async def goto(self, url, **options):
+        self.calls.append(("goto", url))
+
+class RecordingAutomation:
+    """PageReusePolicy.reset() が呼び出す BrowserAutomationBase のメソッドを記録する"""
+
+    def __init__(self):
+        self.page = RecordingPage()
+        self.calls = self.page.calls
+        self.cookies_retained = False
+
+    async def clear_site_data(self):
+        self.calls.append(("clear_site_data",))
+
+    async def restore_session(self):
+        self.calls.append(("restore_session",))
+
+def test_defaults():
+    policy = PageReusePolicy()
+    assert policy.isolation == "storage"
+    assert policy.clear_storage == []
+    assert policy.recycle_every == 50
+
+def test_context_recycles_every_scenario():
+    assert PageReusePolicy("context", recycle_every=100).recycle_every == 1
+
+@pytest.mark.parametrize("value, kinds", [
+    ("local,session", ["local", "session"]),
+    (" session , ", ["session"]),
+    ("", []),
+    (None, []),
+])
+def test_parse_storage(value, kinds):
+    assert PageReusePolicy.parse_storage(value) == kinds
+
+@pytest.mark.parametrize("options, message", [
+    ({"isolation": "browser"}, "不正な分離レベル"),
+    ({"clear_storage": ["local", "indexeddb"]}, "不正なストレージの種類です: indexeddb"),
+    ({"recycle_every": 0}, "1 以上"),
+])
+def test_invalid_options(options, message):
+    with pytest.raises(ValueError, match=message):
+        PageReusePolicy(**options)
+
+async def test_storage_reset_clears_site_data_and_restores_session():
+    automation = RecordingAutomation()
+    await PageReusePolicy("storage").reset(automation)
+    names = [call[0] for call in automation.calls]
+    assert names.index("clear_site_data") < names.index("restore_session")
+    assert automation.calls[-1] == ("goto", "about:blank")
+    assert not automation.cookies_retained
+
+async def test_page_reset_keeps_storage():
+    automation = RecordingAutomation()
+    await PageReusePolicy("page", clear_storage=["session"]).reset(automation)
+    names = [call[0] for call in automation.calls]
+    assert "clear_site_data" not in names and "restore_session" not in names
+    assert ("evaluate", ["session"]) in automation.calls
+    assert "goto" not in names
+    assert automation.cookies_retained
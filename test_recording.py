@@ -0,0 +1,57 @@
+# test_recording.py
+# 録画ポリシーの解析とシナリオごとの抽選のテスト。ブラウザは起動しない
+import random
+import pytest
+from recording import RECORDING_MODE_ENV, RecordingPolicy
+
+@pytest.mark.parametrize("value, mode, rate", [
+    ("off", "off", 1.0),
+    ("always", "always", 1.0),
+    (" On-Failure ", "on-failure", 1.0),
+    (None, "always", 1.0),
+    ("", "always", 1.0),
+    ("sampled:10%", "sampled", 0.1),
+    ("sampled:2.5", "sampled", 0.025),
+    ("sampled:0%", "sampled", 0.0),
+    ("sampled:100%", "sampled", 1.0),
+])
+def test_parse(value, mode, rate):
+    policy = RecordingPolicy.parse(value)
+    assert policy.mode == mode
+    assert policy.sample_rate == pytest.approx(rate)
+
+@pytest.mark.parametrize("value, message", [
+    ("sometimes", "不正な録画モード"),
+    ("sampled:abc", "不正なサンプリング率"),
+    ("sampled:150%", "0〜100%"),
+    ("sampled:-1%", "0〜100%"),
+])
+def test_parse_rejects_invalid_values(value, message):
+    with pytest.raises(ValueError, match=message):
+        RecordingPolicy.parse(value)
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv(RECORDING_MODE_ENV, "sampled:5%")
+    assert str(RecordingPolicy.from_env()) == "sampled:5%"
+    monkeypatch.delenv(RECORDING_MODE_ENV)
+    assert RecordingPolicy.from_env().mode == "always"
+
+def test_str_round_trips():
+    for value in ("off", "always", "on-failure", "sampled:12.5%"):
+        assert str(RecordingPolicy.parse(value)) == value
+
+def test_only_sampled_varies_per_scenario():
+    assert RecordingPolicy.parse("sampled:50%").varies
+    assert not any(RecordingPolicy.parse(value).varies for value in ("off", "always", "on-failure"))
+
+def test_should_record_video():
+    assert RecordingPolicy.parse("always").should_record_video()
+    assert not RecordingPolicy.parse("off").should_record_video()
+    assert not RecordingPolicy.parse("on-failure").should_record_video()
+    assert RecordingPolicy.parse("on-failure").capture_on_failure
+
+def test_sampled_draws_on_every_call():
+    random.seed(0)
+    policy = RecordingPolicy.parse("sampled:25%")
+    draws = [policy.should_record_video() for _ in range(2000)]
+    assert 0.2 < sum(draws) / len(draws) < 0.3
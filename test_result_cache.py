@@ -0,0 +1,112 @@
+# test_result_cache.py
+# 結果キャッシュ (TTL による期限切れ・LRU による削除・合計サイズの管理) のテスト。ブラウザは起動しない
+import pytest
+import result_cache
+from result_cache import ResultCache, normalize_query
+
+class Clock:
+    """time.time() の代わりに進める時計"""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache.time, "time", clock)
+    return clock
+
+@pytest.fixture
+def make_cache(tmp_path):
+    caches = []
+
+    def make(**options):
+        cache = ResultCache(str(tmp_path / "cache.sqlite3"), **options)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+def stored_total(cache):
+    connection = cache._connect()
+    return (connection.execute("SELECT total FROM usage").fetchone()[0],
+            connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0])
+
+def test_normalize_query():
+    assert normalize_query("  Ｐｌａｙｗｒｉｇｈｔ　 テスト ") == "Playwright テスト"
+    assert normalize_query(None) == ""
+
+def test_hit_with_normalized_query(clock, make_cache):
+    cache = make_cache()
+    cache.put("search", "Playwright  テスト", "digest", [{"title": "a"}])
+    clock.now += 10
+    records, age = cache.get("search", " Playwright テスト", "digest")
+    assert records == [{"title": "a"}]
+    assert age == 10
+    assert cache.stats == {"hits": 1, "misses": 0, "stored": 1}
+
+def test_other_digest_misses(clock, make_cache):
+    cache = make_cache()
+    cache.put("search", "q", "old", [])
+    assert cache.get("search", "q", "new") is None
+
+def test_expired_entry_is_not_used(clock, make_cache):
+    cache = make_cache(ttl=60)
+    cache.put("search", "q", "digest", [])
+    clock.now += 61
+    assert cache.get("search", "q", "digest") is None
+
+def test_max_age_shortens_ttl(clock, make_cache):
+    make_cache(ttl=3600).put("search", "q", "digest", [])
+    clock.now += 120
+    assert make_cache(ttl=3600).get("search", "q", "digest") is not None
+    assert make_cache(ttl=3600, max_age=60).get("search", "q", "digest") is None
+
+def test_refresh_skips_lookup(clock, make_cache):
+    make_cache().put("search", "q", "digest", [])
+    assert make_cache(refresh=True).get("search", "q", "digest") is None
+
+def test_expired_entries_are_deleted_on_put(clock, make_cache):
+    cache = make_cache(ttl=60)
+    cache.put("search", "old", "digest", [])
+    clock.now += 61
+    cache.put("search", "new", "digest", [])
+    rows = cache._connect().execute("SELECT query FROM results").fetchall()
+    assert rows == [("new",)]
+
+def test_least_recently_used_entries_are_evicted(clock, make_cache):
+    record = [{"text": "x" * 90}]
+    cache = make_cache(max_bytes=350)
+    for query in ("a", "b", "c"):
+        cache.put("search", query, "digest", record)
+        clock.now += 1
+    # a を使うと、最後に使われた時刻が最も古いのは b になる
+    assert cache.get("search", "a", "digest") is not None
+    clock.now += 1
+    cache.put("search", "d", "digest", record)
+    assert cache.get("search", "b", "digest") is None
+    for query in ("a", "c", "d"):
+        assert cache.get("search", query, "digest") is not None
+
+def test_total_size_tracks_replace_and_eviction(clock, make_cache):
+    cache = make_cache(max_bytes=500)
+    cache.put("search", "a", "digest", [{"text": "x" * 100}])
+    cache.put("search", "a", "digest", [{"text": "x" * 10}])
+    assert stored_total(cache)[0] == stored_total(cache)[1]
+    for index in range(20):
+        clock.now += 1
+        cache.put("search", f"q{index}", "digest", [{"text": "y" * 50}])
+    total, actual = stored_total(cache)
+    assert total == actual
+    assert total <= 500
+
+def test_total_is_shared_between_instances(clock, make_cache):
+    first, second = make_cache(), make_cache()
+    first.put("search", "a", "digest", [{"text": "x"}])
+    second.put("search", "b", "digest", [{"text": "y"}])
+    assert stored_total(first)[0] == stored_total(second)[1]
@@ -0,0 +1,104 @@
+# test_scheduler.py
+# ホストごとの同時実行数の制限・再試行のバックオフ・同時実行数の調整のテスト。ブラウザは起動しない
+import asyncio
+import pytest
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from scheduler import HostScheduler, RetryPolicy, TransientHTTPError, is_transient
+
+class RecordingRetry(RetryPolicy):
+    """待ち時間を記録し、実際にはほとんど待たない再試行の方針"""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.delays = []
+
+    def delay(self, attempt, exc=None):
+        self.delays.append(super().delay(attempt, exc))
+        return 0.001
+
+async def run_concurrently(scheduler, host, count, active, peaks):
+    async def attempt():
+        active[host] = active.get(host, 0) + 1
+        peaks[host] = max(peaks.get(host, 0), active[host])
+        await asyncio.sleep(0.01)
+        active[host] -= 1
+
+    await asyncio.gather(*(scheduler.run(host, attempt) for _ in range(count)))
+
+async def test_concurrency_is_limited_per_host():
+    scheduler = HostScheduler(max_per_host=2, adaptive=False)
+    active, peaks = {}, {}
+    await asyncio.gather(
+        run_concurrently(scheduler, "a.example", 6, active, peaks),
+        run_concurrently(scheduler, "b.example", 6, active, peaks),
+    )
+    assert peaks == {"a.example": 2, "b.example": 2}
+
+async def test_transient_failures_are_retried_with_backoff():
+    retry = RecordingRetry(max_attempts=3, base_delay=1.0, jitter=0)
+    scheduler = HostScheduler(retry=retry, adaptive=False)
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        if len(calls) < 3:
+            raise TransientHTTPError(503, "https://a.example/")
+        return "ok"
+
+    assert await scheduler.run("a.example", attempt) == "ok"
+    assert len(calls) == 3
+    assert retry.delays == [1.0, 2.0]
+
+async def test_gives_up_after_max_attempts():
+    scheduler = HostScheduler(retry=RecordingRetry(max_attempts=2, jitter=0), adaptive=False)
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        raise TransientHTTPError(503, "https://a.example/")
+
+    with pytest.raises(TransientHTTPError):
+        await scheduler.run("a.example", attempt)
+    assert len(calls) == 2
+
+async def test_permanent_failures_are_not_retried():
+    retry = RecordingRetry(max_attempts=3)
+    scheduler = HostScheduler(retry=retry, adaptive=False)
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        raise ValueError("broken action")
+
+    with pytest.raises(ValueError):
+        await scheduler.run("a.example", attempt)
+    assert len(calls) == 1
+    assert retry.delays == []
+
+async def test_failures_halve_the_host_limit():
+    scheduler = HostScheduler(max_per_host=8, retry=RecordingRetry(max_attempts=3))
+
+    async def attempt():
+        raise TransientHTTPError(503, "https://a.example/")
+
+    with pytest.raises(TransientHTTPError):
+        await scheduler.run("a.example", attempt)
+    assert scheduler.host_state("a.example").allowed == 1
+    assert scheduler.host_state("b.example").allowed == 8
+
+def test_delay_is_capped_and_respects_retry_after():
+    retry = RetryPolicy(base_delay=1.0, max_delay=10.0, jitter=0)
+    assert [retry.delay(attempt) for attempt in (1, 2, 3, 4, 5)] == [1.0, 2.0, 4.0, 8.0, 10.0]
+    assert retry.delay(1, TransientHTTPError(429, "https://a.example/", retry_after=5)) == 5.0
+    assert retry.delay(1, TransientHTTPError(429, "https://a.example/", retry_after=60)) == 10.0
+
+@pytest.mark.parametrize("exc, expected", [
+    (TransientHTTPError(429, "https://a.example/"), True),
+    (asyncio.TimeoutError(), True),
+    (Exception("net::ERR_CONNECTION_RESET at https://a.example/"), True),
+    (PlaywrightTimeoutError("Page.goto: Timeout 30000ms exceeded."), True),
+    (PlaywrightTimeoutError("Locator.click: Timeout 30000ms exceeded."), False),
+    (ValueError("broken action"), False),
+])
+def test_is_transient(exc, expected):
+    assert is_transient(exc) is expected
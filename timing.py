@@ -0,0 +1,284 @@
+import contextvars
+import csv
+import functools
+import inspect
+import json
+import time
+from contextlib import asynccontextmanager, contextmanager
+from playwright.async_api import FrameLocator, Locator, Page
+from profiling import PROFILE_FIELDS
+
+# レポートの列 (プロファイリングしたステップには内訳の列が付く)
+REPORT_FIELDS = ["action", "query", "kind", "name", "target", "start_ms", "duration_ms", "ok", "value"] + PROFILE_FIELDS
+
+class TimingRecorder:
+    """
+    シナリオの各フェーズ・ステップの所要時間を記録する
+
+    kind="phase" はドライバ起動やコンテキスト作成などの準備・後片付け、
+    kind="step" はアクション内の goto / click / fill / press などのページ操作を表す。
+    profiler に ScenarioProfiler を設定すると、ステップの前後で内訳を計測する。
+    """
+
+    def __init__(self, action=None, query=None):
+        self.action = action
+        self.query = query
+        self.records = []
+        self.profiler = None
+        self._origin = time.perf_counter()
+
+    def add(self, kind, name, started, ok=True, target=None):
+        """
+        記録を追加する
+
+        Args:
+            kind: "phase" または "step"
+            name: フェーズ名またはメソッド名
+            started: 開始時刻 (time.perf_counter() の値)
+            ok: 成功したかどうか
+            target: 操作対象 (ロケータの説明や URL)
+
+        Returns:
+            追加した記録
+        """
+        record = {
+            "action": self.action,
+            "query": self.query,
+            "kind": kind,
+            "name": name,
+            "target": target,
+            "start_ms": round((started - self._origin) * 1000, 3),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "ok": ok
+        }
+        self.records.append(record)
+        return record
+
+    @contextmanager
+    def phase(self, name):
+        """with ブロックの所要時間をフェーズとして記録する"""
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.add("phase", name, started, ok=ok)
+
+    def has(self, kind, name):
+        """指定したフェーズ・ステップの記録があるかどうか"""
+        return any(record["kind"] == kind and record["name"] == name for record in self.records)
+
+    @asynccontextmanager
+    async def step(self, name, target=None):
+        """async with ブロックの所要時間をステップとして記録する"""
+        profiler = self.profiler
+        if profiler is not None:
+            await profiler.step_started()
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            record = self.add("step", name, started, ok=ok, target=target)
+            if profiler is not None:
+                await profiler.step_finished(record)
+
+@contextmanager
+def timed_phase(recorder, name):
+    """recorder が None の場合は何も記録しない phase()"""
+    if recorder is None:
+        yield
+        return
+    with recorder.phase(name):
+        yield
+
+# ページ操作の記録先 (instrument() のブロック内で実行中のシナリオの TimingRecorder)
+current_recorder = contextvars.ContextVar("current_recorder", default=None)
+
+# 所要時間を記録するクラス (公開されている非同期メソッドをすべて記録する)
+_INSTRUMENTED_CLASSES = (Page, Locator, FrameLocator)
+# ロケータを作成するメソッドとプロパティ (作成したロケータに操作対象の説明を付ける)
+_LOCATOR_FACTORIES = (
+    "locator", "get_by_role", "get_by_text", "get_by_label", "get_by_placeholder", "get_by_alt_text",
+    "get_by_title", "get_by_test_id", "frame_locator", "nth", "filter",
+)
+_LOCATOR_PROPERTIES = ("first", "last")
+_installed = False
+
+def _describe_call(name, args, kwargs):
+    """get_by_role('button', name='OK') のような呼び出しの説明を作る"""
+    parts = [repr(arg) for arg in args]
+    parts += [f"{key}={value!r}" for key, value in kwargs.items()]
+    return f"{name}({', '.join(parts)})"
+
+def _describe(result, parent, text):
+    """作成したロケータに、親のロケータの説明を引き継いだ操作対象の説明を付ける"""
+    parent_description = None if isinstance(parent, Page) else getattr(parent, "_timing_description", None)
+    try:
+        result._timing_description = f"{parent_description}.{text}" if parent_description else text
+    except AttributeError:
+        pass
+    return result
+
+def _target_of(obj, args):
+    """記録する操作対象 (ロケータの説明、ページ操作の場合は第1引数の URL やセレクタ)"""
+    if isinstance(obj, Page):
+        return args[0] if args and isinstance(args[0], str) else None
+    description = getattr(obj, "_timing_description", None)
+    if description is None:
+        # 計測の開始前に作成したロケータはセレクタを対象とする
+        description = getattr(getattr(obj, "_impl_obj", None), "_selector", None)
+    return description
+
+def _timed_method(name, method):
+    @functools.wraps(method)
+    async def timed(self, *args, **kwargs):
+        recorder = current_recorder.get()
+        if recorder is None:
+            return await method(self, *args, **kwargs)
+        async with recorder.step(name, _target_of(self, args)):
+            # 操作の内部で呼ばれるページ操作は二重に記録しない
+            with untimed():
+                return await method(self, *args, **kwargs)
+    return timed
+
+def _described_method(name, method):
+    @functools.wraps(method)
+    def described(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        if current_recorder.get() is None:
+            return result
+        return _describe(result, self, _describe_call(name, args, kwargs))
+    return described
+
+def _described_property(name, getter):
+    @functools.wraps(getter)
+    def described(self):
+        result = getter(self)
+        if current_recorder.get() is None:
+            return result
+        return _describe(result, self, name)
+    return property(described)
+
+def _install():
+    """
+    Page / Locator / FrameLocator のメソッドを計測用に置き換える (1回だけ)
+
+    オブジェクトを包まずにクラスのメソッドを置き換えるため、expect(page) や expect(locator) など
+    Playwright の型を要求する API にもそのまま渡せる。記録先は current_recorder で
+    シナリオ (タスク) ごとに分かれ、設定されていなければ元のメソッドをそのまま呼び出す。
+    """
+    global _installed
+    if _installed:
+        return
+    for cls in _INSTRUMENTED_CLASSES:
+        for name, attr in list(vars(cls).items()):
+            if name.startswith("_"):
+                continue
+            if inspect.iscoroutinefunction(attr):
+                setattr(cls, name, _timed_method(name, attr))
+            elif name in _LOCATOR_FACTORIES and callable(attr):
+                setattr(cls, name, _described_method(name, attr))
+            elif name in _LOCATOR_PROPERTIES and isinstance(attr, property):
+                setattr(cls, name, _described_property(name, attr.fget))
+    _installed = True
+
+@contextmanager
+def instrument(recorder):
+    """
+    with ブロック内のページ操作 (Page / Locator の非同期メソッド) の所要時間を recorder に記録する
+
+    page.get_by_role(...).click() のような連鎖した呼び出しは、ロケータの作成方法を操作対象として記録する。
+    recorder が None の場合は何も記録しない。
+    """
+    if recorder is None:
+        yield
+        return
+    _install()
+    token = current_recorder.set(recorder)
+    try:
+        yield
+    finally:
+        current_recorder.reset(token)
+
+@contextmanager
+def untimed():
+    """with ブロック内のページ操作を記録しない (まとめて1つのステップとして記録する場合など)"""
+    token = current_recorder.set(None)
+    try:
+        yield
+    finally:
+        current_recorder.reset(token)
+
+def percentile(values, percent):
+    """線形補間によるパーセンタイル"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def summarize(records):
+    """
+    フェーズ・ステップごとの集計 (件数, 失敗数, p50, p95, p99, 最大) を返す
+
+    ステップは「メソッド名 + 操作対象」ごとに集計するため、遅いセレクタや遅いサイトを特定できる。
+    """
+    groups = {}
+    for record in records:
+        # ResourceMonitor の記録 (kind="resource") は所要時間を持たない
+        if record["duration_ms"] is None:
+            continue
+        key = (record["kind"], record["name"], record["target"])
+        groups.setdefault(key, []).append(record)
+
+    summary = []
+    for (kind, name, target), group in groups.items():
+        durations = [record["duration_ms"] for record in group]
+        summary.append({
+            "kind": kind,
+            "name": name,
+            "target": target,
+            "count": len(group),
+            "failed": sum(1 for record in group if not record["ok"]),
+            "p50_ms": round(percentile(durations, 50), 3),
+            "p95_ms": round(percentile(durations, 95), 3),
+            "p99_ms": round(percentile(durations, 99), 3),
+            "max_ms": round(max(durations), 3)
+        })
+    summary.sort(key=lambda row: row["p95_ms"], reverse=True)
+    return summary
+
+def write_report(records, path):
+    """
+    記録をファイルに書き出す (拡張子が .csv なら CSV、それ以外は JSONL)
+
+    Args:
+        records: TimingRecorder.records を連結したリスト
+        path: 出力先のパス
+    """
+    if str(path).endswith(".csv"):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(records)
+        return
+
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def print_summary(records, limit=15):
+    """所要時間の集計を p95 の大きい順に表示する"""
+    summary = summarize(records)
+    if not summary:
+        return
+    print(f"\n所要時間の集計 (p95 の大きい順、上位 {min(limit, len(summary))}件):")
+    print(f"{'種類':<6} {'名前':<24} {'件数':>5} {'p50(ms)':>10} {'p95(ms)':>10} {'p99(ms)':>10}  対象")
+    for row in summary[:limit]:
+        print(f"{row['kind']:<6} {row['name']:<24} {row['count']:>5} "
+              f"{row['p50_ms']:>10.1f} {row['p95_ms']:>10.1f} {row['p99_ms']:>10.1f}  {row['target'] or ''}")
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import re
+import shutil
+import time
+
+# 保持期間・容量の対象にするファイル (動画と失敗時のスクリーンショット)
+RETAINED_SUFFIXES = (".webm", ".mp4", ".png")
+
+# この時間内に更新されたファイルは、他のプロセスが録画中の可能性があるため削除しない (秒)
+_ACTIVE_GRACE = 60
+
+class VideoFinalizer:
+    """
+    録画したコンテキストの終了と動画の書き出しをバックグラウンドで行う
+
+    context.close() は動画の書き出しが終わるまで戻らないため、シナリオの後片付けでは
+    submit() でコンテキストを渡すだけにし、次のシナリオをすぐに開始できるようにする。
+    書き出した動画は「アクション名_クエリ_日時.webm」に名前を変え、
+    必要なら ffmpeg で再エンコード・縮小し、保持期間と合計サイズを超えた古いファイルを削除する。
+    per_scenario を指定しない場合、コンテキストは再利用され、1つの動画に複数のシナリオが含まれる。
+    """
+
+    def __init__(self, video_dir="./tmp/record_videos", max_bytes=None, max_age=None, scale=None, crf=None,
+                 jobs=2, per_scenario=False):
+        """
+        Args:
+            video_dir: 録画ファイルの保存先 (保持期間・容量の対象)
+            max_bytes: 保存先の合計の最大サイズ (バイト、None の場合は削除しない)
+            max_age: ファイルを残す期間 (秒、None の場合は削除しない)
+            scale: 再エンコード時の幅 (ピクセル、高さは縦横比を保つ)
+            crf: 再エンコードの品質 (VP9 の CRF、大きいほど小さく粗い)。
+                scale と crf のどちらも None の場合は再エンコードしない
+            jobs: 同時に実行する ffmpeg のプロセス数
+            per_scenario: 録画したコンテキストを再利用せず、シナリオごとに1つの動画にするかどうか。
+                コンテキストを毎回作り直すため、バッチ実行のスループットが下がる
+        """
+        self.video_dir = video_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.scale = scale
+        self.crf = crf
+        self.jobs = jobs
+        self.per_scenario = per_scenario
+        self.stats = {"finalized": 0, "transcoded": 0, "pruned": 0}
+
+        self._tasks = set()
+        self._recording = set()
+        self._ffmpeg_slots = None
+        self._ffmpeg = None
+        if scale is not None or crf is not None:
+            self._ffmpeg = shutil.which("ffmpeg")
+            if self._ffmpeg is None:
+                print("警告: ffmpeg が見つからないため、録画の再エンコードは行いません")
+
+    def __getstate__(self):
+        # ワーカープロセスには設定だけを渡す
+        return {
+            "video_dir": self.video_dir,
+            "max_bytes": self.max_bytes,
+            "max_age": self.max_age,
+            "scale": self.scale,
+            "crf": self.crf,
+            "jobs": self.jobs,
+            "per_scenario": self.per_scenario,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    async def track(self, page):
+        """録画中の動画を登録し、書き出しが終わるまで削除の対象から外す"""
+        if page is not None and page.video is not None:
+            self._recording.add(os.path.abspath(await page.video.path()))
+
+    def submit(self, context, page=None, label=None):
+        """
+        コンテキストを閉じて動画を書き出す処理をバックグラウンドで開始する
+
+        Args:
+            context: 録画中のブラウザコンテキスト
+            page: 録画しているページ (動画のファイル名の変更に使う)
+            label: ファイル名に含める識別子 (アクション名とクエリなど)
+        """
+        task = asyncio.create_task(self.finalize(context, page, label))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def finalize(self, context, page=None, label=None):
+        """コンテキストを閉じ、書き出された動画の名前を変えて後処理を行う"""
+        video = page.video if page is not None else None
+        try:
+            await context.close()
+            if video is None:
+                return
+            path = await video.path()
+            self._recording.discard(os.path.abspath(path))
+            if label:
+                path = self._rename(path, label)
+            if self._ffmpeg is not None:
+                await self._transcode(path)
+            self.stats["finalized"] += 1
+        except Exception as e:
+            print(f"警告: 録画の書き出しに失敗しました: {str(e)}")
+            return
+        await asyncio.to_thread(self.prune)
+
+    async def drain(self):
+        """バックグラウンドで処理中の録画がすべて書き出されるまで待つ"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def prune(self):
+        """保持期間を過ぎたファイルを削除し、合計サイズが上限を超えていれば古いものから削除する"""
+        if self.max_bytes is None and self.max_age is None:
+            return
+        if not os.path.isdir(self.video_dir):
+            return
+        files = []
+        for entry in os.scandir(self.video_dir):
+            if entry.is_file() and entry.name.endswith(RETAINED_SUFFIXES):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+
+        now = time.time()
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            if os.path.abspath(path) in self._recording or now - mtime < _ACTIVE_GRACE:
+                continue
+            expired = self.max_age is not None and now - mtime > self.max_age
+            oversized = self.max_bytes is not None and total > self.max_bytes
+            if not expired and not oversized:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.stats["pruned"] += 1
+
+    def _rename(self, path, label):
+        """動画をシナリオがわかる名前 (ラベル_日時) に変える"""
+        directory, name = os.path.split(path)
+        suffix = os.path.splitext(name)[1]
+        safe_label = re.sub(r"[^\w.-]+", "_", label)
+        base = f"{safe_label}_{time.strftime('%Y%m%d-%H%M%S')}"
+        new_path = os.path.join(directory, base + suffix)
+        counter = 1
+        while os.path.exists(new_path):
+            counter += 1
+            new_path = os.path.join(directory, f"{base}_{counter}{suffix}")
+        os.replace(path, new_path)
+        return new_path
+
+    async def _transcode(self, path):
+        """ffmpeg で再エンコード・縮小し、元のファイルを置き換える"""
+        if self._ffmpeg_slots is None:
+            self._ffmpeg_slots = asyncio.Semaphore(self.jobs)
+        temp_path = f"{os.path.splitext(path)[0]}.tmp.webm"
+        command = [self._ffmpeg, "-y", "-loglevel", "error", "-i", path]
+        if self.scale is not None:
+            command += ["-vf", f"scale={self.scale}:-2"]
+        command += ["-c:v", "libvpx-vp9", "-crf", str(self.crf if self.crf is not None else 36), "-b:v", "0",
+                    "-deadline", "realtime", "-cpu-used", "8", "-an", temp_path]
+
+        async with self._ffmpeg_slots:
+            process = await asyncio.create_subprocess_exec(
+                *command, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+            )
+            _, stderr = await process.communicate()
+        if process.returncode != 0:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            print(f"警告: 録画の再エンコードに失敗しました ({path}): {stderr.decode(errors='replace').strip()}")
+            return
+        os.replace(temp_path, os.path.splitext(path)[0] + ".webm")
+        if not path.endswith(".webm"):
+            os.remove(path)
+        self.stats["transcoded"] += 1